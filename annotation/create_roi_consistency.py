@@ -1,11 +1,11 @@
 """Create ROI consistent label json files for multiple views"""
 
-import itertools
 import math
 import sys
 from configparser import ConfigParser
+from functools import partial
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 from tqdm import tqdm
 
@@ -17,9 +17,17 @@ except IndexError:
 from annotation.generate_pseudo_label import get_shapes_from_roi_circles
 from util import config
 from util.args import ArgumentParserFactory
-from util.camera import RoiView, RoiViewPair
-from util.files import FileReindexer, get_files_with_suffix, read_json, write_json
+from util.camera import CameraRig, RoiView
+from util.files import (
+    FileModel,
+    FileReindexer,
+    get_file_models_with_suffixes,
+    get_files_with_suffix,
+    read_json,
+    write_json,
+)
 from util.geometry import Circle
+from util.parallel import imap_ordered
 
 
 def parse_arguments():
@@ -59,6 +67,8 @@ def parse_arguments():
         default=0.7,
         help="IOU threshold to adjust if a new ROI circle need to be added",
     )
+    factory.add_index_argument()
+    factory.add_workers_argument()
     return parser.parse_args()
 
 
@@ -82,32 +92,44 @@ def create_circle_list_from_json(jsonfile: Dict):
 
 def sync_rois_for_scene(
     json_files: List[Dict],
-    camera_orientation_list: List[float],
+    camera_rig: CameraRig,
     iou_threshold: float,
-    fov_degree: float,
 ):
     """Sync the ROIs for one scene"""
     image_width = json_files[0]["imageWidth"]
     roi_view_list = [
         RoiView(
             create_circle_list_from_json(json_file),
-            camera_orientation_list[json_files.index(json_file)],
+            camera_rig.camera_positions[view_index],
             image_width,
             iou_threshold,
-            math.radians(fov_degree),
+            camera_rig.fov,
         )
-        for json_file in json_files
+        for view_index, json_file in enumerate(json_files)
     ]
-    unique_permutations = list(itertools.product(*[roi_view_list, roi_view_list]))
-    for unique_permutation in unique_permutations:
-        roi_view_pair = RoiViewPair(
-            unique_permutation[0],
-            unique_permutation[1],
-        )
-        roi_view_pair.sync_rois_between_views()
+    camera_rig.sync_rois(roi_view_list)
     return [roi_view.rois for roi_view in roi_view_list]
 
 
+def create_consistent_labels(
+    file_group: List[FileModel], camera_rig: CameraRig, iou_threshold: float
+) -> List[Tuple[str, Dict]]:
+    """
+    Create the ROI consistent label data for all files of one frame
+    :param file_group:
+    :param camera_rig:
+    :param iou_threshold:
+    :return: File names and label data of the frame
+    """
+    labels = [read_json(json_file.file_path) for json_file in file_group]
+    roi_view_list = sync_rois_for_scene(labels, camera_rig, iou_threshold)
+    consistent_labels = []
+    for json_file, json_data, rois in zip(file_group, labels, roi_view_list):
+        json_data["shapes"] = get_shapes_from_roi_circles(rois, 1, 1)
+        consistent_labels.append((json_file.file_path.name, json_data))
+    return consistent_labels
+
+
 def main():
     """main"""
     args = parse_arguments()
@@ -116,36 +138,34 @@ def main():
     output_path.mkdir(parents=True, exist_ok=True)
     input_dir = args.input_dir
 
-    camera_config = read_camera_config(args.camera_config)
-    camera_orientation_list = [
-        math.radians(float(camera_config[camera_position]["yaw"]))
-        for camera_position in camera_config.keys()
-    ]
+    camera_rig = CameraRig.from_camera_config(
+        read_camera_config(args.camera_config), math.radians(args.fov_degree)
+    )
 
     print("Reading scenarios...")
-    json_files = get_files_with_suffix(input_dir, config.LABELME_SUFFIX)
+    if args.index:
+        json_files = get_file_models_with_suffixes(
+            input_dir, [config.LABELME_SUFFIX], index_dir=args.index_dir
+        )[config.LABELME_SUFFIX]
+    else:
+        json_files = get_files_with_suffix(input_dir, config.LABELME_SUFFIX)
 
     print(f"Processing the dataset {input_dir.name}")
     consistent_output_path = output_path.joinpath(input_dir.name)
     consistent_output_path.mkdir(parents=True, exist_ok=True)
     file_groups = FileReindexer.group_files_by_index(json_files)
-    for file_group in tqdm(file_groups.values()):
-        file_group_content = [
-            read_json(json_file.file_path) for json_file in file_group
-        ]
-        roi_view_list = sync_rois_for_scene(
-            file_group_content,
-            camera_orientation_list,
-            args.iou_threshold,
-            args.fov_degree,
-        )
-        for json_file in file_group:
-            json_file_one_frame = read_json(json_file.file_path)
-            json_file_one_frame["shapes"] = get_shapes_from_roi_circles(
-                roi_view_list[file_group.index(json_file)], 1, 1
-            )
-            outfile = consistent_output_path / json_file.file_path.name
-            write_json(outfile, json_file_one_frame)
+    consistent_label_groups = imap_ordered(
+        partial(
+            create_consistent_labels,
+            camera_rig=camera_rig,
+            iou_threshold=args.iou_threshold,
+        ),
+        file_groups.values(),
+        args.workers,
+    )
+    for consistent_labels in tqdm(consistent_label_groups, total=len(file_groups)):
+        for file_name, json_data in consistent_labels:
+            write_json(consistent_output_path / file_name, json_data)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,9 @@
 """Generate pseudo labels from predicted heatmaps"""
 
 import copy
+import math
 import sys
+from functools import partial
 from pathlib import Path
 
 from tqdm import tqdm
@@ -13,12 +15,14 @@ except IndexError:
 
 import numpy as np
 import PIL.Image
-import skimage.measure
+import scipy.ndimage
 
 from util import config
 from util.args import ArgumentParserFactory, parse_resolution
 from util.files import get_files_with_suffix, write_json
-from util.geometry import Circle
+from util.geometry import CircleArray
+from util.heatmaps import HeatmapStack
+from util.parallel import imap_ordered
 
 JSON_FILE_TEMPLATE = {
     "version": config.LABELME_VERSION,
@@ -29,6 +33,17 @@ JSON_FILE_TEMPLATE = {
     "shapes": [],
 }
 
+# Pixels are connected to all 8 neighbours like in skimage.measure.label
+CONNECTIVITY_STRUCTURE = np.ones((3, 3), dtype=bool)
+# Pixels of stacked heatmaps are only connected to their neighbours in the same heatmap
+STACK_CONNECTIVITY_STRUCTURE = np.stack(
+    (
+        np.zeros_like(CONNECTIVITY_STRUCTURE),
+        CONNECTIVITY_STRUCTURE,
+        np.zeros_like(CONNECTIVITY_STRUCTURE),
+    )
+)
+
 SHAPE_TEMPLATE = {
     "label": "undefined",
     "line_color": None,
@@ -45,13 +60,19 @@ def parse_arguments():
     :return:
     """
     factory = ArgumentParserFactory(__doc__)
-    factory.add_input_dir_argument("Path to the predicted heatmaps")
+    factory.parser.add_argument(
+        "input_dir",
+        type=ArgumentParserFactory.existing_path,
+        help="Path to the directory of predicted heatmaps or to a file of stacked (N, H, W) heatmaps "
+        f"({', '.join(HeatmapStack.SUFFIXES)}). Float heatmaps are expected in the range [0, 1].",
+    )
     factory.add_output_dir_argument(
         "Path to the RGB images where the generated labels belong to and should be stored",
         Path(__file__).parent,
     )
     factory.add_suffix_argument()
     factory.add_resolution_argument()
+    factory.add_workers_argument()
     parser = factory.parser
     parser.add_argument(
         "-bt",
@@ -67,32 +88,87 @@ def parse_arguments():
         type=float,
         help="Minimum diameter for an ROI in percent to the image width",
     )
+    parser.add_argument(
+        "--names",
+        type=ArgumentParserFactory.file_path,
+        help="Text file with the frame name of every stacked heatmap per line. Required if the "
+        f"stack file does not contain the frame names as '{HeatmapStack.NAMES_KEY}'.",
+    )
+    parser.add_argument(
+        "--chunk_size",
+        default=64,
+        type=ArgumentParserFactory.positive_int,
+        help="Number of stacked heatmaps which are processed at once",
+    )
     return parser.parse_args()
 
 
 def binarize_image(heatmap_image, bin_threshold):
     """
-    Convert image to binary black and white image according to threshold
+    Convert image to binary mask according to threshold
     :param heatmap_image:
     :param bin_threshold:
-    :return:
+    :return: Boolean array which is True for gray values not below the threshold
+    """
+    return np.asarray(heatmap_image.convert(config.GAZEMAP_FORMAT)) >= bin_threshold
+
+
+def binarize_heatmaps(heatmaps, bin_threshold):
+    """
+    Convert stacked heatmaps to binary masks according to threshold
+    :param heatmaps: Array of uint8 gray values or of floats in the range [0, 1]
+    :param bin_threshold: Threshold as gray value
+    :return: Boolean array which is True for values not below the threshold
     """
-    gray = heatmap_image.convert(config.GAZEMAP_FORMAT)
-    return gray.point(lambda x: 0 if x < bin_threshold else 255, "1")
+    if np.issubdtype(heatmaps.dtype, np.floating):
+        return heatmaps >= bin_threshold / 255
+    return heatmaps >= bin_threshold
 
 
 def get_roi_circles_from_bin_image(bin_image, min_diameter):
     """
-    Get ROI circles from binary image if larger than minimum area
-    :param bin_image:
-    :param min_diameter:
-    :return:
+    Get ROI circles of the connected components of a binary image if larger than minimum diameter
+    The circles have the centroid and the equivalent diameter of the component area
+    :param bin_image: Boolean array
+    :param min_diameter: Minimum diameter in percent to the image width
+    :return: CircleArray in the order of the component labels
+    """
+    return get_roi_circles_from_bin_stack(
+        np.asarray(bin_image)[np.newaxis], min_diameter
+    )[0]
+
+
+def get_roi_circles_from_bin_stack(bin_stack, min_diameter):
+    """
+    Get ROI circles of the connected components of stacked binary images in a single labeling pass
+    :param bin_stack: Boolean array of shape (N, H, W)
+    :param min_diameter: Minimum diameter in percent to the image width
+    :return: CircleArray of every image
     """
-    labels = skimage.measure.label(np.array(bin_image))
+    labels, label_count = scipy.ndimage.label(bin_stack, STACK_CONNECTIVITY_STRUCTURE)
+    frames, rows, columns = np.nonzero(labels)
+    pixel_labels = labels[frames, rows, columns]
+    areas = np.bincount(pixel_labels, minlength=label_count + 1)[1:]
+    centroids = np.stack(
+        (
+            np.bincount(pixel_labels, weights=columns, minlength=label_count + 1)[1:],
+            np.bincount(pixel_labels, weights=rows, minlength=label_count + 1)[1:],
+        ),
+        axis=1,
+    ) / areas.reshape(-1, 1)
+    diameters = np.sqrt(4 * areas / math.pi)
+    # labels are assigned in raster order, so the frames of the labels are ascending
+    label_frames = np.zeros(label_count, dtype=np.int64)
+    label_frames[pixel_labels - 1] = frames
+
+    is_large = diameters > min_diameter * bin_stack.shape[2]
+    centroids = centroids[is_large]
+    radius_points = centroids.copy()
+    radius_points[:, 0] += diameters[is_large] / 2
+    bounds = np.searchsorted(label_frames[is_large], np.arange(len(bin_stack) + 1))
     return [
-        Circle.from_region_props(region)
-        for region in skimage.measure.regionprops(labels)
-        if region.equivalent_diameter > min_diameter * bin_image.width
+        CircleArray(centroids[start:stop], radius_points[start:stop])
+        for start, stop in zip(bounds[:-1], bounds[1:])
     ]
 
 
@@ -104,45 +180,176 @@ def get_shapes_from_roi_circles(roi_circles, x_scale, y_scale):
     :param y_scale:
     :return:
     """
+    if isinstance(roi_circles, CircleArray):
+        circles = CircleArray(roi_circles.centroids, roi_circles.radius_points)
+    else:
+        circles = CircleArray.from_circles(roi_circles)
+    circles.scale(x_scale, y_scale)
     shapes = []
-    for roi_circle in roi_circles:
-        roi_circle.scale(x_scale, y_scale)
+    for points in circles.to_json():
         shape_to_write = copy.deepcopy(SHAPE_TEMPLATE)
-        shape_to_write["points"] = roi_circle.to_json()
+        shape_to_write["points"] = points
         shapes.append(shape_to_write)
     return shapes
 
 
+def create_label_data(
+    frame_name, width, height, target_image_suffix, roi_circles, x_scale, y_scale
+):
+    """
+    Create the json label data of a frame from its ROI circles
+    :param frame_name: Name of the frame without suffix
+    :param width:
+    :param height:
+    :param target_image_suffix:
+    :param roi_circles:
+    :param x_scale: Scale from the heatmap to the target image width
+    :param y_scale: Scale from the heatmap to the target image height
+    :return: Label file name and json data
+    """
+    json_data = copy.deepcopy(JSON_FILE_TEMPLATE)
+    json_data["imageWidth"] = width
+    json_data["imageHeight"] = height
+    json_data["imagePath"] = frame_name + target_image_suffix
+    json_data["shapes"] = get_shapes_from_roi_circles(roi_circles, x_scale, y_scale)
+    return frame_name + config.LABELME_SUFFIX, json_data
+
+
+def create_pseudo_label(
+    heatmap_file, width, height, bin_threshold, min_diameter, target_image_suffix
+):
+    """
+    Create the json label data of a single predicted heatmap
+    :param heatmap_file:
+    :param width:
+    :param height:
+    :param bin_threshold:
+    :param min_diameter:
+    :param target_image_suffix:
+    :return: Label file name and json data
+    """
+    heatmap_image = PIL.Image.open(heatmap_file)
+    bin_image = binarize_image(heatmap_image, bin_threshold)
+    roi_circles = get_roi_circles_from_bin_image(bin_image, min_diameter)
+    return create_label_data(
+        heatmap_file.stem,
+        width,
+        height,
+        target_image_suffix,
+        roi_circles,
+        width / heatmap_image.width,
+        height / heatmap_image.height,
+    )
+
+
+def create_pseudo_label_chunk(
+    chunk, width, height, bin_threshold, min_diameter, target_image_suffix
+):
+    """
+    Create the json label data of a chunk of stacked heatmaps
+    :param chunk: Frame names and (N, H, W) heatmaps
+    :param width:
+    :param height:
+    :param bin_threshold:
+    :param min_diameter:
+    :param target_image_suffix:
+    :return: Label file name and json data of every frame
+    """
+    frame_names, heatmaps = chunk
+    roi_circles = get_roi_circles_from_bin_stack(
+        binarize_heatmaps(heatmaps, bin_threshold), min_diameter
+    )
+    return [
+        create_label_data(
+            frame_name,
+            width,
+            height,
+            target_image_suffix,
+            circles,
+            width / heatmaps.shape[2],
+            height / heatmaps.shape[1],
+        )
+        for frame_name, circles in zip(frame_names, roi_circles)
+    ]
+
+
 def create_pseudo_labels(
-    heatmap_files, width, height, bin_threshold, min_diameter, target_image_suffix
+    heatmap_files,
+    width,
+    height,
+    bin_threshold,
+    min_diameter,
+    target_image_suffix,
+    workers=1,
 ):
     """
-    Create json files with labels from predicted heatmap
+    Lazily create json label data from predicted heatmaps
+    Only a bounded number of heatmaps is processed ahead of the consumer, so memory stays constant
     :param heatmap_files:
     :param width:
     :param height:
     :param bin_threshold:
     :param min_diameter:
     :param target_image_suffix:
-    :return:
+    :param workers: Number of worker processes
+    :return: Generator of label file name and json data in the order of the heatmap files
     """
-    label_json_files = []
-    for heatmap_file in tqdm(heatmap_files, desc="Creating Pseudo Labels..."):
-        json_data = copy.deepcopy(JSON_FILE_TEMPLATE)
-        json_data["imageWidth"] = width
-        json_data["imageHeight"] = height
-        json_data["imagePath"] = heatmap_file.stem + target_image_suffix
-
-        heatmap_image = PIL.Image.open(heatmap_file)
-        bin_image = binarize_image(heatmap_image, bin_threshold)
-        roi_circles = get_roi_circles_from_bin_image(bin_image, min_diameter)
-        json_data["shapes"] = get_shapes_from_roi_circles(
-            roi_circles, width / heatmap_image.width, height / heatmap_image.height
-        )
+    yield from tqdm(
+        imap_ordered(
+            partial(
+                create_pseudo_label,
+                width=width,
+                height=height,
+                bin_threshold=bin_threshold,
+                min_diameter=min_diameter,
+                target_image_suffix=target_image_suffix,
+            ),
+            heatmap_files,
+            workers,
+        ),
+        total=len(heatmap_files),
+        desc="Creating Pseudo Labels...",
+    )
 
-        label_json_files.append((heatmap_file.stem + config.LABELME_SUFFIX, json_data))
 
-    return label_json_files
+def create_pseudo_labels_from_stack(
+    heatmap_stack: HeatmapStack,
+    width,
+    height,
+    bin_threshold,
+    min_diameter,
+    target_image_suffix,
+    chunk_size=64,
+    workers=1,
+):
+    """
+    Lazily create json label data from stacked heatmaps, the heatmaps are read and processed in chunks
+    :param heatmap_stack:
+    :param width:
+    :param height:
+    :param bin_threshold:
+    :param min_diameter:
+    :param target_image_suffix:
+    :param chunk_size: Number of heatmaps per chunk
+    :param workers: Number of worker processes the chunks are distributed to
+    :return: Generator of label file name and json data in the order of the stack
+    """
+    label_chunks = imap_ordered(
+        partial(
+            create_pseudo_label_chunk,
+            width=width,
+            height=height,
+            bin_threshold=bin_threshold,
+            min_diameter=min_diameter,
+            target_image_suffix=target_image_suffix,
+        ),
+        heatmap_stack.chunks(chunk_size),
+        workers,
+    )
+    with tqdm(total=len(heatmap_stack), desc="Creating Pseudo Labels...") as bar:
+        for label_chunk in label_chunks:
+            yield from label_chunk
+            bar.update(len(label_chunk))
 
 
 def main():
@@ -153,17 +360,34 @@ def main():
     output_dir = args.output_dir
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    heatmap_files = get_files_with_suffix(args.input_dir, config.BDDA_IMAGE_SUFFIX)
-    print(
-        f"Found {len(heatmap_files)} {config.BDDA_IMAGE_SUFFIX} heatmap files in {args.input_dir}\n"
-    )
-
-    print("Creating pseudo labels from heatmaps...")
-    label_json_files = create_pseudo_labels(
-        heatmap_files, width, height, args.bin_threshold, args.min_diameter, args.suffix
-    )
-
-    for path, data in tqdm(label_json_files, desc="Writing label json files..."):
+    if args.input_dir.is_file():
+        heatmap_stack = HeatmapStack(args.input_dir, args.names)
+        print(f"Found {len(heatmap_stack)} stacked heatmaps in {args.input_dir}\n")
+        label_json_files = create_pseudo_labels_from_stack(
+            heatmap_stack,
+            width,
+            height,
+            args.bin_threshold,
+            args.min_diameter,
+            args.suffix,
+            args.chunk_size,
+            args.workers,
+        )
+    else:
+        heatmap_files = get_files_with_suffix(args.input_dir, config.BDDA_IMAGE_SUFFIX)
+        print(
+            f"Found {len(heatmap_files)} {config.BDDA_IMAGE_SUFFIX} heatmap files in {args.input_dir}\n"
+        )
+        label_json_files = create_pseudo_labels(
+            heatmap_files,
+            width,
+            height,
+            args.bin_threshold,
+            args.min_diameter,
+            args.suffix,
+            args.workers,
+        )
+    for path, data in label_json_files:
         write_json(output_dir / path, data)
 
 
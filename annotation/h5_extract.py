@@ -4,6 +4,8 @@ import argparse
 import sys
 from pathlib import Path
 
+from tqdm import tqdm
+
 try:
     sys.path.append(str(Path(__file__).absolute().parent.parent))
 except IndexError:
@@ -11,6 +13,9 @@ except IndexError:
 
 from util.args import ArgumentParserFactory
 from util.h5 import HDF5Extractor
+from util.parallel import imap_ordered
+
+RANGES_PER_WORKER = 4
 
 
 def parse_arguments():
@@ -29,17 +34,41 @@ def parse_arguments():
         "Path to the output directory",
         Path(__file__).parent,
     )
+    factory.add_workers_argument()
     return factory.parser.parse_args()
 
 
+def extract_sample_range(task) -> int:
+    """
+    Extract a range of samples from a hdf5 file, the file is opened read-only per task
+    :param task: hdf5 file path, output directory and sample range
+    :return: Number of extracted samples
+    """
+    file_path, output_dir, indices = task
+    extractor = HDF5Extractor(file_path)
+    return sum(1 for _ in extractor.extract_samples(output_dir, indices))
+
+
 def main():
     """main"""
     args = parse_arguments()
 
+    tasks = []
     for h5_file in args.h5_files:
-        extractor = HDF5Extractor(Path(h5_file.name))
-        print(f"Extract data from {h5_file.name} into {args.output_dir}")
-        extractor.extract_data(args.output_dir)
+        file_path = Path(h5_file.name)
+        h5_file.close()
+        print(f"Extract data from {file_path} into {args.output_dir}")
+        tasks.extend(
+            (file_path, args.output_dir, indices)
+            for indices in HDF5Extractor(file_path).sample_ranges(
+                args.workers * RANGES_PER_WORKER
+            )
+        )
+
+    progress = tqdm(total=sum(len(indices) for _, _, indices in tasks))
+    for sample_count in imap_ordered(extract_sample_range, tasks, args.workers):
+        progress.update(sample_count)
+    progress.close()
 
 
 if __name__ == "__main__":
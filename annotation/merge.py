@@ -1,7 +1,9 @@
 """Merge images and json labels"""
 
 import copy
+import io
 import sys
+from functools import partial
 from pathlib import Path
 
 from tqdm import tqdm
@@ -19,12 +21,15 @@ from util.files import (
     FileGrouper,
     FileReindexer,
     ImageLayoutModel,
-    get_files_with_suffix,
+    get_file_models_with_suffixes,
+    get_files_with_suffixes,
     read_json,
     write_json,
 )
-from util.geometry import shift_label_points
-from util.h5 import HDF5Writer
+from util.geometry import scale_label_points, shift_label_points
+from util.h5 import HDF5Writer, PackedHDF5Writer
+from util.manifest import Manifest
+from util.parallel import imap_ordered
 
 
 def parse_arguments():
@@ -52,11 +57,44 @@ def parse_arguments():
         action="store_true",
         help="Merge files into hdf5 file",
     )
+    parser.add_argument(
+        "--hdf5_layout",
+        choices=["sample", "packed"],
+        default="sample",
+        help="Layout of the hdf5 file. sample creates one group per sample, packed "
+        "creates one chunked and resizable dataset per topic",
+    )
+    parser.add_argument(
+        "--hdf5_compression",
+        choices=["none", "gzip", "lzf"],
+        default="gzip",
+        help="Compression of the image datasets for the packed hdf5 layout",
+    )
+    parser.add_argument(
+        "--hdf5_append",
+        action="store_true",
+        help="Append the samples to an existing hdf5 file with the same layout",
+    )
+    parser.add_argument(
+        "--hdf5_encoded",
+        action="store_true",
+        help="Store the encoded image files instead of the decoded pixels in the "
+        "hdf5 file, images are decoded when they are read",
+    )
     parser.add_argument(
         "--reindex",
         action="store_true",
         help="Reindex image and label files to a sequential continuous numbering",
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Merge all frames, by default frames whose input files are unchanged "
+        f"since the last run are skipped based on the {config.MVROI_MANIFEST_FILE} "
+        f"in the output directory",
+    )
+    factory.add_index_argument()
+    factory.add_workers_argument()
 
     return parser.parse_args()
 
@@ -91,41 +129,98 @@ def create_layout_data(image_topics, images_per_row, width, height):
     return data
 
 
-def merge_frames(image_merge_groups, output_dir, image_suffix):
+def open_resized_image(file_path, size):
     """
-    merge individual frames of different camera views into a single frame and write to file
-    :param image_merge_groups:
+    Open image and resize it to the given size if necessary
+    Uses a reduced size decode where supported by the image format (e.g. JPEG)
+    :param file_path:
+    :param size: Target size (width, height)
+    :return:
+    """
+    image = PIL.Image.open(file_path)
+    if image.size != size:
+        image.draft(config.IMAGE_FORMAT, size)
+        image = image.resize(size, PIL.Image.BILINEAR)
+    return image
+
+
+def merge_frame(indexed_merge_group, output_dir, image_suffix):
+    """
+    Merge the individual frames of one merge group into a single frame and write it to file
+    :param indexed_merge_group: Index, merge group and input files of the frame to record, the input
+        files are None if the frame is not recorded
     :param output_dir:
     :param image_suffix:
-    :return:
+    :return: File states and content hash of the input files or None
     """
-    for index, merge_group in enumerate(
-        tqdm(image_merge_groups, desc="Merging images...")
-    ):
-        result = PIL.Image.new(
-            config.IMAGE_FORMAT, (merge_group.width, merge_group.height)
+    index, merge_group, input_files = indexed_merge_group
+    images, inputs = {}, None
+    if input_files is not None:
+        # the images are hashed and decoded from a single read
+        contents, inputs = Manifest.read_inputs(input_files)
+        images = dict(zip(input_files, contents))
+    result = PIL.Image.new(config.IMAGE_FORMAT, (merge_group.width, merge_group.height))
+    for layout in merge_group.image_layouts:
+        file_path = merge_group.get_file_path_by_key(layout.key)
+        if file_path in images:
+            file_path = io.BytesIO(images[file_path])
+        result.paste(
+            open_resized_image(file_path, (layout.width, layout.height)),
+            layout.top_left,
         )
-        for layout in merge_group.image_layouts:
-            file_path = merge_group.get_file_path_by_key(layout.key)
-            # TODO resize to given resolution
-            result.paste(
-                PIL.Image.open(file_path),
-                layout.top_left,
-            )
 
-        result.save(Path(output_dir) / f"merged_{index:06d}{image_suffix}")
+    result.save(Path(output_dir) / f"merged_{index:06d}{image_suffix}")
+    return inputs
+
+
+def merge_frames(
+    image_merge_groups,
+    output_dir,
+    image_suffix,
+    workers=1,
+    indices=None,
+    input_files=None,
+):
+    """
+    Lazily merge individual frames of different camera views into a single frame and write to file
+    :param image_merge_groups:
+    :param output_dir:
+    :param image_suffix:
+    :param workers: Number of worker processes
+    :param indices: Indices of the merged frames, by default the position of the merge group
+    :param input_files: Input files per merge group to record, read by the workers with Manifest.read_inputs
+    :return: Generator of the index and the recorded inputs of each written frame in the order of the
+        merge groups, the recorded inputs are None without input files
+    """
+    if indices is None:
+        indices = range(len(image_merge_groups))
+    if input_files is None:
+        input_files = [None] * len(image_merge_groups)
+    merged_frames = imap_ordered(
+        partial(merge_frame, output_dir=output_dir, image_suffix=image_suffix),
+        zip(indices, image_merge_groups, input_files),
+        workers,
+    )
+    yield from zip(indices, merged_frames)
 
 
-def merge_json_data(json_merge_groups, image_suffix):
+def merge_json_data(
+    json_merge_groups, image_suffix, indices=None, image_merge_groups=None
+):
     """
-    Merge individual frames json data into single frame json data
+    Lazily merge individual frames json data into single frame json data
     :param json_merge_groups:
     :param image_suffix:
-    :return:
+    :param indices: Indices of the merged frames, by default the position of the merge group
+    :param image_merge_groups: Image merge groups of the labeled images, used for labels without image size
+    :return: Generator of the merged json data in the order of the merge groups
     """
-    merged_json_data = []
-    for index, json_merge_group in enumerate(
-        tqdm(json_merge_groups, desc="Merging json...")
+    if indices is None:
+        indices = range(len(json_merge_groups))
+    if image_merge_groups is None:
+        image_merge_groups = [None] * len(json_merge_groups)
+    for index, json_merge_group, image_merge_group in zip(
+        indices, json_merge_groups, image_merge_groups
     ):
         merged_json = copy.deepcopy(
             json_merge_group.image_layouts[0].image_layout
@@ -138,29 +233,142 @@ def merge_json_data(json_merge_groups, image_suffix):
         for layout in json_merge_group.image_layouts:
             file_path = json_merge_group.get_file_path_by_key(layout.key)
             json_data = read_json(file_path)
+            size = label_size(
+                json_data,
+                None
+                if image_merge_group is None
+                else image_merge_group.get_file_path_by_key(layout.key),
+            )
+            if size is None:
+                print(
+                    f"Skipping labels of {file_path} without image size",
+                    file=sys.stderr,
+                )
+                continue
+            json_data = scale_label_points(
+                json_data, layout.width / size[0], layout.height / size[1]
+            )
             json_data = shift_label_points(json_data, layout.x, layout.y)
             merged_json["shapes"].extend(json_data["shapes"])
 
-        merged_json_data.append(merged_json)
+        yield merged_json
+
+
+def label_size(json_data, image_file_path=None):
+    """
+    Size of the labeled image, read from the image header if the labels do not contain a valid size
+    :param json_data:
+    :param image_file_path: Labeled image
+    :return: Size (width, height) or None if unknown
+    """
+    size = (json_data.get("imageWidth"), json_data.get("imageHeight"))
+    if all(isinstance(value, (int, float)) and value > 0 for value in size):
+        return size
+    if image_file_path is None:
+        return None
+    with PIL.Image.open(image_file_path) as image:
+        return image.size
+
 
-    return merged_json_data
+def merge_group_files(image_merge_group, json_merge_group):
+    """
+    All input files of a merged frame
+    :param image_merge_group:
+    :param json_merge_group:
+    :return:
+    """
+    return [
+        merge_group.get_file_path_by_key(key)
+        for merge_group in (image_merge_group, json_merge_group)
+        for key in merge_group.keys
+    ]
 
 
-def file_merge(output_dir: Path, image_grouper, json_grouper, image_suffix):
+def merged_files(output_dir: Path, index, image_suffix):
+    """
+    Output files of a merged frame
+    :param output_dir:
+    :param index:
+    :param image_suffix:
+    :return:
+    """
+    return [
+        output_dir.joinpath(f"merged_{index:06d}{image_suffix}"),
+        output_dir.joinpath(f"merged_{index:06d}.json"),
+    ]
+
+
+def file_merge(
+    output_dir: Path,
+    image_grouper,
+    json_grouper,
+    image_suffix,
+    workers=1,
+    manifest=None,
+):
     """
     Merge individual image and json files into files
     :param output_dir:
     :param image_grouper:
     :param json_grouper:
     :param image_suffix:
+    :param workers: Number of worker processes
+    :param manifest: Skip frames that are up to date and record the merged frames
     :return:
     """
-    merge_frames(image_grouper.merge_groups, output_dir, image_suffix)
-    merged_json_data = merge_json_data(json_grouper.merge_groups, image_suffix)
-    for index, merged_data in enumerate(
-        tqdm(merged_json_data, desc="Writing merged json files...")
+    image_merge_groups = image_grouper.merge_groups
+    json_merge_groups = json_grouper.merge_groups
+    indices = range(len(image_merge_groups))
+    if manifest is not None:
+        indices = [
+            index
+            for index in tqdm(indices, desc="Checking manifest...")
+            if not manifest.is_up_to_date(
+                index,
+                merge_group_files(image_merge_groups[index], json_merge_groups[index]),
+                merged_files(output_dir, index, image_suffix),
+            )
+        ]
+        print(
+            f"Skipping {len(image_merge_groups) - len(indices)} unchanged frames "
+            f"recorded in {manifest.file_path}"
+        )
+
+    input_files = None
+    if manifest is not None:
+        input_files = [
+            merge_group_files(image_merge_groups[index], json_merge_groups[index])
+            for index in indices
+        ]
+    merged_frames = merge_frames(
+        [image_merge_groups[index] for index in indices],
+        output_dir,
+        image_suffix,
+        workers,
+        indices,
+        input_files,
+    )
+    merged_json_data = merge_json_data(
+        [json_merge_groups[index] for index in indices],
+        image_suffix,
+        indices,
+        [image_merge_groups[index] for index in indices],
+    )
+    for (index, inputs), merged_data in tqdm(
+        zip(merged_frames, merged_json_data),
+        total=len(indices),
+        desc="Merging images and json...",
     ):
         write_json(output_dir.joinpath(f"merged_{index:06d}.json"), merged_data)
+        if manifest is not None:
+            manifest.record(
+                index,
+                merge_group_files(image_merge_groups[index], json_merge_groups[index]),
+                inputs,
+            )
+
+    if manifest is not None:
+        manifest.compact(len(image_merge_groups))
 
 
 def hdf5_merge(args, image_grouper, json_grouper):
@@ -173,7 +381,15 @@ def hdf5_merge(args, image_grouper, json_grouper):
     """
     h5_name = args.output_dir.joinpath(Path(args.input_dir).with_suffix(".h5").name)
     print(f"Creating HDF5 file {h5_name}")
-    writer = HDF5Writer(h5_name)
+    if args.hdf5_layout == "packed":
+        writer = PackedHDF5Writer(
+            h5_name,
+            None if args.hdf5_compression == "none" else args.hdf5_compression,
+            args.hdf5_append,
+            args.hdf5_encoded,
+        )
+    else:
+        writer = HDF5Writer(h5_name, args.hdf5_encoded, args.hdf5_append)
     for index, merge_group in enumerate(
         tqdm(
             image_grouper.merge_groups,
@@ -222,10 +438,19 @@ def main():
         print(f"Write {config.MVROI_LAYOUT_FILE}")
         write_json(output_dir.joinpath(config.MVROI_LAYOUT_FILE), layout_data)
 
-    image_files = get_files_with_suffix(input_dir, args.suffix)
-    json_files = get_files_with_suffix(
-        input_dir, ".json", ignore=config.MVROI_LAYOUT_FILE
-    )
+    if args.index:
+        files = get_file_models_with_suffixes(
+            input_dir,
+            [args.suffix, ".json"],
+            ignore=config.MVROI_LAYOUT_FILE,
+            index_dir=args.index_dir,
+        )
+    else:
+        files = get_files_with_suffixes(
+            input_dir, [args.suffix, ".json"], ignore=config.MVROI_LAYOUT_FILE
+        )
+    image_files = files[args.suffix]
+    json_files = files[".json"]
     print(
         f"Found {len(image_files)} {args.suffix} images and {len(json_files)} "
         f"label files in {input_dir}\n"
@@ -255,7 +480,20 @@ def main():
     if args.hdf5:
         hdf5_merge(args, image_grouper, json_grouper)
     else:
-        file_merge(args.output_dir, image_grouper, json_grouper, args.suffix)
+        manifest_path = output_dir.joinpath(config.MVROI_MANIFEST_FILE)
+        if args.force and manifest_path.exists():
+            manifest_path.unlink()
+        with Manifest(
+            manifest_path, {"layout": layout_data, "image_suffix": args.suffix}
+        ) as manifest:
+            file_merge(
+                output_dir,
+                image_grouper,
+                json_grouper,
+                args.suffix,
+                args.workers,
+                manifest,
+            )
 
 
 if __name__ == "__main__":
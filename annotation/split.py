@@ -1,10 +1,11 @@
 """Split images and json labels"""
 
-import copy
 import sys
+from functools import partial
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple
 
+import numpy as np
 from tqdm import tqdm
 
 try:
@@ -16,14 +17,11 @@ import PIL.Image
 
 from util import config
 from util.args import ArgumentParserFactory
-from util.files import (
-    FileModel,
-    ImageLayoutModel,
-    get_files_with_suffix,
-    read_json,
-    write_json,
-)
-from util.geometry import is_shape_inside, shift_label_points
+from util.files import FileModel, Layout, get_files_with_suffixes, read_json, write_json
+from util.parallel import imap_ordered
+
+# PIL image modes which are converted to and from NumPy arrays without losing information
+ARRAY_IMAGE_MODES = ("L", "RGB", "RGBA")
 
 
 def parse_arguments():
@@ -35,74 +33,133 @@ def parse_arguments():
     factory.add_common_arguments()
     parser = factory.parser
     parser.add_argument(
-        "--split_images",
+        "--skip_images",
         action="store_true",
-        help="Split merged images into individual ones. This is disabled by default "
-        "safe memory and speed up the runtime as usually the individual images "
-        "before merging are still available.",
+        help="Only split the json labels, e.g. if the individual images before merging "
+        "are still available.",
     )
+    factory.add_workers_argument()
+    factory.add_index_argument()
     return parser.parse_args()
 
 
-def split_images(images_files, layout, output_dir):
+def crop_segments(image: PIL.Image.Image, layout: Layout) -> Iterator:
     """
-    Split images into individuals according to the provided layout
-    :param images_files:
+    Crop all segments of the layout from an image
+    Images in an array compatible mode that cover the whole layout are decoded once into a NumPy
+    array and every segment is sliced from it, other images are cropped by PIL
+    :param image:
+    :param layout:
+    :return: Generator of layout model and segment image of every segment
+    """
+    image_width, image_height = image.size
+    boxes = layout.boxes
+    if (
+        image.mode in ARRAY_IMAGE_MODES
+        and np.all(boxes >= 0)
+        and np.all(boxes[:, 2] <= image_width)
+        and np.all(boxes[:, 3] <= image_height)
+    ):
+        pixels = np.asarray(image)
+        for layout_model in layout:
+            x_min, y_min, x_max, y_max = layout_model.box
+            yield layout_model, PIL.Image.fromarray(pixels[y_min:y_max, x_min:x_max])
+    else:
+        for layout_model in layout:
+            yield layout_model, image.crop(layout_model.box)
+
+
+def split_image(image_file: Path, layout: Layout, output_dir: Path) -> Path:
+    """
+    Split a single image into individuals according to the provided layout and write them to file
+    :param image_file:
     :param layout:
     :param output_dir:
-    :return:
+    :return: Path of the split image
     """
-    for image_file in tqdm(images_files, desc="Splitting images..."):
-        image_file_model = FileModel(image_file)
-        image = PIL.Image.open(image_file)
-        for image_segment in layout["layout"]:
-            layout_model = ImageLayoutModel(image_segment)
-            segment = image.crop(layout_model.box)
+    image_file_model = FileModel(image_file)
+    with PIL.Image.open(image_file) as image:
+        for layout_model, segment in crop_segments(image, layout):
             segment.save(
                 Path(output_dir).joinpath(
                     image_file_model.get_file_name_with_view_key(layout_model.key)
                 )
             )
+    return image_file
 
 
-def split_json_data(json_files: List[Path], layout: Dict, image_suffix: str) -> List:
+def split_images(images_files, layout, output_dir, workers=1):
     """
-    Split json data into individuals according to the provided layout
+    Split images into individuals according to the provided layout
+    :param images_files:
+    :param layout:
+    :param output_dir:
+    :param workers: Number of worker processes the images are distributed to
+    :return:
+    """
+    split_files = imap_ordered(
+        partial(split_image, layout=Layout.create(layout), output_dir=output_dir),
+        images_files,
+        workers,
+    )
+    for _ in tqdm(split_files, total=len(images_files), desc="Splitting images..."):
+        pass
+
+
+def split_json_data(
+    json_files: List[Path], layout: Dict, image_suffix: str
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    Lazily split json data into individuals according to the provided layout
     :param json_files:
     :param layout:
     :param image_suffix:
-    :return:
+    :return: Generator of file name and json data of every view of every file
     """
-    files_to_save = []
+    layout = Layout.create(layout)
     for json_file in tqdm(json_files, desc="Splitting json..."):
         json_file_model = FileModel(json_file)
-        json_data = read_json(json_file)
-        for image_segment in layout["layout"]:
-            layout_model = ImageLayoutModel(image_segment)
-            segment_data = crop_from_json(json_data, layout_model)
+        for layout_model, segment_data in split_json_document(
+            read_json(json_file), layout
+        ):
             file_name = json_file_model.get_file_name_with_view_key(layout_model.key)
             segment_data["imagePath"] = Path(file_name).with_suffix(image_suffix).name
-            files_to_save.append((file_name, segment_data))
+            yield file_name, segment_data
 
-    return files_to_save
 
-
-def crop_from_json(json_data: Dict, layout_model: ImageLayoutModel) -> Dict:
+def split_json_document(json_data: Dict, layout: Layout) -> Iterator[Tuple]:
     """
-    Crop label coordinates from json according to layout model
+    Split the json data of a merged frame in a single pass over its shapes
+    Every shape is assigned to all views which contain its first point, the centroid of circles.
+    Only the shapes and the top level dict of a view are new objects, all other values are shared
+    with the merged json data.
     :param json_data:
-    :param layout_model:
-    :return:
+    :param layout:
+    :return: Generator of layout model and json data of every view
     """
-    segment_data = copy.deepcopy(json_data)
-    segment_data["imageWidth"] = layout_model.width
-    segment_data["imageHeight"] = layout_model.height
-    segment_data["shapes"] = [
-        shape
-        for shape in segment_data["shapes"]
-        if is_shape_inside(shape, layout_model)
-    ]
-    return shift_label_points(segment_data, -layout_model.x, -layout_model.y)
+    shapes = json_data["shapes"]
+    if len({len(shape["points"]) for shape in shapes}) == 1:
+        # e.g. only circles, the points of all shapes are shifted at once
+        points = np.array([shape["points"] for shape in shapes], dtype=float)
+    else:
+        points = [np.array(shape["points"], dtype=float) for shape in shapes]
+    is_inside = layout.contains([shape_points[0] for shape_points in points])
+    for view_index, layout_model in enumerate(layout):
+        rows = np.flatnonzero(is_inside[:, view_index])
+        top_left = np.array(layout_model.top_left)
+        if isinstance(points, np.ndarray):
+            view_points = (points[rows] - top_left).tolist()
+        else:
+            view_points = [(points[row] - top_left).tolist() for row in rows]
+        yield layout_model, {
+            **json_data,
+            "imageWidth": layout_model.width,
+            "imageHeight": layout_model.height,
+            "shapes": [
+                {**shapes[row], "points": shape_points}
+                for row, shape_points in zip(rows, view_points)
+            ],
+        }
 
 
 def main():
@@ -112,8 +169,14 @@ def main():
     output_dir = args.output_dir
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    image_files = get_files_with_suffix(args.input_dir, args.suffix)
-    json_files = get_files_with_suffix(args.input_dir, config.LABELME_SUFFIX)
+    files = get_files_with_suffixes(
+        args.input_dir,
+        [args.suffix, config.LABELME_SUFFIX],
+        use_index=args.index,
+        index_dir=args.index_dir,
+    )
+    image_files = files[args.suffix]
+    json_files = files[config.LABELME_SUFFIX]
     layout_json = [
         json_files.pop(json_files.index(file))
         for file in json_files
@@ -133,10 +196,9 @@ def main():
 
     layout_data = read_json(layout_json[0])
 
-    if args.split_images:
-        split_images(image_files, layout_data, output_dir)
-    individual_json_files = split_json_data(json_files, layout_data, args.suffix)
-    for path, data in tqdm(individual_json_files, desc="Writing json files..."):
+    if not args.skip_images:
+        split_images(image_files, layout_data, output_dir, args.workers)
+    for path, data in split_json_data(json_files, layout_data, args.suffix):
         write_json(output_dir / path, data)
 
 
@@ -0,0 +1,160 @@
+"""Benchmark label file I/O of create_roi_consistency and its previous implementation on a generated dataset"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+try:
+    sys.path.append(str(Path(__file__).absolute().parent.parent))
+except IndexError:
+    pass
+
+from annotation import create_roi_consistency
+from annotation.generate_pseudo_label import (
+    JSON_FILE_TEMPLATE,
+    SHAPE_TEMPLATE,
+    get_shapes_from_roi_circles,
+)
+from util import config
+from util.args import ArgumentParserFactory
+from util.camera import CameraRig
+from util.files import FileReindexer, get_files_with_suffix, read_json, write_json
+
+CAMERA_CONFIG = (
+    Path(__file__).parent.parent / "record" / "config" / "6_camera_setup.ini"
+)
+
+
+def parse_arguments():
+    """
+    Parse command line arguments
+    :return:
+    """
+    factory = ArgumentParserFactory(__doc__)
+    factory.add_image_topics_argument("Image topics of the generated dataset")
+    factory.parser.add_argument(
+        "-n",
+        "--frames",
+        type=int,
+        default=2000,
+        help="Number of generated frames",
+    )
+    factory.parser.add_argument(
+        "--rois",
+        type=int,
+        default=10,
+        help="Number of ROIs per generated label file",
+    )
+    return factory.parser.parse_args()
+
+
+def generate_dataset(output_dir: Path, image_topics, frames: int, rois: int) -> None:
+    """
+    Generate random label files for all topics and frames
+    :param output_dir:
+    :param image_topics:
+    :param frames:
+    :param rois:
+    :return:
+    """
+    rng = np.random.default_rng(0)
+    for index in range(frames):
+        for topic in image_topics:
+            json_data = dict(JSON_FILE_TEMPLATE, imageWidth=640, imageHeight=480)
+            centers = rng.uniform((0, 0), (640, 480), (rois, 2))
+            radius_points = centers + [rng.uniform(5, 50), 0]
+            json_data["shapes"] = [
+                dict(SHAPE_TEMPLATE, points=[center, radius_point])
+                for center, radius_point in zip(
+                    centers.tolist(), radius_points.tolist()
+                )
+            ]
+            write_json(
+                output_dir / (config.MVROI_FILENAME_TEMPLATE % (topic, index, ".json")),
+                json_data,
+            )
+
+
+def create_consistent_labels_with_second_read(file_group, camera_rig, iou_threshold):
+    """Previous implementation which reads every label file again before replacing its shapes"""
+    file_group_content = [
+        create_roi_consistency.read_json(json_file.file_path)
+        for json_file in file_group
+    ]
+    roi_view_list = create_roi_consistency.sync_rois_for_scene(
+        file_group_content,
+        camera_rig,
+        iou_threshold,
+    )
+    consistent_labels = []
+    for json_file in file_group:
+        json_file_one_frame = create_roi_consistency.read_json(json_file.file_path)
+        json_file_one_frame["shapes"] = get_shapes_from_roi_circles(
+            roi_view_list[file_group.index(json_file)], 1, 1
+        )
+        consistent_labels.append((json_file.file_path.name, json_file_one_frame))
+    return consistent_labels
+
+
+def measure(function, file_groups, camera_rig):
+    """
+    Measure the runtime and label file reads of syncing all frames
+    :param function: Function creating the consistent labels of a frame
+    :param file_groups:
+    :param camera_rig:
+    :return: Duration in seconds, number of reads, bytes read and the labels of all frames
+    """
+    with patch(
+        "annotation.create_roi_consistency.read_json", wraps=read_json
+    ) as read_mock:
+        start = time.perf_counter()
+        labels = [function(file_group, camera_rig, 0.7) for file_group in file_groups]
+        duration = time.perf_counter() - start
+    bytes_read = sum(call.args[0].stat().st_size for call in read_mock.call_args_list)
+    return duration, read_mock.call_count, bytes_read, labels
+
+
+def main():
+    """main"""
+    args = parse_arguments()
+    camera_rig = CameraRig.from_camera_config(
+        create_roi_consistency.read_camera_config(CAMERA_CONFIG), np.radians(90.0)
+    )
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_dir = Path(temp_dir)
+        print(f"Generating {args.frames} frames in {input_dir}")
+        generate_dataset(input_dir, args.image_topics, args.frames, args.rois)
+        json_files = get_files_with_suffix(input_dir, config.LABELME_SUFFIX)
+        file_groups = list(FileReindexer.group_files_by_index(json_files).values())
+
+        results = {
+            "previous": measure(
+                create_consistent_labels_with_second_read, file_groups, camera_rig
+            ),
+            "current": measure(
+                create_roi_consistency.create_consistent_labels,
+                file_groups,
+                camera_rig,
+            ),
+        }
+    assert results["previous"][3] == results["current"][3]
+
+    print(f"Label files: {len(json_files)}")
+    print(
+        f"{'':>10} {'reads':>8} {'per file':>9} {'read':>9} {'runtime':>9} {'per frame':>10}"
+    )
+    for name, (duration, reads, bytes_read, _) in results.items():
+        print(
+            f"{name:>10} {reads:>8} {reads / len(json_files):>9.2f} "
+            f"{bytes_read / 1e6:>7.1f}MB {duration:>8.2f}s "
+            f"{1000 * duration / len(file_groups):>8.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark grouping the files of an increasing number of frames into merge groups"""
+
+import gc
+import sys
+import time
+from pathlib import Path
+
+try:
+    sys.path.append(str(Path(__file__).absolute().parent.parent))
+except IndexError:
+    pass
+
+from annotation.merge import create_layout_data
+from util import config
+from util.args import ArgumentParserFactory
+from util.files import FileGrouper, MergeGroup
+
+
+def parse_arguments():
+    """
+    Parse command line arguments
+    :return:
+    """
+    factory = ArgumentParserFactory(__doc__)
+    factory.add_image_topics_argument("Image topics of the generated file names")
+    factory.parser.add_argument(
+        "-n",
+        "--frames",
+        type=int,
+        nargs="+",
+        default=[10000, 100000, 1000000],
+        help="Numbers of frames to group",
+    )
+    factory.parser.add_argument(
+        "--previous_limit",
+        type=int,
+        default=100000,
+        help="Largest number of frames grouped with the previous implementation",
+    )
+    return factory.parser.parse_args()
+
+
+def generate_file_names(image_topics, frames: int):
+    """
+    Generate the file names of all topics and frames in directory listing order
+    :param image_topics:
+    :param frames:
+    :return:
+    """
+    recording_dir = Path("/recording")
+    return [
+        recording_dir / (config.MVROI_FILENAME_TEMPLATE % (topic, index, ".png"))
+        for topic in sorted(image_topics)
+        for index in range(frames)
+    ]
+
+
+def build_merge_groups_with_pop(layout_data, files, image_topics):
+    """Previous implementation which pops the first file of every topic for every frame"""
+    file_groups = {
+        key: list(group)
+        for key, group in FileGrouper.group_files_by_keys(files, image_topics).items()
+    }
+    merge_groups = []
+    while next(iter(file_groups.values())):
+        files_dict = {key: files.pop(0) for key, files in file_groups.items()}
+        merge_groups.append(MergeGroup(layout_data, files_dict))
+    return merge_groups
+
+
+def measure(function, *args):
+    """
+    Measure the runtime of a function call
+    :param function:
+    :param args:
+    :return: Duration in seconds and result of the call
+    """
+    gc.collect()
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    """main"""
+    args = parse_arguments()
+    layout_data = create_layout_data(args.image_topics, 3, 640, 480)
+
+    print(f"{'Frames':>10} {'zip':>10} {'per frame':>12} {'pop(0)':>10}")
+    for frames in args.frames:
+        files = generate_file_names(args.image_topics, frames)
+        duration, grouper = measure(FileGrouper, layout_data, files, args.image_topics)
+        assert grouper.is_valid and len(grouper.merge_groups) == frames
+        del grouper
+
+        previous = "-"
+        if frames <= args.previous_limit:
+            previous_duration, _ = measure(
+                build_merge_groups_with_pop, layout_data, files, args.image_topics
+            )
+            previous = f"{previous_duration:.2f}s"
+        del files
+
+        print(
+            f"{frames:>10} {duration:>9.2f}s {duration / frames * 1e6:>10.2f}us {previous:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
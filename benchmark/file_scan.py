@@ -0,0 +1,105 @@
+"""Benchmark listing image and label files of a large generated directory tree"""
+
+import gc
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    sys.path.append(str(Path(__file__).absolute().parent.parent))
+except IndexError:
+    pass
+
+from util import config
+from util.args import ArgumentParserFactory
+from util.files import get_files_with_suffixes
+
+
+def parse_arguments():
+    """
+    Parse command line arguments
+    :return:
+    """
+    factory = ArgumentParserFactory(__doc__)
+    factory.add_image_topics_argument("Image topics of the generated dataset")
+    factory.parser.add_argument(
+        "-n",
+        "--frames",
+        type=int,
+        default=20000,
+        help="Number of generated frames",
+    )
+    factory.parser.add_argument(
+        "--recordings",
+        type=int,
+        default=10,
+        help="Number of subdirectories the frames are distributed to",
+    )
+    factory.add_workers_argument()
+    return factory.parser.parse_args()
+
+
+def generate_tree(output_dir: Path, image_topics, frames: int, recordings: int):
+    """
+    Generate empty image and label files for all topics and frames
+    :param output_dir:
+    :param image_topics:
+    :param frames:
+    :param recordings:
+    :return:
+    """
+    for index in range(frames):
+        recording_dir = output_dir / f"recording_{index % recordings:03d}"
+        recording_dir.mkdir(exist_ok=True)
+        for topic in image_topics:
+            for suffix in (".png", config.LABELME_SUFFIX):
+                (
+                    recording_dir
+                    / (config.MVROI_FILENAME_TEMPLATE % (topic, index, suffix))
+                ).touch()
+
+
+def rglob_files(input_dir: Path, suffix: str, ignore: str):
+    """Previous implementation with one rglob traversal per suffix"""
+    return [
+        file_path
+        for file_path in sorted(input_dir.rglob(f"*{suffix}"))
+        if not re.compile(ignore).match(str(file_path))
+    ]
+
+
+def main():
+    """main"""
+    args = parse_arguments()
+    suffixes = [".png", config.LABELME_SUFFIX]
+    ignore = config.MVROI_LAYOUT_FILE
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_dir = Path(temp_dir)
+        print(f"Generating {args.frames} frames in {input_dir}")
+        generate_tree(input_dir, args.image_topics, args.frames, args.recordings)
+
+        gc.collect()
+        start = time.perf_counter()
+        result = get_files_with_suffixes(input_dir, suffixes, ignore, args.workers)
+        scandir_duration = time.perf_counter() - start
+
+        gc.collect()
+        start = time.perf_counter()
+        expected = {
+            suffix: rglob_files(input_dir, suffix, ignore) for suffix in suffixes
+        }
+        rglob_duration = time.perf_counter() - start
+
+    assert result == expected
+    file_count = sum(len(files) for files in result.values())
+    print(f"Files:                   {file_count}")
+    print(f"rglob per suffix:        {rglob_duration:.2f}s")
+    print(f"scandir single pass:     {scandir_duration:.2f}s")
+    print(f"Speedup:                 {rglob_duration / scandir_duration:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -36,13 +36,19 @@ IMAGE_TOPICS = [
 
 
 def get_return_value_for_merge_patch(
-    input_path=PATH_INDIVIDUAL, hdf5_return_value=False, reindex_return_value=False
+    input_path=PATH_INDIVIDUAL,
+    hdf5_return_value=False,
+    reindex_return_value=False,
+    hdf5_layout="sample",
+    hdf5_encoded=False,
 ):
     """
     Create common argparse return values for test patching
     :param input_path:
     :param hdf5_return_value:
     :param reindex_return_value:
+    :param hdf5_layout:
+    :param hdf5_encoded:
     :return:
     """
     return argparse.Namespace(
@@ -53,7 +59,15 @@ def get_return_value_for_merge_patch(
         image_topics=IMAGE_TOPICS,
         images_per_row=3,
         hdf5=hdf5_return_value,
+        hdf5_layout=hdf5_layout,
+        hdf5_compression="gzip",
+        hdf5_append=False,
+        hdf5_encoded=hdf5_encoded,
         reindex=reindex_return_value,
+        force=False,
+        index=False,
+        index_dir=None,
+        workers=1,
     )
 
 
@@ -90,7 +104,11 @@ class IntegrationTest(unittest.TestCase):
 
     def __check_dir_content(self, path_expected, path_actual):
         expected = os.listdir(path_expected)
-        actual = os.listdir(path_actual)
+        actual = [
+            file_name
+            for file_name in os.listdir(path_actual)
+            if file_name != config.MVROI_MANIFEST_FILE
+        ]
         expected.sort()
         actual.sort()
 
@@ -143,6 +161,44 @@ class IntegrationTest(unittest.TestCase):
         self.__check_json_content(self.PATH_MERGED, TEST_OUTPUT_PATH)
         self.__check_image_content(self.PATH_MERGED, TEST_OUTPUT_PATH)
 
+    def test_merge_index__indexed_input__equal_to_res_merged(self):
+        input_path = TEST_OUTPUT_PATH.joinpath("individual")
+        output_path = TEST_OUTPUT_PATH.joinpath("merged")
+        shutil.copytree(PATH_INDIVIDUAL, input_path)
+        args = get_return_value_for_merge_patch(input_path=input_path)
+        args.output_dir = output_path
+        args.index = True
+
+        with patch("argparse.ArgumentParser.parse_args", MagicMock(return_value=args)):
+            merge.main()
+            args.force = True
+            merge.main()
+
+        self.assertTrue(input_path.joinpath(config.MVROI_INDEX_FILE).exists())
+        self.__check_dir_content(self.PATH_MERGED, output_path)
+        self.__check_json_content(self.PATH_MERGED, output_path)
+        self.__check_image_content(self.PATH_MERGED, output_path)
+
+    @patch(
+        "argparse.ArgumentParser.parse_args",
+        MagicMock(return_value=get_return_value_for_merge_patch()),
+    )
+    def test_merge__second_run__unchanged_frames_skipped(self):
+        merge.main()
+        merged_json = TEST_OUTPUT_PATH.joinpath("merged_000000.json")
+        mtime = merged_json.stat().st_mtime_ns
+
+        merge.main()
+        self.assertEqual(mtime, merged_json.stat().st_mtime_ns)
+
+        merged_image = TEST_OUTPUT_PATH.joinpath("merged_000000.png")
+        merged_image.unlink()
+        merge.main()
+        self.assertTrue(merged_image.exists())
+        self.__check_dir_content(self.PATH_MERGED, TEST_OUTPUT_PATH)
+        self.__check_json_content(self.PATH_MERGED, TEST_OUTPUT_PATH)
+        self.__check_image_content(self.PATH_MERGED, TEST_OUTPUT_PATH)
+
     @patch(
         "argparse.ArgumentParser.parse_args",
         MagicMock(
@@ -150,7 +206,10 @@ class IntegrationTest(unittest.TestCase):
                 input_dir=PATH_MERGED,
                 suffix=".png",
                 output_dir=TEST_OUTPUT_PATH,
-                split_images=True,
+                skip_images=False,
+                index=False,
+                index_dir=None,
+                workers=2,
             )
         ),
     )
@@ -173,6 +232,46 @@ class IntegrationTest(unittest.TestCase):
         self.__check_dir_content(self.PATH_HDF5, TEST_OUTPUT_PATH)
         self.__check_hdf5_content(self.PATH_HDF5, TEST_OUTPUT_PATH)
 
+    def test_merge_hdf5_packed__extracted__equal_to_res_individual(self):
+        self.__merge_hdf5_and_extract(hdf5_layout="packed")
+
+    def test_merge_hdf5_encoded__extracted__equal_to_res_individual(self):
+        self.__merge_hdf5_and_extract(hdf5_encoded=True)
+
+    def test_merge_hdf5_packed_encoded__extracted__equal_to_res_individual(self):
+        self.__merge_hdf5_and_extract(hdf5_layout="packed", hdf5_encoded=True)
+
+    def __merge_hdf5_and_extract(self, **merge_arguments):
+        with patch(
+            "argparse.ArgumentParser.parse_args",
+            MagicMock(
+                return_value=get_return_value_for_merge_patch(
+                    hdf5_return_value=True, **merge_arguments
+                )
+            ),
+        ):
+            merge.main()
+        with patch(
+            "argparse.ArgumentParser.parse_args",
+            MagicMock(
+                return_value=argparse.Namespace(
+                    h5_files=[
+                        argparse.FileType("r")(
+                            TEST_OUTPUT_PATH.joinpath("individual.h5")
+                        )
+                    ],
+                    output_dir=TEST_OUTPUT_PATH,
+                    workers=1,
+                )
+            ),
+        ):
+            h5_extract.main()
+
+        out_path = TEST_OUTPUT_PATH.joinpath("individual")
+        self.__check_dir_content(PATH_INDIVIDUAL, out_path)
+        self.__check_json_content(PATH_INDIVIDUAL, out_path)
+        self.__check_image_content(PATH_INDIVIDUAL, out_path)
+
     @patch(
         "argparse.ArgumentParser.parse_args",
         MagicMock(
@@ -183,6 +282,7 @@ class IntegrationTest(unittest.TestCase):
                 min_diameter=0.05,
                 bin_threshold=96,
                 res="640x480",
+                workers=2,
             )
         ),
     )
@@ -259,6 +359,7 @@ class IntegrationTest(unittest.TestCase):
             return_value=argparse.Namespace(
                 h5_files=[argparse.FileType("r")(PATH_HDF5.joinpath("individual.h5"))],
                 output_dir=TEST_OUTPUT_PATH,
+                workers=2,
             )
         ),
     )
@@ -278,6 +379,9 @@ class IntegrationTest(unittest.TestCase):
                 camera_config=PATH_CAMERA_CONFIG.joinpath("6_camera_setup.ini"),
                 fov_degree=90,
                 iou_threshold=0.7,
+                index=False,
+                index_dir=None,
+                workers=1,
             )
         ),
     )
@@ -1,9 +1,11 @@
 """Test args module"""
 
+import argparse
 import unittest
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
-from util.args import parse_resolution, user_confirmation
+from util.args import ArgumentParserFactory, parse_resolution, user_confirmation
 
 
 class ArgsTest(unittest.TestCase):
@@ -21,6 +23,26 @@ class ArgsTest(unittest.TestCase):
         result = parse_resolution("10x5")
         self.assertEqual((10, 5), result)
 
+    def test_add_index_argument__index_dir__index_enabled(self):
+        factory = ArgumentParserFactory("")
+        factory.add_index_argument()
+
+        result = factory.parser.parse_args(["--index_dir", "cache"])
+        default_result = factory.parser.parse_args([])
+
+        self.assertTrue(result.index)
+        self.assertEqual(Path("cache"), result.index_dir)
+        self.assertFalse(default_result.index)
+        self.assertIsNone(default_result.index_dir)
+
+    def test_positive_int__positive__int(self):
+        self.assertEqual(64, ArgumentParserFactory.positive_int("64"))
+
+    def test_positive_int__zero_or_negative__raise(self):
+        for value in ("0", "-1"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                ArgumentParserFactory.positive_int(value)
+
 
 if __name__ == "__main__":
     unittest.main()
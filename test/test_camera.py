@@ -1,14 +1,39 @@
 """Camera module test"""
 
+import itertools
 import math
 import unittest
 
+import numpy as np
 from shapely.geometry import Point
 
-from util.camera import RegionOverlap, RoiView, RoiViewPair
+from util.camera import (
+    CameraRig,
+    RegionOverlap,
+    RoiView,
+    RoiViewPair,
+    calculate_translated_roi_x,
+)
 from util.geometry import Circle
 
 
+class ProjectionTest(unittest.TestCase):
+    """ROI Projection Test"""
+
+    def test_calculate_translated_roi_x__array__projected_into_shifted_view(self):
+        x_values = np.array([0, 320, 639])
+
+        result = calculate_translated_roi_x(
+            x_values, math.radians(90), 640, math.pi / 6
+        )
+
+        np.testing.assert_allclose([234.256258, 504.752086, 1506.823884], result)
+
+    def test_calculate_translated_roi_x__empty__empty(self):
+        result = calculate_translated_roi_x(np.array([]), math.pi / 2, 640, 0.1)
+        self.assertEqual(0, len(result))
+
+
 class RegionOverlapTest(unittest.TestCase):
     """Create Region Overlap Test"""
 
@@ -83,7 +108,7 @@ class RoiViewTest(unittest.TestCase):
 
     def test_translate_rois__empty_case__no_roi(self):
         unit = RoiView([], 30.0, 640, 0.3, 90)
-        self.assertEqual([], unit.translate_rois(math.pi / 6))
+        self.assertEqual(0, len(unit.translate_rois(math.pi / 6)))
 
     def test_translate_rois__single_case__one_roi(self):
         unit = RoiView([Circle([100, 300], [110, 300])], 30.0, 640, 0.3, 90)
@@ -132,6 +157,46 @@ class RoiViewTest(unittest.TestCase):
         unit.insert(Circle([200, 300], [210, 300]))
         self.assertEqual(2, len(unit.rois))
 
+    def test_insert_many__empty_case__no_roi_added(self):
+        unit = RoiView([Circle([100, 300], [110, 300])], 30.0, 640, 0.3, 90)
+        unit.insert_many([])
+        self.assertEqual(1, len(unit.rois))
+
+    def test_insert_many__duplicated_candidates__inserted_once(self):
+        unit = RoiView([Circle([100, 300], [110, 300])], 30.0, 640, 0.3, 90)
+        unit.insert_many(
+            [
+                Circle([100, 300], [110, 300]),
+                Circle([200, 300], [210, 300]),
+                Circle([201, 300], [211, 300]),
+                Circle([800, 300], [810, 300]),
+            ]
+        )
+        self.assertEqual(2, len(unit.rois))
+        self.assertEqual(Point(200, 300), unit.rois[1].centroid)
+
+    def test_insert_many__random_candidates__equal_to_sequential_insert(self):
+        rng = np.random.default_rng(0)
+        existing = [
+            Circle(center, center + [rng.uniform(5, 50), 0])
+            for center in rng.uniform(0, 640, (20, 2))
+        ]
+        candidates = [
+            Circle(center, center + [rng.uniform(5, 50), 0])
+            for center in rng.uniform(-100, 740, (200, 2))
+        ]
+        sequential = RoiView(list(existing), 30.0, 640, 0.3, 90)
+        batched = RoiView(list(existing), 30.0, 640, 0.3, 90)
+
+        for candidate in candidates:
+            sequential.insert(candidate)
+        batched.insert_many(candidates)
+
+        self.assertEqual(
+            [roi.to_json() for roi in sequential.rois],
+            [roi.to_json() for roi in batched.rois],
+        )
+
 
 class RoiViewPairTest(unittest.TestCase):
     """Create a Pair of ROI View Test"""
@@ -159,5 +224,81 @@ class RoiViewPairTest(unittest.TestCase):
         self.assertEqual(300, unit_single_right.rois[1].centroid.y)
 
 
+class CameraRigTest(unittest.TestCase):
+    """Camera Rig Test"""
+
+    SIX_CAMERA_CONFIG = {
+        "front": {"yaw": "0"},
+        "front_left": {"yaw": "-60"},
+        "front_right": {"yaw": "60"},
+        "rear": {"yaw": "180"},
+        "rear_left": {"yaw": "-120"},
+        "rear_right": {"yaw": "120"},
+    }
+
+    def test_sync_schedule__no_cameras__empty(self):
+        unit = CameraRig([], math.pi / 2)
+        self.assertFalse(unit.sync_schedule)
+
+    def test_sync_schedule__single_camera__no_self_pair(self):
+        unit = CameraRig([0.0], math.pi / 2)
+        self.assertFalse(unit.sync_schedule)
+
+    def test_sync_schedule__two_overlapping_cameras__both_directions(self):
+        unit = CameraRig([0.2, 0.1], math.pi / 2)
+
+        self.assertEqual(2, len(unit.sync_schedule))
+        self.assertEqual((0, 1), unit.sync_schedule[0][:2])
+        self.assertAlmostEqual(
+            0.1 * RegionOverlap.BIAS, unit.sync_schedule[0].angle_diff
+        )
+        self.assertEqual((1, 0), unit.sync_schedule[1][:2])
+        self.assertAlmostEqual(
+            -0.1 * RegionOverlap.BIAS, unit.sync_schedule[1].angle_diff
+        )
+
+    def test_sync_schedule__opposite_cameras__not_overlapping(self):
+        unit = CameraRig([0.0, math.pi], math.pi / 2)
+        self.assertFalse(unit.sync_schedule)
+
+    def test_from_camera_config__six_cameras__neighbours_scheduled(self):
+        unit = CameraRig.from_camera_config(self.SIX_CAMERA_CONFIG, math.pi / 2)
+
+        self.assertEqual(6, len(unit.camera_positions))
+        self.assertAlmostEqual(-math.pi / 3, unit.camera_positions[1])
+        self.assertEqual(12, len(unit.sync_schedule))
+
+    def test_sync_rois__random_views__equal_to_syncing_all_view_pairs(self):
+        positions = [math.radians(yaw) for yaw in (0, -60, 60, 180, -120, 120)]
+
+        def create_views():
+            rng_views = np.random.default_rng(1)
+            return [
+                RoiView(
+                    [
+                        Circle(center, center + [rng_views.uniform(5, 50), 0])
+                        for center in rng_views.uniform(0, 640, (10, 2))
+                    ],
+                    position,
+                    640,
+                    0.7,
+                    math.pi / 2,
+                )
+                for position in positions
+            ]
+
+        expected = create_views()
+        for left_view, right_view in itertools.product(expected, expected):
+            RoiViewPair(left_view, right_view).sync_rois_between_views()
+        actual = create_views()
+        CameraRig(positions, math.pi / 2).sync_rois(actual)
+
+        for expected_view, actual_view in zip(expected, actual):
+            self.assertEqual(
+                [roi.to_json() for roi in expected_view.rois],
+                [roi.to_json() for roi in actual_view.rois],
+            )
+
+
 if __name__ == "__main__":
     unittest.main()
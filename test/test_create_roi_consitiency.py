@@ -1,14 +1,18 @@
 """Create ROI Constitency Test"""
 
+import json
 import math
 import unittest
 from pathlib import Path
 from typing import Dict, List, Tuple
+from unittest.mock import patch
 
 from pyfakefs.fake_filesystem_unittest import TestCase
 from shapely.geometry import Point
 
 from annotation import create_roi_consistency
+from util.camera import CameraRig
+from util.files import FileModel, read_json
 
 
 class CreateROIConsistencyTest(TestCase):
@@ -113,14 +117,46 @@ class CreateROIConsistencyTest(TestCase):
         left = self.create_dict_with_shapes([], "front_left_000093.png")
         right = self.create_dict_with_shapes([], "front_right_000093.png")
         json_files = [front, left, right]
-        camera_orientation_list = [math.radians(0), math.radians(30), math.radians(-30)]
+        camera_rig = CameraRig(
+            [math.radians(0), math.radians(30), math.radians(-30)], math.radians(90.0)
+        )
         roi_view_list = create_roi_consistency.sync_rois_for_scene(
-            json_files, camera_orientation_list, 0.7, 90.0
+            json_files, camera_rig, 0.7
         )
         self.assertEqual(Point(300, 150), roi_view_list[0][0].centroid)
         self.assertAlmostEqual(124.0855101, roi_view_list[1][0].centroid.x)
         self.assertAlmostEqual(464.64468965, roi_view_list[2][0].centroid.x)
 
+    def test_create_consistent_labels__three_camera__each_file_read_once(self):
+        front = self.create_dict_with_shapes(
+            [self.create_shape((300, 150), (310, 150))]
+        )
+        left = self.create_dict_with_shapes([], "front_left_000093.png")
+        right = self.create_dict_with_shapes([], "front_right_000093.png")
+        file_group = []
+        for json_data in (front, left, right):
+            file_path = Path(json_data["imagePath"]).with_suffix(".json")
+            self.fs.create_file(file_path, contents=json.dumps(json_data))
+            file_group.append(FileModel(file_path))
+        camera_rig = CameraRig(
+            [math.radians(0), math.radians(30), math.radians(-30)], math.radians(90.0)
+        )
+
+        with patch(
+            "annotation.create_roi_consistency.read_json", wraps=read_json
+        ) as read_mock:
+            result = create_roi_consistency.create_consistent_labels(
+                file_group, camera_rig, 0.7
+            )
+
+        self.assertEqual(3, read_mock.call_count)
+        self.assertEqual(
+            ["front_000093.json", "front_left_000093.json", "front_right_000093.json"],
+            [file_name for file_name, _ in result],
+        )
+        for _, json_data in result:
+            self.assertEqual(1, len(json_data["shapes"]))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -2,6 +2,7 @@
 
 import copy
 import json
+import os
 import unittest
 from pathlib import Path
 from typing import List
@@ -9,14 +10,20 @@ from unittest.mock import patch
 
 from pyfakefs.fake_filesystem_unittest import TestCase
 
+from util import config
 from util.files import (
+    DirectoryIndex,
     FileGrouper,
     FileModel,
     FileReindexer,
+    FileTable,
     ImageLayoutModel,
+    Layout,
     MergeGroup,
     ScenarioGrouper,
+    get_file_models_with_suffixes,
     get_files_with_suffix,
+    get_files_with_suffixes,
 )
 
 TEST_LAYOUT_SINGLE = json.loads(
@@ -98,6 +105,123 @@ class FilesTest(TestCase):
         result = get_files_with_suffix(Path("test"), ".json", ignore="test/layout.json")
         self.assertFalse(result)
 
+    def test_get_files_with_suffix__nested_dirs__same_as_rglob(self):
+        self.__create_test_files(Path("test/b/c"), self.TEST_DIR_CONTENT)
+        self.__create_test_files(Path("test/a-b"), self.MULTI_NAME_TEST_CONTENT)
+        self.fs.create_file("test/x.json")
+        self.fs.create_file("test/a.png")
+        self.fs.create_dir("test/dir.json")
+        self.fs.create_symlink("test/link", "test/b")
+
+        for workers in (1, 3):
+            result = get_files_with_suffix(Path("test"), ".json", workers=workers)
+            self.assertListEqual(sorted(Path("test").rglob("*.json")), result)
+
+    def test_get_files_with_suffixes__two_suffixes__files_per_suffix(self):
+        self.__create_test_files(Path("test/sub"), self.TEST_DIR_CONTENT)
+
+        result = get_files_with_suffixes(
+            Path("test"), [".png", ".json"], ignore=".*rear_0"
+        )
+
+        self.assertEqual([Path("test/sub/rear_right_000012.png")], result[".png"])
+        self.assertEqual([Path("test/sub/front_right_000047.json")], result[".json"])
+
+    def test_get_files_with_suffix__not_existing_dir__no_files(self):
+        self.assertFalse(get_files_with_suffix(Path("missing"), ".json", workers=2))
+
+
+class DirectoryIndexTest(TestCase):
+    """Directory Index Test"""
+
+    TEST_DIR = Path("/recording")
+
+    def setUp(self) -> None:
+        self.setUpPyfakefs()
+        self.fs.create_file(self.TEST_DIR / "front_000001.png", contents="12345")
+        self.fs.create_file(self.TEST_DIR / "layout.json")
+        self.fs.create_dir(self.TEST_DIR / "sub")
+
+    def test_constructor__no_index__index_file_written(self):
+        unit = DirectoryIndex(self.TEST_DIR)
+
+        self.assertTrue(unit.index_path.exists())
+        self.assertEqual(["sub"], unit.directories)
+        self.assertEqual(
+            {
+                ("front_000001.png", "front", 1, ".png"),
+                ("layout.json", None, None, ".json"),
+            },
+            set(unit.files),
+        )
+
+    def test_constructor__index_dir__index_file_written_to_index_dir(self):
+        index_dir = Path("/cache/index")
+
+        unit = DirectoryIndex(self.TEST_DIR, index_dir)
+        DirectoryIndex(self.TEST_DIR / "sub", index_dir)
+
+        self.assertEqual(index_dir, unit.index_path.parent)
+        self.assertEqual(2, len(list(index_dir.iterdir())))
+        self.assertFalse(self.TEST_DIR.joinpath(config.MVROI_INDEX_FILE).exists())
+        with patch("util.files.scan_directory_entries") as scan_mock:
+            self.assertEqual(2, len(DirectoryIndex(self.TEST_DIR, index_dir).files))
+        scan_mock.assert_not_called()
+
+    def test_get_files_with_suffix__without_index__no_index_file_written(self):
+        get_files_with_suffix(self.TEST_DIR, ".json")
+        self.assertFalse(self.TEST_DIR.joinpath(config.MVROI_INDEX_FILE).exists())
+
+    def test_constructor__unchanged_directory__directory_not_scanned(self):
+        DirectoryIndex(self.TEST_DIR)
+
+        with patch("util.files.scan_directory_entries") as scan_mock:
+            unit = DirectoryIndex(self.TEST_DIR)
+
+        scan_mock.assert_not_called()
+        self.assertEqual(2, len(unit.files))
+
+    def test_constructor__file_added__index_rebuilt(self):
+        DirectoryIndex(self.TEST_DIR)
+        self.fs.create_file(self.TEST_DIR / "rear_000001.png")
+        # the fake file system does not update the directory mtime
+        os.utime(self.TEST_DIR, ns=(0, 0))
+
+        unit = DirectoryIndex(self.TEST_DIR)
+
+        self.assertIn("rear_000001.png", [entry.name for entry in unit.files])
+
+    def test_get_files_with_suffix__use_index__same_as_scan(self):
+        self.fs.create_file(self.TEST_DIR / "sub" / "rear_000000.json")
+        self.fs.create_file(self.TEST_DIR / "sub" / "rear_000001.json")
+
+        expected = get_files_with_suffix(self.TEST_DIR, ".json")
+        result = get_files_with_suffix(self.TEST_DIR, ".json", use_index=True)
+        cached_result = get_files_with_suffix(self.TEST_DIR, ".json", use_index=True)
+
+        self.assertEqual(3, len(expected))
+        self.assertEqual(expected, result)
+        self.assertEqual(expected, cached_result)
+
+    def test_get_file_models_with_suffixes__valid_names__names_not_parsed_again(self):
+        self.fs.create_file(self.TEST_DIR / "front_000000.png")
+        DirectoryIndex(self.TEST_DIR)
+
+        with patch("util.files.FileModel.parse_name") as parse_mock:
+            result = get_file_models_with_suffixes(self.TEST_DIR, [".png"])[".png"]
+
+        parse_mock.assert_not_called()
+        self.assertEqual([0, 1], [file_model.file_index for file_model in result])
+        self.assertEqual("/recording/front_000000.png", str(result[0].file_path))
+        with patch("util.files.FileModel.parse_name") as parse_mock:
+            file_groups = FileGrouper.group_files_by_keys(result, ["front"])
+
+        parse_mock.assert_not_called()
+        self.assertEqual(
+            [file_model.file_path for file_model in result],
+            [file_model.file_path for file_model in file_groups["front"]],
+        )
+
 
 class FileModelTest(unittest.TestCase):
     """Merge Test"""
@@ -144,6 +268,68 @@ class FileModelTest(unittest.TestCase):
         self.assertLess(one, two)
 
 
+class FileTableTest(unittest.TestCase):
+    """File Table Test"""
+
+    TEST_FILES = [
+        "rear_000001.png",
+        "front_000001.png",
+        "front_000000.png",
+        "rear_000000.png",
+    ]
+
+    def test_from_files__file_names__columns_parsed(self):
+        unit = FileTable.from_files(self.TEST_FILES)
+
+        self.assertEqual(["rear", "front"], unit.topics)
+        self.assertEqual([0, 1, 1, 0], unit.topic_ids.tolist())
+        self.assertEqual([1, 1, 0, 0], unit.frame_indices.tolist())
+
+    def test_from_files__invalid_name__raise_error(self):
+        with self.assertRaises(ValueError):
+            FileTable.from_files(["invalid.png"])
+
+    def test_getitem__index__file_model(self):
+        result = FileTable.from_files(self.TEST_FILES)[1]
+
+        self.assertEqual(Path("front_000001.png"), result.file_path)
+        self.assertEqual("front", result.topic_name)
+        self.assertEqual(1, result.file_index)
+
+    def test_group_by_keys__unsorted_files__sorted_by_frame_index(self):
+        result = FileTable.from_files(self.TEST_FILES).group_by_keys(
+            ["front", "rear", "left"]
+        )
+
+        self.assertEqual(
+            ["front_000000.png", "front_000001.png"],
+            [file.file_path.name for file in result["front"]],
+        )
+        self.assertEqual([0, 1], result["rear"].frame_indices.tolist())
+        self.assertEqual(0, len(result["left"]))
+
+    def test_group_by_frame_index__unsorted_files__grouped_in_table_order(self):
+        result = FileTable.from_files(self.TEST_FILES).group_by_frame_index()
+
+        self.assertEqual([0, 1], list(result))
+        self.assertEqual(
+            ["front_000000.png", "rear_000000.png"],
+            [file.file_path.name for file in result[0]],
+        )
+
+    def test_is_consecutive__gap__false(self):
+        unit = FileTable.from_files(["front_000000.png", "front_000002.png"])
+
+        self.assertFalse(FileTable.is_consecutive(unit.group_by_keys(["front"])))
+
+    def test_has_same_lengths__different_lengths__false(self):
+        unit = FileTable.from_files(self.TEST_FILES + ["rear_000002.png"])
+
+        self.assertFalse(
+            FileTable.has_same_lengths(unit.group_by_keys(["front", "rear"]))
+        )
+
+
 class ImageLayoutModelTest(unittest.TestCase):
     """Image Layout Test"""
 
@@ -172,6 +358,57 @@ class ImageLayoutModelTest(unittest.TestCase):
         self.assertFalse(unit.is_inside(15, 25))  # both outside
 
 
+class LayoutTest(unittest.TestCase):
+    """Layout Test"""
+
+    TEST_LAYOUT = {
+        "width": 20,
+        "height": 15,
+        "layout": [
+            {"camera": "left", "location": {"y": 0, "x": 0, "width": 10, "height": 15}},
+            {
+                "camera": "right",
+                "location": {"y": 0, "x": 10, "width": 10, "height": 15},
+            },
+        ],
+    }
+
+    def test_properties__test_layout__correct_keys_and_boxes(self):
+        unit = Layout(self.TEST_LAYOUT)
+
+        self.assertEqual(("left", "right"), unit.keys)
+        self.assertEqual([[0, 0, 10, 15], [10, 0, 20, 15]], unit.boxes.tolist())
+        self.assertEqual((20, 15), (unit.width, unit.height))
+        self.assertEqual((10, 0), unit[1].top_left)
+
+    def test_boxes__write__raise_error(self):
+        unit = Layout(self.TEST_LAYOUT)
+
+        with self.assertRaises(ValueError):
+            unit.boxes[0, 0] = 1
+
+    def test_locate__points__view_index_or_minus_one(self):
+        unit = Layout(self.TEST_LAYOUT)
+
+        result = unit.locate([[5, 5], [15, 5], [10, 5], [25, 5], [5, 0]])
+
+        self.assertEqual([0, 1, -1, -1, -1], result.tolist())
+
+    def test_locate__points__same_as_is_inside(self):
+        unit = Layout(self.TEST_LAYOUT)
+        points = [[x, y] for x in range(-1, 22, 3) for y in range(-1, 17, 2)]
+
+        result = unit.contains(points)
+
+        expected = [
+            [image_layout.is_inside(x, y) for image_layout in unit] for x, y in points
+        ]
+        self.assertEqual(expected, result.tolist())
+
+    def test_locate__no_points__empty(self):
+        self.assertEqual(0, len(Layout(self.TEST_LAYOUT).locate([])))
+
+
 class MergeGroupTest(unittest.TestCase):
     """Merge Group Test"""
 
@@ -190,6 +427,15 @@ class MergeGroupTest(unittest.TestCase):
         unit = MergeGroup(TEST_LAYOUT_SINGLE, files_dict)
         self.assertEqual("front_00.png", unit.get_file_path_by_key("front").name)
 
+    def test_constructor__shared_layout__layout_not_recreated(self):
+        layout = Layout(TEST_LAYOUT_SINGLE)
+        with patch("util.files.ImageLayoutModel") as layout_mock:
+            unit = MergeGroup(layout, {"front": None})
+
+        layout_mock.assert_not_called()
+        self.assertIs(layout, unit.layout)
+        self.assertEqual(("front",), unit.keys)
+
 
 class FileReindexerTest(unittest.TestCase):
     """File Reindexer Test"""
@@ -345,6 +591,24 @@ class FileGrouperTest(unittest.TestCase):
         result = unit.merge_groups
         self.assertEqual(1, len(result))
 
+    def test_merge_groups__unordered_files__one_group_per_frame_with_shared_layouts(
+        self,
+    ):
+        test_files = [
+            f"{key}_{index:06d}.png" for index in (2, 0, 1) for key in self.TEST_KEYS
+        ]
+        unit = FileGrouper(self.TEST_LAYOUT, test_files, self.TEST_KEYS)
+
+        result = unit.merge_groups
+
+        self.assertEqual(3, len(result))
+        for index, merge_group in enumerate(result):
+            self.assertEqual(tuple(self.TEST_KEYS), merge_group.keys)
+            self.assertEqual(
+                f"rear_{index:06d}.png", merge_group.get_file_path_by_key("rear").name
+            )
+            self.assertIs(result[0].layout, merge_group.layout)
+
     def test_group_files_by_keys__no_keys__empty_dict(self):
         result = FileGrouper.group_files_by_keys([], [])
         self.assertFalse(result)
@@ -1,17 +1,25 @@
 """Generate Pseudo Label Test"""
+import math
+import tempfile
 import unittest
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import numpy as np
+import PIL.Image
+
 from annotation import generate_pseudo_label
 from util.geometry import Circle
+from util.heatmaps import HeatmapStack
 
 
 class GeneratePseudoLabelTest(unittest.TestCase):
     """Generate Pseudo Label Test"""
 
     def test_create_pseudo_labels__no_files__empty(self):
-        result = generate_pseudo_label.create_pseudo_labels([], 0, 0, 0, 0, ".png")
+        result = list(
+            generate_pseudo_label.create_pseudo_labels([], 0, 0, 0, 0, ".png")
+        )
         self.assertFalse(result)
 
     @patch("PIL.Image.open", MagicMock())
@@ -21,8 +29,10 @@ class GeneratePseudoLabelTest(unittest.TestCase):
     def test_create_pseudo_labels__one_file__correct_image_dimensions_and_label_path(
         self, mock_bin, mock_roi, mock_shapes
     ):
-        result = generate_pseudo_label.create_pseudo_labels(
-            [Path("test.png")], 640, 480, 96, 0.05, ".png"
+        result = list(
+            generate_pseudo_label.create_pseudo_labels(
+                [Path("test.png")], 640, 480, 96, 0.05, ".png"
+            )
         )
         path, data = result[0]
 
@@ -36,6 +46,7 @@ class GeneratePseudoLabelTest(unittest.TestCase):
         mock_shapes.assert_called_once()
 
     @patch("PIL.Image.open", MagicMock())
+    @patch("annotation.generate_pseudo_label.binarize_image", MagicMock())
     @patch(
         "annotation.generate_pseudo_label.get_roi_circles_from_bin_image",
         MagicMock(
@@ -43,12 +54,109 @@ class GeneratePseudoLabelTest(unittest.TestCase):
         ),
     )
     def test_create_pseudo_labels__one_file_with_two_shapes__correct_shapes(self):
-        result = generate_pseudo_label.create_pseudo_labels(
-            [Path("test.png")], 640, 480, 96, 0.05, ".png"
-        )[0][1]
+        result = next(
+            generate_pseudo_label.create_pseudo_labels(
+                [Path("test.png")], 640, 480, 96, 0.05, ".png"
+            )
+        )[1]
 
         self.assertEqual(2, len(result["shapes"]))
 
+    def test_create_pseudo_labels__two_workers__same_labels_in_file_order(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            heatmap_files = []
+            for index in range(4):
+                heatmap = np.zeros((20, 40), dtype=np.uint8)
+                columns = slice(index * 5, index * 5 + 10)
+                heatmap[5:15, columns] = 255
+                heatmap_files.append(Path(temp_dir) / f"front_{index:06d}.png")
+                PIL.Image.fromarray(heatmap).save(heatmap_files[-1])
+
+            expected = list(
+                generate_pseudo_label.create_pseudo_labels(
+                    heatmap_files, 80, 40, 96, 0.05, ".png"
+                )
+            )
+            result = list(
+                generate_pseudo_label.create_pseudo_labels(
+                    heatmap_files, 80, 40, 96, 0.05, ".png", workers=2
+                )
+            )
+
+        self.assertEqual(
+            [f"front_{index:06d}.json" for index in range(4)],
+            [path for path, _ in result],
+        )
+        self.assertEqual(expected, result)
+        self.assertEqual(
+            [[19.0, 19.0], [19.0 + math.sqrt(400 / math.pi), 19.0]],
+            result[1][1]["shapes"][0]["points"],
+        )
+
+    def test_create_pseudo_labels_from_stack__chunks__equal_to_heatmap_files(self):
+        rng = np.random.default_rng(0)
+        heatmaps = rng.integers(0, 256, (5, 20, 40), dtype=np.uint8)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            heatmap_files = []
+            for index, heatmap in enumerate(heatmaps):
+                heatmap_files.append(Path(temp_dir) / f"front_{index:06d}.png")
+                PIL.Image.fromarray(heatmap).save(heatmap_files[-1])
+            stack_path = Path(temp_dir) / "heatmaps.npz"
+            np.savez(
+                stack_path,
+                heatmaps=heatmaps,
+                names=[heatmap_file.stem for heatmap_file in heatmap_files],
+            )
+
+            expected = list(
+                generate_pseudo_label.create_pseudo_labels(
+                    heatmap_files, 80, 40, 200, 0.01, ".png"
+                )
+            )
+            result = list(
+                generate_pseudo_label.create_pseudo_labels_from_stack(
+                    HeatmapStack(stack_path), 80, 40, 200, 0.01, ".png", chunk_size=2
+                )
+            )
+
+        self.assertTrue(any(data["shapes"] for _, data in result))
+        self.assertEqual(expected, result)
+
+    def test_binarize_heatmaps__float_heatmaps__scaled_threshold(self):
+        heatmaps = np.array([[[0.0, 95 / 255, 96 / 255, 1.0]]])
+
+        result = generate_pseudo_label.binarize_heatmaps(heatmaps, 96)
+
+        self.assertEqual([[[False, False, True, True]]], result.tolist())
+
+    def test_binarize_image__gray_values__true_from_threshold(self):
+        image = PIL.Image.fromarray(np.array([[0, 95, 96, 255]], dtype=np.uint8))
+
+        result = generate_pseudo_label.binarize_image(image, 96)
+
+        self.assertEqual([[False, False, True, True]], result.tolist())
+
+    def test_get_roi_circles_from_bin_image__components__centroid_and_diameter(self):
+        bin_image = np.zeros((10, 20), dtype=bool)
+        bin_image[1:3, 1:3] = True
+        bin_image[3, 3] = True  # diagonal neighbour of the first component
+        bin_image[6:9, 10:16] = True
+        bin_image[0, 19] = True  # too small
+
+        result = generate_pseudo_label.get_roi_circles_from_bin_image(bin_image, 0.1)
+
+        self.assertEqual(2, len(result))
+        self.assertEqual([[1.8, 1.8], [12.5, 7.0]], result.centroids.tolist())
+        self.assertAlmostEqual(math.sqrt(4 * 5 / math.pi) / 2, result.radii[0])
+        self.assertAlmostEqual(math.sqrt(4 * 18 / math.pi) / 2, result.radii[1])
+
+    def test_get_roi_circles_from_bin_image__empty_image__no_circles(self):
+        result = generate_pseudo_label.get_roi_circles_from_bin_image(
+            np.zeros((10, 20), dtype=bool), 0.05
+        )
+
+        self.assertEqual(0, len(result))
+
 
 if __name__ == "__main__":
     unittest.main()
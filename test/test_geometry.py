@@ -1,11 +1,14 @@
 """Shapes Test"""
 
 import copy
+import math
 import unittest
 
+import numpy as np
+
 from util import geometry
 from util.files import ImageLayoutModel
-from util.geometry import Circle
+from util.geometry import Circle, CircleArray
 
 
 class GeometryTest(unittest.TestCase):
@@ -29,6 +32,38 @@ class GeometryTest(unittest.TestCase):
         result = geometry.shift_label_points(copy.deepcopy(self.TEST_SHAPES), 10, 20)
         self.assertEqual([[30, 50], [40, 65.67]], result["shapes"][0]["points"])
 
+    def test_scale_label_points__no_scale__same_as_input(self):
+        result = geometry.scale_label_points(copy.deepcopy(self.TEST_SHAPES), 1, 1)
+        self.assertEqual(self.TEST_SHAPES, result)
+
+    def test_scale_label_points__half_and_double__correct(self):
+        result = geometry.scale_label_points(copy.deepcopy(self.TEST_SHAPES), 0.5, 2)
+        self.assertEqual([[10, 60], [15, 91.34]], result["shapes"][0]["points"])
+
+    def test_shift_shapes__polygon_and_point__all_points_shifted(self):
+        label_data = {
+            "shapes": [
+                {"shape_type": "polygon", "points": [[0, 0], [10, 0], [5, 5]]},
+                {"shape_type": "point", "points": [[1, 2]]},
+                {"shape_type": "polygon", "points": [[0, 1], [2, 3], [4, 5]]},
+            ]
+        }
+
+        result = geometry.shift_label_points(label_data, 10, 20)
+
+        self.assertEqual(
+            [
+                [[10, 20], [20, 20], [15, 25]],
+                [[11, 22]],
+                [[10, 21], [12, 23], [14, 25]],
+            ],
+            [shape["points"] for shape in result["shapes"]],
+        )
+
+    def test_scale_label_points__no_shapes__empty_shapes(self):
+        result = geometry.scale_label_points({"shapes": []}, 0.5, 2)
+        self.assertEqual({"shapes": []}, result)
+
     def test_is_shape_inside__all_inside__true(self):
         result = geometry.is_shape_inside(
             self.TEST_SHAPES["shapes"][0], ImageLayoutModel.create("", 0, 0, 100, 100)
@@ -123,6 +158,134 @@ class CircleTest(unittest.TestCase):
 
         self.assertEqual(0, unit.iou(Circle((10, 1), (12, 1))))
 
+    def test_iou__contained_case__ratio_of_areas(self):
+        unit = Circle((1, 1), (3, 1))
+
+        self.assertAlmostEqual(0.25, unit.iou(Circle((1, 1), (2, 1))))
+        self.assertAlmostEqual(0.25, unit.iou(Circle((1.5, 1), (2.5, 1))))
+
+    def test_iou__unit_circles_with_distance_one__exact_lens_area(self):
+        unit = Circle((0, 0), (1, 0))
+        lens_area = 2 * math.pi / 3 - math.sqrt(3) / 2
+
+        self.assertAlmostEqual(
+            lens_area / (2 * math.pi - lens_area), unit.iou(Circle((1, 0), (1, 1)))
+        )
+
+    def test_iou__zero_radius__zero(self):
+        unit = Circle((1, 1), (1, 1))
+
+        self.assertEqual(0, unit.iou(Circle((1, 1), (1, 1))))
+
+    def test_iou__random_circles__close_to_shapely_polygon_iou(self):
+        def shapely_iou(one, two):
+            first = one.centroid.buffer(one.radius)
+            second = two.centroid.buffer(two.radius)
+            return first.intersection(second).area / first.union(second).area
+
+        rng = np.random.default_rng(42)
+        for _ in range(200):
+            one = Circle(rng.uniform(0, 100, 2), rng.uniform(0, 100, 2))
+            two = Circle(rng.uniform(0, 100, 2), rng.uniform(0, 100, 2))
+            self.assertAlmostEqual(shapely_iou(one, two), one.iou(two), delta=0.005)
+
+
+class CircleArrayTest(unittest.TestCase):
+    """Circle Array Test"""
+
+    TEST_POINTS = [[[20, 30], [30, 45.67]], [[0, 0], [1, 0]]]
+
+    def test_from_json__three_points__raise(self):
+        with self.assertRaises(ValueError):
+            CircleArray.from_json([[[0, 0], [1, 0], [1, 1]], [[2, 2], [3, 2], [3, 3]]])
+
+    def test_from_json__empty__length_zero(self):
+        unit = CircleArray.from_json([])
+
+        self.assertEqual(0, len(unit))
+        self.assertEqual([], unit.to_json())
+
+    def test_to_json__test_points__equal_to_test_points(self):
+        unit = CircleArray.from_json(self.TEST_POINTS)
+
+        self.assertEqual(self.TEST_POINTS, unit.to_json())
+
+    def test_from_circles__two_circles__same_json(self):
+        unit = CircleArray.from_circles([Circle.from_json(p) for p in self.TEST_POINTS])
+
+        self.assertEqual(self.TEST_POINTS, unit.to_json())
+
+    def test_getitem__second_element__view_on_array(self):
+        unit = CircleArray.from_json(self.TEST_POINTS)
+        circle = unit[1]
+        circle.translate(2, 3)
+
+        self.assertEqual([[2, 3], [3, 3]], unit.to_json()[1])
+        self.assertEqual(2, unit[-1].centroid.x)
+
+    def test_getitem__out_of_range__raise(self):
+        with self.assertRaises(IndexError):
+            CircleArray.from_json(self.TEST_POINTS)[2]
+
+    def test_translate__scalar__all_translated(self):
+        unit = CircleArray.from_json(self.TEST_POINTS)
+        unit.translate(10, 20)
+
+        self.assertEqual([[30, 50], [40, 65.67]], unit.to_json()[0])
+        self.assertEqual([[10, 20], [11, 20]], unit.to_json()[1])
+
+    def test_translate__array__translated_per_circle(self):
+        unit = CircleArray.from_json(self.TEST_POINTS)
+        unit.translate(np.array([1, 2]), 0)
+
+        self.assertEqual([21, 30], unit.to_json()[0][0])
+        self.assertEqual([2, 0], unit.to_json()[1][0])
+
+    def test_scale__downscale__correct(self):
+        unit = CircleArray.from_json(self.TEST_POINTS)
+        unit.scale(0.5, 0.25)
+
+        self.assertEqual([10, 7.5], unit.to_json()[0][0])
+
+    def test_radii__test_points__equal_to_circle_radius(self):
+        unit = CircleArray.from_json(self.TEST_POINTS)
+
+        for circle, radius in zip(unit, unit.radii):
+            self.assertEqual(circle.radius, radius)
+
+    def test_bounding_boxes__test_points__equal_to_circle_bounding_box(self):
+        unit = CircleArray.from_json(self.TEST_POINTS)
+
+        for circle, box in zip(unit, unit.bounding_boxes):
+            self.assertEqual(circle.bounding_box, box.tolist())
+
+    def test_iou__same_and_distant_circle__one_and_zero(self):
+        unit = CircleArray.from_json([[[1, 1], [2, 1]], [[10, 1], [12, 1]]])
+
+        self.assertEqual([1, 0], unit.iou(Circle((1, 1), (2, 1))).tolist())
+
+    def test_pairwise_iou__test_points__matrix_equal_to_circle_iou(self):
+        unit = CircleArray.from_json(self.TEST_POINTS)
+        others = CircleArray.from_json([[[25, 35], [30, 40]], [[0, 0], [1, 0]]])
+
+        result = unit.pairwise_iou(others)
+
+        self.assertEqual((2, 2), result.shape)
+        for i, j in np.ndindex(result.shape):
+            self.assertEqual(unit[i].iou(others[j]), result[i, j])
+
+    def test_pairwise_iou__empty__empty_matrix(self):
+        unit = CircleArray.from_json(self.TEST_POINTS)
+
+        self.assertEqual((2, 0), unit.pairwise_iou(CircleArray.from_json([])).shape)
+
+    def test_iou__test_points__equal_to_circle_iou(self):
+        unit = CircleArray.from_json(self.TEST_POINTS)
+        circle = Circle((25, 35), (30, 40))
+
+        for element, iou in zip(unit, unit.iou(circle)):
+            self.assertAlmostEqual(element.iou(circle), iou)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,12 +1,72 @@
 """Test h5 module"""
 
+import io
+import json
+import tempfile
 import unittest
-from unittest.mock import MagicMock, patch
+from pathlib import Path
+from unittest.mock import MagicMock, PropertyMock, patch
 
+import h5py
+import numpy as np
 import PIL.Image
 
 from util import config
-from util.h5 import HDF5Extractor, HDF5Wrapper
+from util.h5 import (
+    HDF5Dataset,
+    HDF5Extractor,
+    HDF5Wrapper,
+    HDF5Writer,
+    PackedHDF5Writer,
+)
+
+TEST_TOPICS = ["front", "rear"]
+TEST_JSON = (
+    '{"imagePath": "test.png", '
+    '"shapes": [{"points": [[1, 2], [3, 2]]}, {"points": [[5, 5], [6, 5]]}]}'
+)
+
+
+def create_merge_group(topics, json_string=TEST_JSON, file_path=None):
+    """
+    Mock a merge group with the same file for all topics
+    :param topics:
+    :param json_string: Content of the mocked file
+    :param file_path: Existing file used instead of the mocked file
+    :return:
+    """
+    if file_path is None:
+        file_path = MagicMock()
+        file_path.read_text.return_value = json_string
+    merge_group = MagicMock()
+    merge_group.keys = topics
+    merge_group.get_file_path_by_key.return_value = file_path
+    return merge_group
+
+
+def write_samples(h5_file, writer_class, sample_count, image_path=None, **kwargs):
+    """
+    Write samples of all test topics, the writer is closed when returning
+    :param h5_file:
+    :param writer_class: HDF5Writer or PackedHDF5Writer
+    :param sample_count:
+    :param image_path: Existing image file, PIL.Image.open has to be mocked otherwise
+    :param kwargs: Writer arguments
+    :return: h5_file
+    """
+    writer = writer_class(h5_file, **kwargs)
+    roi_group = create_merge_group(TEST_TOPICS)
+    image_group = roi_group
+    if image_path is not None:
+        image_group = create_merge_group(TEST_TOPICS, file_path=image_path)
+    for index in range(sample_count):
+        writer.add_image_group(index, image_group)
+        writer.add_roi_group(index, roi_group)
+    return h5_file
+
+
+def create_h5_file(writer_class, sample_count, **kwargs) -> io.BytesIO:
+    return write_samples(io.BytesIO(), writer_class, sample_count, **kwargs)
 
 
 class HDF5WrapperTest(unittest.TestCase):
@@ -41,22 +101,6 @@ class HDF5WrapperTest(unittest.TestCase):
 class HDF5extractorTest(unittest.TestCase):
     """HDF5 Extractor Test"""
 
-    def test_get_image_data__empty_sample__image_data_empty(self):
-        result = HDF5Extractor.get_image_data({})
-        self.assertFalse(result)
-
-    @patch(
-        "PIL.Image.fromarray",
-        MagicMock(return_value=PIL.Image.new(config.IMAGE_FORMAT, (10, 5))),
-    )
-    def test_get_image_data__two_keys_in_sample__image_data_size_correct(self):
-        result = HDF5Extractor.get_image_data(
-            {"front": MagicMock(), "rear": MagicMock()},
-        )
-
-        self.assertEqual(2, len(result))
-        self.assertEqual((10, 5), result[0].size)
-
     def test_get_json_data__empty_sample__json_data_empty(self):
         result = HDF5Extractor.get_roi_data({}, 0)
         self.assertFalse(result)
@@ -71,5 +115,372 @@ class HDF5extractorTest(unittest.TestCase):
         self.assertEqual(0, result[0][0]["a"])
 
 
+class PackedHDF5WriterTest(unittest.TestCase):
+    """Packed HDF5 Writer Test"""
+
+    @patch(
+        "PIL.Image.open",
+        MagicMock(return_value=PIL.Image.new(config.IMAGE_FORMAT, (10, 5))),
+    )
+    def test_add_image_group__two_samples__one_chunked_dataset_per_topic(self):
+        h5_file = create_h5_file(PackedHDF5Writer, 2, compression="lzf")
+
+        with h5py.File(h5_file, "r") as result:
+            self.assertEqual(
+                HDF5Wrapper.PACKED_LAYOUT_VERSION, result.attrs[HDF5Wrapper.VERSION_KEY]
+            )
+            self.assertEqual(set(TEST_TOPICS), set(result["image"].keys()))
+            self.assertEqual((2, 5, 10, 3), result["image/front"].shape)
+            self.assertEqual((1, 5, 10, 3), result["image/front"].chunks)
+            self.assertEqual("lzf", result["image/front"].compression)
+            self.assertEqual("uint8", result["image/front"].dtype)
+            self.assertEqual((2,), result["roi/rear"].shape)
+
+    @patch(
+        "PIL.Image.open",
+        MagicMock(return_value=PIL.Image.new(config.IMAGE_FORMAT, (10, 5))),
+    )
+    def test_constructor__append__samples_appended(self):
+        h5_file = create_h5_file(PackedHDF5Writer, 2)
+        write_samples(h5_file, PackedHDF5Writer, 1, append=True)
+
+        with h5py.File(h5_file, "r") as result:
+            self.assertEqual((3, 5, 10, 3), result["image/front"].shape)
+            self.assertEqual((3,), result["roi/front"].shape)
+
+    def test_constructor__append_to_sample_layout__raise(self):
+        h5_file = io.BytesIO()
+        with h5py.File(h5_file, "w") as sample_layout:
+            sample_layout.create_group(HDF5Wrapper.sample_key(0))
+
+        with self.assertRaises(ValueError):
+            PackedHDF5Writer(h5_file, append=True)
+
+    def test_add_image_group__different_image_size__raise(self):
+        writer = PackedHDF5Writer(io.BytesIO())
+        merge_group = create_merge_group(["front"])
+
+        with patch("PIL.Image.open", return_value=PIL.Image.new("RGB", (10, 5))):
+            writer.add_image_group(0, merge_group)
+        with patch("PIL.Image.open", return_value=PIL.Image.new("RGB", (5, 5))):
+            with self.assertRaises(ValueError):
+                writer.add_image_group(1, merge_group)
+
+    @patch(
+        "PIL.Image.open",
+        MagicMock(return_value=PIL.Image.new(config.IMAGE_FORMAT, (10, 5))),
+    )
+    def test_extractor_samples__packed_layout__all_samples(self):
+        unit = HDF5Extractor(create_h5_file(PackedHDF5Writer, 3))
+
+        result = list(unit.samples())
+
+        self.assertEqual(3, len(unit))
+        self.assertEqual([0, 1, 2], [index for index, _, _ in result])
+        self.assertEqual({"front", "rear"}, result[1][1].keys())
+        self.assertEqual((5, 10, 3), result[1][1]["rear"].shape)
+        self.assertEqual(
+            [(json.loads(TEST_JSON), "front_000002.json")],
+            HDF5Extractor.get_roi_data(result[2][2], 2)[:1],
+        )
+
+
+@patch(
+    "PIL.Image.open",
+    MagicMock(return_value=PIL.Image.new(config.IMAGE_FORMAT, (10, 5))),
+)
+class HDF5WriterTest(unittest.TestCase):
+    """HDF5 Writer Test"""
+
+    def test_constructor__append__samples_appended(self):
+        h5_file = create_h5_file(HDF5Writer, 2)
+        write_samples(h5_file, HDF5Writer, 1, append=True)
+
+        with h5py.File(h5_file, "r") as result:
+            self.assertEqual(
+                [HDF5Wrapper.sample_key(index) for index in range(3)],
+                list(result.keys()),
+            )
+            self.assertEqual(
+                set(TEST_TOPICS), set(result[HDF5Wrapper.sample_key(2)]["roi"])
+            )
+
+    def test_constructor__append_to_packed_layout__raise(self):
+        h5_file = create_h5_file(PackedHDF5Writer, 1)
+
+        with self.assertRaises(ValueError):
+            HDF5Writer(h5_file, append=True)
+
+    def test_constructor__append_encoded_to_decoded__raise(self):
+        h5_file = create_h5_file(HDF5Writer, 1)
+
+        with self.assertRaises(ValueError):
+            HDF5Writer(h5_file, encoded=True, append=True)
+
+
+@patch(
+    "PIL.Image.open",
+    MagicMock(return_value=PIL.Image.new(config.IMAGE_FORMAT, (10, 5), (1, 2, 3))),
+)
+class HDF5DatasetTest(unittest.TestCase):
+    """HDF5 Dataset Test"""
+
+    def test_len__both_layouts__sample_count(self):
+        for writer_class in (HDF5Writer, PackedHDF5Writer):
+            unit = HDF5Dataset(create_h5_file(writer_class, 3))
+            self.assertEqual(3, len(unit))
+
+    def test_getitem__index__image_array_and_rois_per_topic(self):
+        for writer_class in (HDF5Writer, PackedHDF5Writer):
+            unit = HDF5Dataset(create_h5_file(writer_class, 3))
+
+            result = unit[1]
+
+            self.assertEqual(set(TEST_TOPICS), result.keys())
+            self.assertEqual((5, 10, 3), result["front"].image.shape)
+            self.assertEqual([1, 2, 3], result["front"].image[0, 0].tolist())
+            self.assertEqual(2, len(result["rear"].rois))
+            self.assertEqual([5, 5], result["rear"].rois.centroids[1].tolist())
+
+    def test_getitem__negative_index__last_sample(self):
+        unit = HDF5Dataset(create_h5_file(PackedHDF5Writer, 3))
+        self.assertEqual((5, 10, 3), unit[-1]["front"].image.shape)
+
+    def test_getitem__out_of_range__raise(self):
+        unit = HDF5Dataset(create_h5_file(PackedHDF5Writer, 3))
+        with self.assertRaises(IndexError):
+            unit[3]
+
+    def test_getitem__slice__stacked_images_and_roi_list(self):
+        for writer_class in (HDF5Writer, PackedHDF5Writer):
+            unit = HDF5Dataset(create_h5_file(writer_class, 5))
+
+            result = unit[1:4]
+            reversed_result = unit[::-2]
+
+            self.assertEqual((3, 5, 10, 3), result["front"].image.shape)
+            self.assertEqual(3, len(result["front"].rois))
+            self.assertEqual((3, 5, 10, 3), reversed_result["rear"].image.shape)
+
+    def test_getitem__empty_slice__empty_image_stack(self):
+        for writer_class in (HDF5Writer, PackedHDF5Writer):
+            unit = HDF5Dataset(create_h5_file(writer_class, 3))
+
+            result = unit[2:2]
+
+            self.assertEqual((0, 5, 10, 3), result["front"].image.shape)
+            self.assertEqual([], result["front"].rois)
+
+    def test_constructor__empty_files__no_samples_and_topics(self):
+        for writer_class in (HDF5Writer, PackedHDF5Writer):
+            unit = HDF5Dataset(create_h5_file(writer_class, 0))
+
+            self.assertEqual(0, len(unit))
+            self.assertEqual([], unit.topics)
+            self.assertEqual({}, unit[:])
+
+    def test_getitem__empty_slice_of_empty_datasets__empty_image_stack(self):
+        h5_file = io.BytesIO()
+        with h5py.File(h5_file, "w") as empty_file:
+            empty_file.attrs[
+                HDF5Wrapper.VERSION_KEY
+            ] = HDF5Wrapper.PACKED_LAYOUT_VERSION
+            empty_file.create_dataset("image/front", shape=(0, 5, 10, 3), dtype="uint8")
+            empty_file.create_dataset(
+                "roi/front", shape=(0,), dtype=h5py.string_dtype()
+            )
+        unit = HDF5Dataset(h5_file)
+
+        result = unit[:]
+
+        self.assertEqual(0, len(unit))
+        self.assertEqual((0, 5, 10, 3), result["front"].image.shape)
+        self.assertEqual([], result["front"].rois)
+
+    def test_getitem__sparse_sample_keys__same_sample_as_extractor(self):
+        h5_file = create_h5_file(HDF5Writer, 3)
+        with h5py.File(h5_file, "a") as sparse_file:
+            del sparse_file[HDF5Wrapper.sample_key(0)]
+            sparse_file[HDF5Wrapper.sample_key(12)] = sparse_file[
+                HDF5Wrapper.sample_key(2)
+            ]
+            del sparse_file[HDF5Wrapper.sample_key(2)]
+            sparse_file.move(HDF5Wrapper.sample_key(1), HDF5Wrapper.sample_key(5))
+        unit = HDF5Dataset(h5_file)
+        extractor = HDF5Extractor(h5_file)
+
+        result = [index for index, _, _ in extractor.samples()]
+
+        self.assertEqual([5, 12], result)
+        self.assertEqual(2, len(unit))
+        self.assertEqual((5, 10, 3), unit[1]["front"].image.shape)
+        self.assertEqual((2, 5, 10, 3), unit[:]["rear"].image.shape)
+
+    def test_constructor__topic_filter__only_filtered_topics(self):
+        unit = HDF5Dataset(create_h5_file(PackedHDF5Writer, 1), topics=["rear"])
+
+        self.assertEqual(["rear"], unit.topics)
+        self.assertEqual({"rear"}, unit[0].keys())
+
+    def test_constructor__unknown_topic__raise(self):
+        with self.assertRaises(ValueError):
+            HDF5Dataset(create_h5_file(HDF5Writer, 1), topics=["side"])
+
+
+@patch(
+    "PIL.Image.open",
+    MagicMock(return_value=PIL.Image.new(config.IMAGE_FORMAT, (10, 5))),
+)
+class HDF5ExtractorSampleRangeTest(unittest.TestCase):
+    """HDF5 Extractor Sample Range Test"""
+
+    def test_sample_ranges__7_samples_3_ranges__consecutive_ranges(self):
+        unit = HDF5Extractor(create_h5_file(PackedHDF5Writer, 7))
+
+        result = unit.sample_ranges(3)
+
+        self.assertEqual([range(0, 3), range(3, 6), range(6, 7)], result)
+
+    def test_sample_ranges__more_ranges_than_samples__one_range_per_sample(self):
+        unit = HDF5Extractor(create_h5_file(HDF5Writer, 2))
+        self.assertEqual([range(0, 1), range(1, 2)], unit.sample_ranges(8))
+
+    def test_samples__indices__only_selected_samples(self):
+        for writer_class in (HDF5Writer, PackedHDF5Writer):
+            unit = HDF5Extractor(create_h5_file(writer_class, 5))
+
+            result = [index for index, _, _ in unit.samples(range(2, 4))]
+
+            self.assertEqual([2, 3], result)
+
+    def test_extract_samples__indices__files_of_selected_samples_written(self):
+        h5_file = create_h5_file(PackedHDF5Writer, 4)
+        unit = HDF5Extractor(h5_file)
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            with patch.object(
+                HDF5Extractor, "output_path", return_value=Path(output_dir)
+            ):
+                result = list(unit.extract_samples(Path(output_dir), range(1, 3)))
+
+            self.assertEqual([1, 2], result)
+            self.assertEqual(
+                [
+                    "front_000001.json",
+                    "front_000002.json",
+                    "rear_000001.json",
+                    "rear_000002.json",
+                    "test.png",
+                ],
+                sorted(path.name for path in Path(output_dir).iterdir()),
+            )
+
+
+class EncodedHDF5Test(unittest.TestCase):
+    """Encoded image storage test"""
+
+    def setUp(self):
+        self.__temp_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.__temp_dir.name)
+        self.image_path = self.temp_path / "image.png"
+        PIL.Image.new(config.IMAGE_FORMAT, (10, 5), (1, 2, 3)).save(self.image_path)
+
+    def tearDown(self):
+        self.__temp_dir.cleanup()
+
+    def create_encoded_h5_file(self, writer_class, sample_count):
+        return create_h5_file(
+            writer_class, sample_count, image_path=self.image_path, encoded=True
+        )
+
+    def test_add_image_group__sample_layout__file_bytes_and_format_stored(self):
+        h5_file = self.create_encoded_h5_file(HDF5Writer, 1)
+
+        with h5py.File(h5_file, "r") as result:
+            dataset = result[HDF5Wrapper.sample_key(0)]["image/front"]
+            self.assertEqual("PNG", dataset.attrs[HDF5Wrapper.FORMAT_KEY])
+            self.assertEqual(self.image_path.read_bytes(), dataset[:].tobytes())
+
+    def test_add_image_group__packed_layout__variable_length_dataset(self):
+        h5_file = self.create_encoded_h5_file(PackedHDF5Writer, 2)
+
+        with h5py.File(h5_file, "r") as result:
+            dataset = result["image/front"]
+            self.assertEqual((2,), dataset.shape)
+            self.assertEqual("PNG", dataset.attrs[HDF5Wrapper.FORMAT_KEY])
+            self.assertEqual(self.image_path.read_bytes(), dataset[1].tobytes())
+
+    def test_is_encoded__both_layouts__true(self):
+        for writer_class in (HDF5Writer, PackedHDF5Writer):
+            h5_file = self.create_encoded_h5_file(writer_class, 1)
+            self.assertTrue(HDF5Wrapper(h5_file, "r").is_encoded)
+
+    def test_getitem__both_layouts__decoded_image_array(self):
+        for writer_class in (HDF5Writer, PackedHDF5Writer):
+            unit = HDF5Dataset(self.create_encoded_h5_file(writer_class, 3))
+
+            result = unit[1:3]
+
+            self.assertEqual((2, 5, 10, 3), result["front"].image.shape)
+            self.assertEqual([1, 2, 3], result["rear"].image[1, 4, 9].tolist())
+
+    def test_getitem__empty_slice__empty_image_stack(self):
+        for writer_class in (HDF5Writer, PackedHDF5Writer):
+            unit = HDF5Dataset(self.create_encoded_h5_file(writer_class, 3))
+
+            result = unit[5:5]
+
+            self.assertEqual((0, 5, 10, 3), result["front"].image.shape)
+            self.assertEqual(np.uint8, result["front"].image.dtype)
+
+    def test_extract_samples__encoded__encoding_read_once(self):
+        h5_file = self.create_encoded_h5_file(HDF5Writer, 3)
+        output_dir = self.temp_path / "extracted"
+
+        with patch.object(
+            HDF5Wrapper, "is_encoded", new_callable=PropertyMock, return_value=True
+        ) as is_encoded_mock:
+            result = list(HDF5Extractor(h5_file).extract_samples(output_dir))
+
+        self.assertEqual([0, 1, 2], result)
+        is_encoded_mock.assert_called_once()
+
+    def test_getitem__empty_slice_of_empty_datasets__empty_image_stack(self):
+        h5_file = io.BytesIO()
+        with h5py.File(h5_file, "w") as empty_file:
+            empty_file.attrs[
+                HDF5Wrapper.VERSION_KEY
+            ] = HDF5Wrapper.PACKED_LAYOUT_VERSION
+            dataset = empty_file.create_dataset(
+                "image/front", shape=(0,), dtype=h5py.vlen_dtype(np.uint8)
+            )
+            dataset.attrs[HDF5Wrapper.FORMAT_KEY] = "PNG"
+            empty_file.create_dataset(
+                "roi/front", shape=(0,), dtype=h5py.string_dtype()
+            )
+
+        result = HDF5Dataset(h5_file)[:]
+
+        self.assertEqual((0, 0, 0, 3), result["front"].image.shape)
+
+    def test_save_image__same_format__bytes_copied(self):
+        data = np.frombuffer(self.image_path.read_bytes(), dtype=np.uint8)
+        target = self.temp_path / "copy.png"
+
+        HDF5Extractor.save_image(data, target, encoded=True)
+
+        self.assertEqual(self.image_path.read_bytes(), target.read_bytes())
+
+    def test_save_image__different_format__image_converted(self):
+        data = np.frombuffer(self.image_path.read_bytes(), dtype=np.uint8)
+        target = self.temp_path / "copy.bmp"
+
+        HDF5Extractor.save_image(data, target, encoded=True)
+
+        with PIL.Image.open(target) as result:
+            self.assertEqual("BMP", result.format)
+            self.assertEqual((1, 2, 3), result.getpixel((0, 0)))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,99 @@
+"""Test heatmaps module"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from util.heatmaps import HeatmapStack
+
+
+class HeatmapStackTest(unittest.TestCase):
+    """Heatmap Stack Test"""
+
+    TEST_NAMES = ["front_000000", "front_000001", "front_000002"]
+
+    def setUp(self):
+        self.__temp_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.__temp_dir.name)
+        self.heatmaps = np.arange(3 * 4 * 5, dtype=np.uint8).reshape(3, 4, 5)
+        self.names_path = self.temp_path / "names.txt"
+        self.names_path.write_text("\n".join(self.TEST_NAMES) + "\n")
+
+    def tearDown(self):
+        self.__temp_dir.cleanup()
+
+    def assert_stack(self, unit: HeatmapStack):
+        self.assertEqual(3, len(unit))
+        self.assertEqual(self.TEST_NAMES, unit.names)
+        self.assertEqual((4, 5), (unit.height, unit.width))
+        chunks = list(unit.chunks(2))
+        self.assertEqual(
+            [self.TEST_NAMES[:2], self.TEST_NAMES[2:]], [names for names, _ in chunks]
+        )
+        self.assertEqual(
+            self.heatmaps.tolist(),
+            np.concatenate([heatmaps for _, heatmaps in chunks]).tolist(),
+        )
+
+    def test_constructor__npy_with_names_file__heatmaps_and_names(self):
+        file_path = self.temp_path / "heatmaps.npy"
+        np.save(file_path, self.heatmaps)
+
+        self.assert_stack(HeatmapStack(file_path, self.names_path))
+
+    def test_constructor__names_with_spaces_and_empty_lines__one_name_per_line(self):
+        file_path = self.temp_path / "heatmaps.npy"
+        np.save(file_path, self.heatmaps)
+        self.names_path.write_text("front 0\nfront 1\nfront 2\n\n")
+
+        unit = HeatmapStack(file_path, self.names_path)
+
+        self.assertEqual(["front 0", "front 1", "front 2"], unit.names)
+
+    def test_constructor__npy_without_names__raise_error(self):
+        file_path = self.temp_path / "heatmaps.npy"
+        np.save(file_path, self.heatmaps)
+
+        with self.assertRaises(ValueError):
+            HeatmapStack(file_path)
+
+    def test_constructor__npz_with_names__heatmaps_and_names(self):
+        file_path = self.temp_path / "heatmaps.npz"
+        np.savez(file_path, heatmaps=self.heatmaps, names=np.array(self.TEST_NAMES))
+
+        self.assert_stack(HeatmapStack(file_path))
+
+    def test_constructor__hdf5_with_names__heatmaps_and_names(self):
+        file_path = self.temp_path / "heatmaps.h5"
+        with h5py.File(file_path, "w") as h5_file:
+            h5_file.create_dataset(HeatmapStack.HEATMAPS_KEY, data=self.heatmaps)
+            h5_file.create_dataset(
+                HeatmapStack.NAMES_KEY, data=self.TEST_NAMES, dtype=h5py.string_dtype()
+            )
+
+        self.assert_stack(HeatmapStack(file_path))
+
+    def test_constructor__names_count_not_matching__raise_error(self):
+        file_path = self.temp_path / "heatmaps.npy"
+        np.save(file_path, self.heatmaps[:2])
+
+        with self.assertRaises(ValueError):
+            HeatmapStack(file_path, self.names_path)
+
+    def test_constructor__not_stacked__raise_error(self):
+        file_path = self.temp_path / "heatmaps.npy"
+        np.save(file_path, self.heatmaps[0])
+
+        with self.assertRaises(ValueError):
+            HeatmapStack(file_path, self.names_path)
+
+    def test_constructor__unsupported_suffix__raise_error(self):
+        with self.assertRaises(ValueError):
+            HeatmapStack(self.names_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+"""Test manifest module"""
+
+import os
+import unittest
+from pathlib import Path
+
+from pyfakefs.fake_filesystem_unittest import TestCase
+
+from util.manifest import Manifest
+
+
+class ManifestTest(TestCase):
+    """Manifest Test"""
+
+    MANIFEST_PATH = Path("/out/manifest.jsonl")
+    SETTINGS = {"layout": {"width": 10, "height": 5}}
+
+    def setUp(self):
+        self.setUpPyfakefs()
+        self.input_files = [Path("/in/front_000000.png"), Path("/in/front_000000.json")]
+        self.output_files = [Path("/out/merged_000000.png")]
+        for file_path in self.input_files + self.output_files:
+            self.fs.create_file(file_path, contents=file_path.name)
+
+    def create_manifest(self, settings=None) -> Manifest:
+        manifest = Manifest(self.MANIFEST_PATH, settings or self.SETTINGS)
+        self.addCleanup(manifest.close)
+        return manifest
+
+    def create_recorded_manifest(self) -> Manifest:
+        manifest = self.create_manifest()
+        manifest.record(0, self.input_files)
+        return manifest
+
+    def test_read_inputs__two_files__contents_and_content_hash(self):
+        contents, (input_states, content_hash) = Manifest.read_inputs(self.input_files)
+
+        self.assertEqual([b"front_000000.png", b"front_000000.json"], contents)
+        self.assertEqual(
+            [Manifest.file_state(path) for path in self.input_files], input_states
+        )
+        self.assertEqual(Manifest.content_hash(self.input_files), content_hash)
+
+    def test_record__given_inputs__inputs_recorded_without_reading(self):
+        unit = self.create_manifest()
+        inputs = Manifest.read_inputs(self.input_files)[1]
+        self.input_files[1].write_text("changed")
+
+        unit.record(0, self.input_files, inputs)
+
+        self.assertEqual(inputs[1], unit.records[0]["hash"])
+
+    def test_is_up_to_date__not_recorded__false(self):
+        unit = self.create_manifest()
+        self.assertFalse(unit.is_up_to_date(0, self.input_files, self.output_files))
+
+    def test_is_up_to_date__recorded_unchanged__true(self):
+        self.create_recorded_manifest()
+
+        unit = self.create_manifest()
+
+        self.assertTrue(unit.is_up_to_date(0, self.input_files, self.output_files))
+
+    def test_is_up_to_date__different_settings__false(self):
+        self.create_recorded_manifest()
+
+        unit = self.create_manifest({"layout": {"width": 20, "height": 5}})
+
+        self.assertFalse(unit.is_up_to_date(0, self.input_files, self.output_files))
+
+    def test_is_up_to_date__changed_content__false(self):
+        unit = self.create_recorded_manifest()
+        self.input_files[1].write_text("changed")
+
+        self.assertFalse(unit.is_up_to_date(0, self.input_files, self.output_files))
+
+    def test_is_up_to_date__touched_same_content__true_and_state_updated(self):
+        unit = self.create_recorded_manifest()
+        os.utime(self.input_files[0], ns=(0, 42))
+
+        self.assertTrue(unit.is_up_to_date(0, self.input_files, self.output_files))
+        self.assertEqual(42, unit.records[0]["inputs"][0][2])
+
+    def test_is_up_to_date__missing_output__false(self):
+        unit = self.create_recorded_manifest()
+        self.output_files[0].unlink()
+
+        self.assertFalse(unit.is_up_to_date(0, self.input_files, self.output_files))
+
+    def test_constructor__interrupted_write__complete_records_kept(self):
+        self.create_recorded_manifest()
+        with self.MANIFEST_PATH.open("a") as manifest_file:
+            manifest_file.write('{"index": 1, "inpu')
+
+        unit = self.create_manifest()
+        unit.record(2, self.input_files)
+
+        self.assertEqual([0, 2], list(self.create_manifest().records))
+
+    def test_compact__sample_count__records_above_dropped(self):
+        unit = self.create_recorded_manifest()
+        unit.record(1, self.input_files)
+        unit.record(0, self.input_files)
+
+        unit.compact(1)
+
+        self.assertEqual(2, len(self.MANIFEST_PATH.read_text().splitlines()))
+        self.assertEqual([0], list(self.create_manifest().records))
+
+    def test_constructor__compact_manifest__not_rewritten(self):
+        self.create_recorded_manifest().close()
+        inode = os.stat(self.MANIFEST_PATH).st_ino
+
+        unit = self.create_manifest()
+        unit.record(1, self.input_files)
+        unit.compact(2)
+
+        self.assertEqual(inode, os.stat(self.MANIFEST_PATH).st_ino)
+        self.assertEqual(3, len(self.MANIFEST_PATH.read_text().splitlines()))
+
+    def test_constructor__superseded_records__compacted(self):
+        unit = self.create_recorded_manifest()
+        unit.record(0, self.input_files)
+        unit.close()
+
+        self.create_manifest()
+
+        self.assertEqual(2, len(self.MANIFEST_PATH.read_text().splitlines()))
+
+    def test_context_manager__exit__journal_closed(self):
+        with Manifest(self.MANIFEST_PATH, self.SETTINGS) as unit:
+            unit.record(0, self.input_files)
+
+        with self.assertRaises(ValueError):
+            unit.record(1, self.input_files)
+        self.assertEqual([0], list(self.create_manifest().records))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,14 @@
 """Test merge module"""
 
 import copy
+import io
 import json
 import unittest
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import PIL.Image
+
 from annotation import merge
 from util.files import FileModel, MergeGroup
 
@@ -25,22 +29,27 @@ class MergeImagesTest(unittest.TestCase):
         """{"width": 10, "height": 5, "layout": [{"camera": "front", "location": {"y": 0, "x": 0}}]}"""
     )
     TEST_LAYOUT = json.loads(
-        """{"width": 10, "height": 5, "layout": [{"camera": "front_left", "location": {"y": 0, "x": 0}},
-        {"camera": "front", "location": {"y": 0, "x": 640}}, {"camera": "front_right", "location": {"y": 0, "x": 1280}},
-        {"camera": "rear_left", "location": {"y": 480, "x": 0}}, {"camera": "rear", "location": {"y": 480, "x": 640}},
-        {"camera": "rear_right", "location": {"y": 480, "x": 1280}}]}"""
+        """{"width": 10, "height": 5, "layout": [
+        {"camera": "front_left", "location": {"y": 0, "x": 0, "width": 640, "height": 480}},
+        {"camera": "front", "location": {"y": 0, "x": 640, "width": 640, "height": 480}},
+        {"camera": "front_right", "location": {"y": 0, "x": 1280, "width": 640, "height": 480}},
+        {"camera": "rear_left", "location": {"y": 480, "x": 0, "width": 640, "height": 480}},
+        {"camera": "rear", "location": {"y": 480, "x": 640, "width": 640, "height": 480}},
+        {"camera": "rear_right", "location": {"y": 480, "x": 1280, "width": 640, "height": 480}}]}"""
     )
     TEST_MERGE_GROUP = MergeGroup(
         TEST_LAYOUT, {topic: FileModel("key_000.json") for topic in TEST_KEYS}
     )
     TEST_SHAPES = {
+        "imageWidth": 640,
+        "imageHeight": 480,
         "shapes": [
             {
                 "label": "veh_r",
                 "shape_type": "circle",
                 "points": [[20, 30], [30, 45.67]],
             }
-        ]
+        ],
     }
 
     def test_create_layout_data__six_images_two_rows__correct_dimensions(self):
@@ -60,9 +69,151 @@ class MergeImagesTest(unittest.TestCase):
         for idx, key in enumerate(self.TEST_KEYS):
             self.assertEqual(key, result["layout"][idx]["camera"])
 
+    @staticmethod
+    def merge_frames(
+        image_merge_groups, output_dir, image_suffix, workers, indices, input_files
+    ):
+        for index, files in zip(indices, input_files or [None] * len(indices)):
+            yield index, None if files is None else (files, str(index))
+
+    @patch("annotation.merge.write_json")
+    def test_file_merge__two_elements__json_written_while_merging(self, mock_write):
+        def merge_json_data(json_merge_groups, image_suffix, indices, image_groups):
+            for index, _ in enumerate(json_merge_groups):
+                self.assertEqual(index, mock_write.call_count)
+                yield {}
+
+        grouper = MagicMock()
+        grouper.merge_groups = [self.TEST_MERGE_GROUP, self.TEST_MERGE_GROUP]
+        with patch("annotation.merge.merge_frames", self.merge_frames), patch(
+            "annotation.merge.merge_json_data", merge_json_data
+        ):
+            merge.file_merge(Path("out"), grouper, grouper, self.TEST_SUFFIX)
+
+        self.assertEqual(2, mock_write.call_count)
+        self.assertEqual(Path("out/merged_000001.json"), mock_write.call_args.args[0])
+
+    @patch("annotation.merge.write_json")
+    def test_file_merge__manifest__only_outdated_frames_merged_and_recorded(
+        self, mock_write
+    ):
+        manifest = MagicMock()
+        manifest.is_up_to_date.side_effect = lambda index, inputs, outputs: index != 1
+        grouper = MagicMock()
+        grouper.merge_groups = [self.TEST_MERGE_GROUP] * 3
+        with patch("annotation.merge.merge_frames", self.merge_frames), patch(
+            "annotation.merge.read_json", return_value=copy.deepcopy(self.TEST_SHAPES)
+        ):
+            merge.file_merge(
+                Path("out"), grouper, grouper, self.TEST_SUFFIX, manifest=manifest
+            )
+
+        self.assertEqual(
+            [Path("out/merged_000001.json")],
+            [call.args[0] for call in mock_write.call_args_list],
+        )
+        self.assertEqual("merged_000001.png", mock_write.call_args.args[1]["imagePath"])
+        self.assertEqual(1, manifest.record.call_args.args[0])
+        self.assertEqual(12, len(manifest.record.call_args.args[1]))
+        self.assertEqual("1", manifest.record.call_args.args[2][1])
+        manifest.compact.assert_called_once_with(3)
+
+    @patch("PIL.Image.open", MagicMock())
+    @patch("PIL.Image.new")
+    def test_merge_frames__two_elements__two_indexed_frames_saved(self, mock_new):
+        result = merge.merge_frames(
+            [self.TEST_MERGE_GROUP, self.TEST_MERGE_GROUP], Path("out"), ".png"
+        )
+
+        self.assertEqual([(0, None), (1, None)], list(result))
+
+        saved = [call.args[0] for call in mock_new.return_value.save.call_args_list]
+        self.assertEqual(
+            [Path("out/merged_000000.png"), Path("out/merged_000001.png")], saved
+        )
+        self.assertEqual(12, mock_new.return_value.paste.call_count)
+
+    def test_open_resized_image__same_size__unchanged(self):
+        image_file = io.BytesIO()
+        PIL.Image.new("RGB", (64, 48)).save(image_file, "PNG")
+
+        result = merge.open_resized_image(image_file, (64, 48))
+
+        self.assertEqual((64, 48), result.size)
+        self.assertEqual("PNG", result.format)
+
+    def test_open_resized_image__larger_jpeg__downscaled(self):
+        image_file = io.BytesIO()
+        PIL.Image.new("RGB", (640, 480), (255, 0, 0)).save(image_file, "JPEG")
+
+        result = merge.open_resized_image(image_file, (80, 60))
+
+        self.assertEqual((80, 60), result.size)
+        self.assertGreater(result.getpixel((40, 30))[0], 200)
+
+    @patch("pathlib.Path.read_text", MagicMock())
+    def test_merge_json__larger_labels__points_scaled_to_layout(self):
+        def load_larger_labels(_):
+            return dict(
+                copy.deepcopy(self.TEST_SHAPES), imageWidth=1280, imageHeight=960
+            )
+
+        with patch("json.loads", MagicMock(side_effect=load_larger_labels)):
+            result = next(
+                merge.merge_json_data([self.TEST_MERGE_GROUP], self.TEST_SUFFIX)
+            )
+
+        self.assertEqual([[10, 15], [15, 22.835]], result["shapes"][0]["points"])
+        self.assertEqual([[650, 15], [655, 22.835]], result["shapes"][1]["points"])
+
+    @patch("pathlib.Path.read_text", MagicMock())
+    @patch("PIL.Image.open")
+    def test_merge_json__invalid_label_size__points_scaled_by_image_size(
+        self, mock_open
+    ):
+        def load_invalid_labels(_):
+            return dict(copy.deepcopy(self.TEST_SHAPES), imageWidth=0, imageHeight=None)
+
+        mock_open.return_value.__enter__.return_value.size = (1280, 960)
+        with patch("json.loads", MagicMock(side_effect=load_invalid_labels)):
+            result = next(
+                merge.merge_json_data(
+                    [self.TEST_MERGE_GROUP],
+                    self.TEST_SUFFIX,
+                    image_merge_groups=[self.TEST_MERGE_GROUP],
+                )
+            )
+
+        self.assertEqual([[10, 15], [15, 22.835]], result["shapes"][0]["points"])
+
+    @patch("pathlib.Path.read_text", MagicMock())
+    def test_merge_json__invalid_label_size_without_images__labels_skipped(self):
+        def load_invalid_labels(_):
+            return dict(copy.deepcopy(self.TEST_SHAPES), imageWidth=0, imageHeight=None)
+
+        with patch("json.loads", MagicMock(side_effect=load_invalid_labels)), patch(
+            "sys.stderr", io.StringIO()
+        ):
+            result = next(
+                merge.merge_json_data([self.TEST_MERGE_GROUP], self.TEST_SUFFIX)
+            )
+
+        self.assertEqual([], result["shapes"])
+
+    def test_label_size__missing_or_not_positive_size__none(self):
+        for image_size in (None, 0, -1):
+            self.assertIsNone(
+                merge.label_size({"imageWidth": image_size, "imageHeight": 480})
+            )
+
+    def test_label_size__valid_size__label_size(self):
+        self.assertEqual(
+            (1280, 960), merge.label_size({"imageWidth": 1280, "imageHeight": 960})
+        )
+
     def test_merge_json__empty_list__empty(self):
         result = merge.merge_json_data([], self.TEST_SUFFIX)
-        self.assertFalse(result)
+        self.assertFalse(list(result))
 
     @patch("pathlib.Path.read_text", MagicMock())
     @patch("json.loads", MagicMock())
@@ -70,12 +221,12 @@ class MergeImagesTest(unittest.TestCase):
         result = merge.merge_json_data(
             [self.TEST_MERGE_GROUP, self.TEST_MERGE_GROUP], self.TEST_SUFFIX
         )
-        self.assertEqual(2, len(result))
+        self.assertEqual(2, len(list(result)))
 
     @patch("pathlib.Path.read_text", MagicMock())
     @patch("json.loads", MagicMock())
     def test_merge_json__one_element__correct_header(self):
-        result = merge.merge_json_data([self.TEST_MERGE_GROUP], self.TEST_SUFFIX)[0]
+        result = next(merge.merge_json_data([self.TEST_MERGE_GROUP], self.TEST_SUFFIX))
 
         self.assertEqual(10, int(result["imageWidth"]))
         self.assertEqual(5, int(result["imageHeight"]))
@@ -84,7 +235,7 @@ class MergeImagesTest(unittest.TestCase):
     @patch("pathlib.Path.read_text", MagicMock())
     @patch("json.loads", MagicMock(return_value=copy.deepcopy(TEST_SHAPES)))
     def test_merge_json__one_element__correct_shape_num(self):
-        result = merge.merge_json_data([self.TEST_MERGE_GROUP], self.TEST_SUFFIX)[0]
+        result = next(merge.merge_json_data([self.TEST_MERGE_GROUP], self.TEST_SUFFIX))
         self.assertEqual(6, len(result["shapes"]))
 
 
@@ -0,0 +1,40 @@
+"""Test parallel module"""
+
+import unittest
+
+from util.parallel import imap_ordered
+
+
+def square(value):
+    return value * value
+
+
+class ParallelTest(unittest.TestCase):
+    """Parallel test"""
+
+    def test_imap_ordered__empty__empty(self):
+        self.assertFalse(list(imap_ordered(square, [], 2)))
+
+    def test_imap_ordered__single_worker__results_in_order(self):
+        self.assertEqual([0, 1, 4, 9], list(imap_ordered(square, range(4))))
+
+    def test_imap_ordered__two_workers__results_in_order(self):
+        result = list(imap_ordered(square, range(20), 2, max_in_flight=3))
+        self.assertEqual([value * value for value in range(20)], result)
+
+    def test_imap_ordered__two_workers__lazy_consumption_of_input(self):
+        consumed = []
+
+        def generate():
+            for value in range(10):
+                consumed.append(value)
+                yield value
+
+        result = imap_ordered(square, generate(), 2, max_in_flight=2)
+        self.assertEqual(0, next(result))
+        self.assertLessEqual(len(consumed), 3)
+        result.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,17 @@
 """Split Images Test"""
 
+import copy
 import json
+import tempfile
 import unittest
 from pathlib import Path
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
+
+import numpy as np
+import PIL.Image
 
 from annotation import split
+from util.files import Layout
 
 
 class SplitImagesTest(unittest.TestCase):
@@ -32,51 +38,204 @@ class SplitImagesTest(unittest.TestCase):
     }
 
     def test_split_json_data__no_files__empty(self):
-        result = split.split_json_data([], {}, ".png")
+        result = list(split.split_json_data([], {}, ".png"))
         self.assertFalse(result)
 
-    @patch("pathlib.Path.read_text", MagicMock())
-    @patch("json.loads", MagicMock())
-    @patch("annotation.split.crop_from_json", MagicMock())
-    def test_split_json_data__two_files_and_test_layout__size_is_12(self):
-        result = split.split_json_data(
-            [Path("merged_000.json"), Path("merged_001.json")], self.TEST_LAYOUT, ".png"
+    @patch("annotation.split.read_json")
+    def test_split_json_data__two_files_and_test_layout__size_is_12(self, read_mock):
+        read_mock.side_effect = lambda _: copy.deepcopy(self.TEST_SHAPES)
+        result = list(
+            split.split_json_data(
+                [Path("merged_000.json"), Path("merged_001.json")],
+                self.TEST_LAYOUT,
+                ".png",
+            )
         )
         self.assertEqual(12, len(result))
 
-    @patch("pathlib.Path.read_text", MagicMock())
-    @patch("json.loads", MagicMock())
-    @patch("annotation.split.crop_from_json", MagicMock())
-    def test_split_json_data__two_files_and_test_layout__correct_file_names(self):
-        result = split.split_json_data(
-            [Path("merged_000.json"), Path("merged_001.json")], self.TEST_LAYOUT, ".png"
+    @patch("annotation.split.read_json")
+    def test_split_json_data__two_files_and_test_layout__correct_file_names(
+        self, read_mock
+    ):
+        read_mock.side_effect = lambda _: copy.deepcopy(self.TEST_SHAPES)
+        result = list(
+            split.split_json_data(
+                [Path("merged_000.json"), Path("merged_001.json")],
+                self.TEST_LAYOUT,
+                ".png",
+            )
         )
         self.assertIn("front", result[0][0])
         self.assertIn("000", result[0][0])
         self.assertIn("rear", result[-1][0])
         self.assertIn("001", result[-1][0])
+        self.assertEqual("rear_right_000001.png", result[-1][1]["imagePath"])
+
+    def test_split_json_document__shapes__shapes_shifted_into_containing_views(self):
+        json_data = {
+            "version": "4.5.6",
+            "flags": {},
+            "shapes": [
+                {"label": "a", "shape_type": "circle", "points": [[20, 30], [30, 40]]},
+                {"label": "b", "shape_type": "circle", "points": [[700, 500], [5, 5]]},
+                {"label": "c", "shape_type": "circle", "points": [[640, 30], [5, 5]]},
+                {"label": "d", "shape_type": "circle", "points": [[1900, 900], [1, 1]]},
+            ],
+            "imagePath": "merged_000000.png",
+            "imageData": None,
+            "imageHeight": 960,
+            "imageWidth": 1920,
+        }
+        expected_data = copy.deepcopy(json_data)
+        layout = Layout(self.TEST_LAYOUT)
+
+        result = list(split.split_json_document(json_data, layout))
+
+        self.assertEqual(expected_data, json_data)
+        self.assertEqual(list(layout), [layout_model for layout_model, _ in result])
+        self.assertEqual(
+            [["a"], [], [], [], ["b"], ["d"]],
+            [[shape["label"] for shape in data["shapes"]] for _, data in result],
+        )
+        self.assertEqual([[60, 20], [-635, -475]], result[4][1]["shapes"][0]["points"])
+        self.assertEqual(
+            [[620, 420], [-1279, -479]], result[5][1]["shapes"][0]["points"]
+        )
+        for layout_model, segment_data in result:
+            self.assertEqual(layout_model.width, segment_data["imageWidth"])
+            self.assertEqual(layout_model.height, segment_data["imageHeight"])
+            self.assertEqual("merged_000000.png", segment_data["imagePath"])
+
+    def test_split_json_document__no_shapes__empty_shapes_per_view(self):
+        result = list(
+            split.split_json_document({"shapes": []}, Layout(self.TEST_LAYOUT))
+        )
+
+        self.assertEqual(6, len(result))
+        self.assertFalse(any(segment_data["shapes"] for _, segment_data in result))
+
+    def test_split_json_document__different_point_counts__all_points_shifted(self):
+        json_data = {
+            "shapes": [
+                {"shape_type": "circle", "points": [[700, 30], [710, 30]]},
+                {"shape_type": "point", "points": [[650, 40]]},
+                {"shape_type": "polygon", "points": [[660, 10], [670, 10], [665, 20]]},
+            ]
+        }
+
+        result = list(split.split_json_document(json_data, Layout(self.TEST_LAYOUT)))
+
+        self.assertEqual(
+            [[[60, 30], [70, 30]], [[10, 40]], [[20, 10], [30, 10], [25, 20]]],
+            [shape["points"] for shape in result[1][1]["shapes"]],
+        )
+
+    def test_split_json_document__no_shapes_inside__empty_shapes_per_view(self):
+        json_data = {"shapes": [{"points": [[2000, 30], [2010, 30]]}]}
+
+        result = list(split.split_json_document(json_data, Layout(self.TEST_LAYOUT)))
+
+        self.assertFalse(any(segment_data["shapes"] for _, segment_data in result))
+
+    def test_split_json_document__two_and_one_inside__size_is_1(self):
+        json_data = {
+            "shapes": [
+                {"points": [[20, 30], [30, 40]]},
+                {"points": [[700, 30], [710, 30]]},
+            ]
+        }
+
+        result = list(split.split_json_document(json_data, Layout(self.TEST_LAYOUT)))
+
+        self.assertEqual(1, len(result[0][1]["shapes"]))
+
+    def test_split_json_document__two_and_two_inside__size_is_2(self):
+        json_data = {
+            "shapes": [
+                {"points": [[20, 30], [30, 40]]},
+                {"points": [[100, 300], [110, 300]]},
+            ]
+        }
 
-    def test_crop_from_json__no_shapes__empty_shapes(self):
-        result = split.crop_from_json({"shapes": []}, MagicMock())
-        self.assertFalse(result["shapes"])
-
-    def test_crop_from_json__no_shapes_inside__empty_shapes(self):
-        layout_model = MagicMock()
-        layout_model.is_inside.return_value = False
-        result = split.crop_from_json(self.TEST_SHAPES, layout_model)
-        self.assertFalse(result["shapes"])
-
-    def test_crop_from_json__two_and_one_inside__size_is_1(self):
-        layout_model = MagicMock()
-        layout_model.is_inside.side_effect = [True, False]
-        result = split.crop_from_json(self.TEST_SHAPES, layout_model)
-        self.assertEqual(1, len(result["shapes"]))
-
-    def test_crop_from_json__two_and_two_inside__size_is_2(self):
-        layout_model = MagicMock()
-        layout_model.is_inside.return_value = True
-        result = split.crop_from_json(self.TEST_SHAPES, layout_model)
-        self.assertEqual(1, len(result["shapes"]))
+        result = list(split.split_json_document(json_data, Layout(self.TEST_LAYOUT)))
+
+        self.assertEqual(2, len(result[0][1]["shapes"]))
+
+
+class SplitImageFilesTest(unittest.TestCase):
+    """Split Image Files Test"""
+
+    TEST_LAYOUT = Layout(
+        {
+            "width": 4,
+            "height": 2,
+            "layout": [
+                {
+                    "camera": "left",
+                    "location": {"x": 0, "y": 0, "width": 2, "height": 2},
+                },
+                {
+                    "camera": "right",
+                    "location": {"x": 2, "y": 0, "width": 2, "height": 2},
+                },
+            ],
+        }
+    )
+
+    def setUp(self):
+        self.__temp_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.__temp_dir.name)
+        self.pixels = np.arange(24, dtype=np.uint8).reshape(2, 4, 3)
+
+    def tearDown(self):
+        self.__temp_dir.cleanup()
+
+    def test_crop_segments__rgb_image__equal_to_crop(self):
+        image = PIL.Image.fromarray(self.pixels)
+
+        result = list(split.crop_segments(image, self.TEST_LAYOUT))
+
+        self.assertEqual(["left", "right"], [model.key for model, _ in result])
+        for layout_model, segment in result:
+            self.assertEqual(
+                np.asarray(image.crop(layout_model.box)).tolist(),
+                np.asarray(segment).tolist(),
+            )
+
+    def test_crop_segments__palette_image__mode_kept(self):
+        image = PIL.Image.fromarray(self.pixels).convert("P")
+
+        result = [
+            segment for _, segment in split.crop_segments(image, self.TEST_LAYOUT)
+        ]
+
+        self.assertEqual(["P", "P"], [segment.mode for segment in result])
+
+    def test_split_images__two_workers__all_segments_written(self):
+        image_files = []
+        for index in range(3):
+            image_files.append(self.temp_path / f"merged_{index:06d}.png")
+            PIL.Image.fromarray(self.pixels + index).save(image_files[-1])
+        output_dir = self.temp_path / "split"
+        output_dir.mkdir()
+
+        split.split_images(image_files, self.TEST_LAYOUT, output_dir, workers=2)
+
+        self.assertEqual(
+            [
+                f"{key}_{index:06d}.png"
+                for index in range(3)
+                for key in ("left", "right")
+            ],
+            sorted(
+                (path.name for path in output_dir.iterdir()),
+                key=lambda name: (name[-10:], name),
+            ),
+        )
+        self.assertEqual(
+            (self.pixels[:, 2:] + 2).tolist(),
+            np.asarray(PIL.Image.open(output_dir / "right_000002.png")).tolist(),
+        )
 
 
 if __name__ == "__main__":
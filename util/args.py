@@ -4,6 +4,8 @@ import argparse
 from pathlib import Path
 from typing import Any, Tuple
 
+from util import config
+
 
 def user_confirmation(message: str) -> bool:
     """
@@ -64,6 +66,30 @@ class ArgumentParserFactory:
         else:
             raise NotADirectoryError(path_string)
 
+    @staticmethod
+    def existing_path(path_string: str) -> Path:
+        """
+        Argparse type check if path is an existing directory or file
+        :param path_string:
+        :return:
+        """
+        if Path(path_string).exists():
+            return Path(path_string)
+        else:
+            raise FileNotFoundError(path_string)
+
+    @staticmethod
+    def positive_int(value: str) -> int:
+        """
+        Argparse type check if value is a positive integer
+        :param value:
+        :return:
+        """
+        number = int(value)
+        if number < 1:
+            raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+        return number
+
     @staticmethod
     def is_suffix(value: str) -> str:
         if value.startswith("."):
@@ -123,6 +149,47 @@ class ArgumentParserFactory:
             default="640x480",
         )
 
+    def add_workers_argument(self) -> None:
+        """
+        Add number of worker processes argument to parser
+        :return:
+        """
+        self.__parser.add_argument(
+            "-w",
+            "--workers",
+            type=ArgumentParserFactory.positive_int,
+            default=1,
+            help="Number of worker processes",
+        )
+
+    def add_index_argument(self) -> None:
+        """
+        Add directory index arguments to parser
+        :return:
+        """
+
+        class IndexDirAction(argparse.Action):
+            """Store the index directory and enable the index"""
+
+            def __call__(self, parser, namespace, values, option_string=None):
+                setattr(namespace, self.dest, values)
+                namespace.index = True
+
+        self.__parser.add_argument(
+            "--index",
+            action="store_true",
+            help=f"Read the input files from a {config.MVROI_INDEX_FILE} file per "
+            "directory instead of scanning it. The index is rebuilt when the "
+            "directory changed",
+        )
+        self.__parser.add_argument(
+            "--index_dir",
+            type=Path,
+            action=IndexDirAction,
+            help="Store the index files in this directory instead of the scanned "
+            "directories, implies --index",
+        )
+
     def add_suffix_argument(self) -> None:
         """
         Add image suffix argument to parser
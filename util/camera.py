@@ -1,34 +1,34 @@
 """Camera related operations"""
 
-import copy
+import itertools
 import math
-from typing import List
+from collections import namedtuple
+from typing import Dict, List
 
-from util.geometry import Circle
+import numpy as np
 
+from util.geometry import Circle, CircleArray
 
-def calculate_angle_of_translated_roi(circle, fov, image_width):
-    """Project the ROI to get the angle in current camera"""
-    return math.atan(
-        circle.centroid.x
-        * math.sin(fov)
-        / (image_width + circle.centroid.x * (math.cos(fov) - 1))
-    )
+ViewPairOverlap = namedtuple("ViewPairOverlap", ["first", "second", "angle_diff"])
 
 
-def calculate_distance_to_translated_roi(
-    circle, theta, fov, image_width, translation_angle
-):
-    """Add the shift angle according to the configuration and then project to shifted ROI"""
+def calculate_translated_roi_x(
+    x: np.ndarray, fov: float, image_width: float, translation_angle: float
+) -> np.ndarray:
+    """
+    Vectorized projection of ROI centroid x values into the view shifted by the translation angle
+    :param x: Centroid x values of all ROIs
+    :param fov:
+    :param image_width:
+    :param translation_angle:
+    :return: Shifted centroid x values
+    """
+    theta = np.arctan(x * math.sin(fov) / (image_width + x * (math.cos(fov) - 1)))
+    tan_shifted = np.tan(theta + translation_angle)
     return (
         image_width
-        * math.tan(theta + translation_angle)
-        / (
-            math.tan(theta + translation_angle)
-            + math.sin(fov)
-            - math.cos(fov) * math.tan(theta + translation_angle)
-        )
-        - circle.centroid.x
+        * tan_shifted
+        / (tan_shifted + math.sin(fov) - math.cos(fov) * tan_shifted)
     )
 
 
@@ -104,31 +104,52 @@ class RoiView:
         if not self.exists(roi) and self.is_inside(roi):
             self.__rois.append(roi)
 
+    def insert_many(self, candidates) -> None:
+        """
+        Insert all candidates that do not exist yet
+        Equal to calling insert for each candidate in order, but with vectorized IoUs
+        """
+        if not isinstance(candidates, CircleArray):
+            candidates = CircleArray.from_circles(candidates)
+        if not len(candidates):
+            return
+
+        x = candidates.centroids[:, 0]
+        is_new = (x < self.__image_width) & (x > 0)
+        if self.__rois:
+            existing = CircleArray.from_circles(self.__rois)
+            is_new &= ~np.any(
+                candidates.pairwise_iou(existing) > self.__iou_threshold, axis=1
+            )
+
+        is_duplicate = candidates.pairwise_iou(candidates) > self.__iou_threshold
+        is_inserted = np.zeros(len(candidates), dtype=bool)
+        for index in np.flatnonzero(is_new):
+            is_inserted[index] = not np.any(is_duplicate[index, is_inserted])
+        self.__rois.extend(
+            candidates[int(index)] for index in np.flatnonzero(is_inserted)
+        )
+
     def is_inside(self, roi: Circle) -> bool:
         """Check if the roi locate out of the image"""
         return roi.centroid.x < self.__image_width and roi.centroid.x > 0
 
     def exists(self, roi: Circle) -> bool:
         """Check if the roi already exists within this view"""
-        return any(
-            [
-                roi.iou(existing_roi) > self.__iou_threshold
-                for existing_roi in self.__rois
-            ]
-        )
+        if not self.__rois:
+            return False
+        ious = CircleArray.from_circles(self.__rois).iou(roi)
+        return bool(np.any(ious > self.__iou_threshold))
 
-    def translate_rois(self, translation_angle: float) -> List[Circle]:
+    def translate_rois(self, translation_angle: float) -> CircleArray:
         """Translate ROIs horizontally by the specified angle"""
-        circle_list = copy.deepcopy(self.__rois)
-        for circle in circle_list:
-            theta = calculate_angle_of_translated_roi(
-                circle, self.__fov, self.__image_width
-            )
-            translation_x = calculate_distance_to_translated_roi(
-                circle, theta, self.__fov, self.__image_width, translation_angle
-            )
-            circle.translate(translation_x, 0)
-        return circle_list
+        circles = CircleArray.from_circles(self.__rois)
+        x = circles.centroids[:, 0]
+        translated_x = calculate_translated_roi_x(
+            x, self.__fov, self.__image_width, translation_angle
+        )
+        circles.translate(translated_x - x, 0)
+        return circles
 
 
 class RoiViewPair:
@@ -144,10 +165,63 @@ class RoiViewPair:
             self.left_view.position, self.right_view.position, self.left_view.fov
         )
         if overlap.is_valid:
-            angle_diff = overlap.angle_diff_between_both_views * overlap.BIAS
-            candidate_rois_right = self.left_view.translate_rois(angle_diff)
-            candidate_rois_left = self.right_view.translate_rois(-angle_diff)
-            for circle in candidate_rois_left:
-                self.left_view.insert(circle)
-            for circle in candidate_rois_right:
-                self.right_view.insert(circle)
+            self.sync_rois_by_angle_diff(
+                overlap.angle_diff_between_both_views * overlap.BIAS
+            )
+
+    def sync_rois_by_angle_diff(self, angle_diff: float) -> None:
+        """Complete the missing ROI to each other using a precomputed angle difference"""
+        candidate_rois_right = self.left_view.translate_rois(angle_diff)
+        candidate_rois_left = self.right_view.translate_rois(-angle_diff)
+        self.left_view.insert_many(candidate_rois_left)
+        self.right_view.insert_many(candidate_rois_right)
+
+
+class CameraRig:
+    """Camera rig with the precomputed schedule of overlapping views to sync"""
+
+    def __init__(self, camera_positions: List[float], fov: float) -> None:
+        self.__camera_positions = camera_positions
+        self.__fov = fov
+        self.__sync_schedule = []
+        for first, second in itertools.product(range(len(camera_positions)), repeat=2):
+            if first == second:
+                continue
+            overlap = RegionOverlap(
+                camera_positions[first], camera_positions[second], fov
+            )
+            if overlap.is_valid:
+                self.__sync_schedule.append(
+                    ViewPairOverlap(
+                        first,
+                        second,
+                        overlap.angle_diff_between_both_views * overlap.BIAS,
+                    )
+                )
+
+    @staticmethod
+    def from_camera_config(camera_config: Dict, fov: float) -> "CameraRig":
+        """Create the rig from the camera config sections, yaw is given in degree"""
+        return CameraRig(
+            [math.radians(float(camera["yaw"])) for camera in camera_config.values()],
+            fov,
+        )
+
+    @property
+    def camera_positions(self) -> List[float]:
+        return self.__camera_positions
+
+    @property
+    def fov(self) -> float:
+        return self.__fov
+
+    @property
+    def sync_schedule(self) -> List[ViewPairOverlap]:
+        return self.__sync_schedule
+
+    def sync_rois(self, roi_views: List[RoiView]) -> None:
+        """Sync the ROIs of all overlapping views of one scene"""
+        for first, second, angle_diff in self.__sync_schedule:
+            RoiViewPair(roi_views[first], roi_views[second]).sync_rois_by_angle_diff(
+                angle_diff
+            )
@@ -8,6 +8,8 @@ BDDA_FILENAME_TEMPLATE = "%s_%05d%s"
 
 MVROI_NAMING_FILE = "naming.json"
 MVROI_LAYOUT_FILE = "layout.json"
+MVROI_MANIFEST_FILE = "manifest.jsonl"
+MVROI_INDEX_FILE = ".mvroi_index"
 MVROI_FILENAME_TEMPLATE = "%s_%06d%s"
 
 IMAGE_FORMAT = "RGB"
@@ -1,20 +1,209 @@
 """Module for file operations and models"""
 
+import hashlib
 import json
+import os
 import re
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
+import numpy as np
 from tqdm import tqdm
 
 from util import config
 
 PathPair = namedtuple("PathPair", ["source", "target"])
+IndexEntry = namedtuple("IndexEntry", ["name", "topic", "frame_index", "suffix"])
+
+
+def scan_directory_entries(directory: str) -> List[os.DirEntry]:
+    try:
+        with os.scandir(directory) as entries:
+            return list(entries)
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return []
+
+
+def scan_directory(
+    directory: str, suffixes: Tuple[str, ...], parts: Tuple[str, ...] = ()
+) -> List[Tuple[str, ...]]:
+    """
+    Recursively collect all entries whose name ends with one of the suffixes
+    Symbolic links to directories are not followed, like Path.rglob
+    :param directory:
+    :param suffixes:
+    :param parts: Path parts of the directory relative to the scanned root
+    :return: Unsorted path parts of the matching entries relative to the scanned root
+    """
+    matches = []
+    directories = [(directory, parts)]
+    while directories:
+        directory, parts = directories.pop()
+        for entry in scan_directory_entries(directory):
+            if entry.name.endswith(suffixes):
+                matches.append(parts + (entry.name,))
+            if entry.is_dir(follow_symlinks=False):
+                directories.append((entry.path, parts + (entry.name,)))
+    return matches
+
+
+def scan_indexed_directory(
+    directory: str,
+    suffixes: Tuple[str, ...],
+    parts: Tuple[str, ...] = (),
+    index_dir: Optional[Path] = None,
+) -> List[Tuple[Tuple[str, ...], IndexEntry]]:
+    """
+    Recursively collect all files whose name ends with one of the suffixes from the directory indices
+    :param directory:
+    :param suffixes:
+    :param parts: Path parts of the directory relative to the scanned root
+    :param index_dir: Directory of the indices, by default every index is stored in its directory
+    :return: Unsorted path parts and index entry of the matching files relative to the scanned root
+    """
+    matches = []
+    directories = [(directory, parts)]
+    while directories:
+        directory, parts = directories.pop()
+        index = DirectoryIndex(Path(directory), index_dir)
+        for entry in index.files:
+            if entry.name.endswith(suffixes):
+                matches.append((parts + (entry.name,), entry))
+        for name in index.directories:
+            directories.append((os.path.join(directory, name), parts + (name,)))
+    return matches
+
+
+def get_files_with_suffixes(
+    input_dir: Path,
+    suffixes: Sequence[str],
+    ignore: str = r"(?!x)x",
+    workers: int = 1,
+    use_index: bool = False,
+    index_dir: Optional[Path] = None,
+) -> Dict[str, List[Path]]:
+    """
+    Get absolute files paths from input dir matching each suffix in a single directory traversal
+    :param input_dir:
+    :param suffixes:
+    :param ignore: By default nothing should be ignored
+    Never match regex from: https://stackoverflow.com/a/1845097/3883569
+    :param workers: Number of threads scanning the subdirectories of the input dir
+    :param use_index: Read the directory contents from the directory indices
+    :param index_dir: Directory of the indices, by default every index is stored in its directory
+    :return: Sorted file paths per suffix
+    """
+    if use_index:
+        indexed_files = get_indexed_files_with_suffixes(
+            input_dir, suffixes, ignore, index_dir
+        )
+        return {
+            suffix: [file_path for file_path, _ in files]
+            for suffix, files in indexed_files.items()
+        }
+
+    suffixes = tuple(suffixes)
+    input_dir = Path(input_dir)
+    if workers > 1:
+        top_level = scan_directory_entries(str(input_dir))
+        matches = [
+            (entry.name,) for entry in top_level if entry.name.endswith(suffixes)
+        ]
+        sub_directories = [
+            entry for entry in top_level if entry.is_dir(follow_symlinks=False)
+        ]
+        with ThreadPoolExecutor(workers) as executor:
+            for sub_matches in executor.map(
+                lambda entry: scan_directory(entry.path, suffixes, (entry.name,)),
+                sub_directories,
+            ):
+                matches.extend(sub_matches)
+    else:
+        matches = scan_directory(str(input_dir), suffixes)
+
+    # sorting the parts gives the order of sorted paths without comparing Path objects
+    matches.sort()
+    ignore_pattern = re.compile(ignore)
+    parent_paths = {}
+    files = {suffix: [] for suffix in suffixes}
+    for parts in matches:
+        parent_path = parent_paths.get(parts[:-1])
+        if parent_path is None:
+            parent_path = parent_paths[parts[:-1]] = input_dir.joinpath(*parts[:-1])
+        file_path = parent_path / parts[-1]
+        if ignore_pattern.match(str(file_path)):
+            continue
+        for suffix in suffixes:
+            if parts[-1].endswith(suffix):
+                files[suffix].append(file_path)
+    return files
+
+
+def get_indexed_files_with_suffixes(
+    input_dir: Path,
+    suffixes: Sequence[str],
+    ignore: str = r"(?!x)x",
+    index_dir: Optional[Path] = None,
+) -> Dict[str, List[Tuple[Path, IndexEntry]]]:
+    """
+    Get files paths and their index entries from input dir matching each suffix from the directory indices
+    :param input_dir:
+    :param suffixes:
+    :param ignore: By default nothing should be ignored
+    :param index_dir: Directory of the indices, by default every index is stored in its directory
+    :return: Sorted file paths and index entries per suffix
+    """
+    suffixes = tuple(suffixes)
+    input_dir = Path(input_dir)
+    matches = scan_indexed_directory(str(input_dir), suffixes, index_dir=index_dir)
+    matches.sort(key=lambda match: match[0])
+    ignore_pattern = re.compile(ignore)
+    indexed_files = {suffix: [] for suffix in suffixes}
+    for parts, entry in matches:
+        file_path = input_dir.joinpath(*parts)
+        if ignore_pattern.match(str(file_path)):
+            continue
+        for suffix in suffixes:
+            if entry.name.endswith(suffix):
+                indexed_files[suffix].append((file_path, entry))
+    return indexed_files
+
+
+def get_file_models_with_suffixes(
+    input_dir: Path,
+    suffixes: Sequence[str],
+    ignore: str = r"(?!x)x",
+    index_dir: Optional[Path] = None,
+) -> Dict[str, List["FileModel"]]:
+    """
+    Get file models from input dir matching each suffix from the directory indices
+    Topic and frame index are read from the indices instead of parsing the file names again
+    :param input_dir:
+    :param suffixes:
+    :param ignore: By default nothing should be ignored
+    :param index_dir: Directory of the indices, by default every index is stored in its directory
+    :return: File models in the order of the sorted file paths per suffix
+    """
+    indexed_files = get_indexed_files_with_suffixes(
+        input_dir, suffixes, ignore, index_dir
+    )
+    return {
+        suffix: [
+            FileModel.from_index_entry(file_path, entry) for file_path, entry in files
+        ]
+        for suffix, files in indexed_files.items()
+    }
 
 
 def get_files_with_suffix(
-    input_dir: Path, suffix: str, ignore: str = r"(?!x)x"
+    input_dir: Path,
+    suffix: str,
+    ignore: str = r"(?!x)x",
+    workers: int = 1,
+    use_index: bool = False,
+    index_dir: Optional[Path] = None,
 ) -> List[Path]:
     """
     Get absolute files paths from input dir matching the suffix
@@ -22,13 +211,14 @@ def get_files_with_suffix(
     :param suffix:
     :param ignore: By default nothing should be ignored
     Never match regex from: https://stackoverflow.com/a/1845097/3883569
+    :param workers: Number of threads scanning the subdirectories of the input dir
+    :param use_index: Read the directory contents from the directory indices
+    :param index_dir: Directory of the indices, by default every index is stored in its directory
     :return:
     """
-    return [
-        file_path
-        for file_path in sorted(input_dir.rglob(f"*{suffix}"))
-        if not re.compile(ignore).match(str(file_path))
-    ]
+    return get_files_with_suffixes(
+        input_dir, [suffix], ignore, workers, use_index, index_dir
+    )[suffix]
 
 
 def read_json(file_path: Path) -> Dict:
@@ -50,20 +240,173 @@ def write_json(file_path: Path, json_data: Dict) -> None:
     file_path.write_text(json.dumps(json_data))
 
 
+class DirectoryIndex:
+    """
+    Index of the files and subdirectories of a single directory
+    Records topic, frame index and suffix per file. The index is rebuilt when the modification time
+    of the directory changed, i.e. entries were added, removed or renamed. File sizes and mtimes are
+    not recorded, as rewriting a file does not change the directory mtime.
+    """
+
+    VERSION = 2
+
+    def __init__(self, directory: Path, index_dir: Optional[Path] = None):
+        """
+        :param directory:
+        :param index_dir: Directory of the index file, by default the index is stored in the directory
+        """
+        self.__directory = Path(directory)
+        if index_dir is None:
+            self.__index_path = self.__directory / config.MVROI_INDEX_FILE
+        else:
+            directory_hash = hashlib.sha1(
+                str(self.__directory.absolute()).encode()
+            ).hexdigest()
+            self.__index_path = Path(index_dir) / (
+                directory_hash + config.MVROI_INDEX_FILE
+            )
+        index_data = self.__read()
+        if index_data is None:
+            index_data = self.__build()
+        self.__files = [IndexEntry(*entry) for entry in index_data["files"]]
+        self.__directories = index_data["directories"]
+
+    @property
+    def files(self) -> List[IndexEntry]:
+        return self.__files
+
+    @property
+    def directories(self) -> List[str]:
+        return self.__directories
+
+    @property
+    def index_path(self) -> Path:
+        return self.__index_path
+
+    def __directory_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.__directory).st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            return None
+
+    def __read(self) -> Optional[Dict]:
+        try:
+            index_data = json.loads(self.__index_path.read_text())
+        except (OSError, ValueError):
+            return None
+        if (
+            index_data.get("version") != DirectoryIndex.VERSION
+            or index_data.get("mtime_ns") != self.__directory_mtime()
+        ):
+            return None
+        return index_data
+
+    def __build(self) -> Dict:
+        # the mtime is taken before scanning so that concurrent changes invalidate the index
+        mtime_ns = self.__create_index_file()
+        files = []
+        directories = []
+        for entry in scan_directory_entries(str(self.__directory)):
+            if entry.name == config.MVROI_INDEX_FILE:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                directories.append(entry.name)
+                continue
+            try:
+                topic, frame_index = FileModel.parse_name(entry.name)
+            except ValueError:
+                topic, frame_index = None, None
+            files.append(
+                IndexEntry(entry.name, topic, frame_index, Path(entry.name).suffix)
+            )
+        index_data = {
+            "version": DirectoryIndex.VERSION,
+            "mtime_ns": mtime_ns,
+            "files": files,
+            "directories": directories,
+        }
+        if mtime_ns is not None:
+            self.__index_path.write_text(json.dumps(index_data, separators=(",", ":")))
+        return index_data
+
+    def __create_index_file(self) -> Optional[int]:
+        """
+        Create the index file, overwriting it later in place does not change the directory mtime
+        :return: Directory mtime after the creation or None if the index cannot be written
+        """
+        try:
+            if self.__index_path.parent != self.__directory:
+                self.__index_path.parent.mkdir(parents=True, exist_ok=True)
+            self.__index_path.touch()
+        except OSError:
+            return None
+        return self.__directory_mtime()
+
+
 class FileModel:
     """File Model"""
 
+    __slots__ = ("__file_path", "__topic_name", "__index")
+    NAME_PATTERN = re.compile(r"([_\-]\d+)")
+
     def __init__(self, file_path: Path):
         self.__file_path = Path(file_path)
+        self.__topic_name, self.__index = self.parse_name(self.__file_path.name)
+
+    @staticmethod
+    def parse_name(name: str) -> Tuple[str, int]:
+        """
+        Parse topic and frame index from a file name
+        :param name: File name of format KEY_INDEX.SUFFIX
+        :return:
+        """
         try:
-            name_split = re.split(r"([_\-]\d+)", self.__file_path.name)
-            self.__topic_name = name_split[0]
-            self.__index = int(name_split[1][1:])
+            name_split = FileModel.NAME_PATTERN.split(name, 1)
+            return name_split[0], int(name_split[1][1:])
         except IndexError as exc:
             raise ValueError(
                 "Invalid Filename format -> Should be KEY_INDEX.SUFFIX"
             ) from exc
 
+    @staticmethod
+    def from_index_entry(file_path: Path, entry: IndexEntry) -> "FileModel":
+        """
+        Create a file model with the topic and frame index of the index entry
+        :param file_path:
+        :param entry:
+        :return:
+        """
+        if entry.topic is None:
+            # raises the error of an invalid file name
+            return FileModel(file_path)
+        return FileModel.from_parts(file_path, entry.topic, entry.frame_index)
+
+    @staticmethod
+    def from_parts(file_path: Path, topic_name: str, file_index: int) -> "FileModel":
+        """
+        Create a file model with an already parsed topic and frame index
+        :param file_path:
+        :param topic_name:
+        :param file_index:
+        :return:
+        """
+        file_model = FileModel.__new__(FileModel)
+        file_model.__file_path = (
+            file_path if isinstance(file_path, Path) else Path(file_path)
+        )
+        file_model.__topic_name = topic_name
+        file_model.__index = int(file_index)
+        return file_model
+
+    @staticmethod
+    def create(file):
+        """
+        Create a file model from a file path or use an existing file model
+        :param file:
+        :return:
+        """
+        return file if isinstance(file, FileModel) else FileModel(file)
+
     def __lt__(self, other):
         return self.file_index < other.file_index
 
@@ -95,11 +438,146 @@ class FileModel:
         )
 
 
+class FileTable:
+    """
+    Columnar collection of files with NumPy arrays of topic ids and frame indices
+    Items are FileModels which are only created on access
+    """
+
+    def __init__(self, files: List, topics: List[str], topic_ids, frame_indices):
+        self.__files = files
+        self.__topics = topics
+        self.__topic_ids = np.asarray(topic_ids, dtype=np.int64)
+        self.__frame_indices = np.asarray(frame_indices, dtype=np.int64)
+
+    @staticmethod
+    def from_files(files) -> "FileTable":
+        """
+        Parse topic and frame index of all files
+        :param files: File paths or FileModels
+        :return:
+        """
+        files = list(files)
+        topic_ids = {}
+        topic_id_column = []
+        frame_indices = []
+        for row, file in enumerate(files):
+            if isinstance(file, FileModel):
+                topic, frame_index = file.topic_name, file.file_index
+                files[row] = file.file_path
+            else:
+                name = file.name if isinstance(file, Path) else os.path.basename(file)
+                topic, frame_index = FileModel.parse_name(name)
+            topic_id_column.append(topic_ids.setdefault(topic, len(topic_ids)))
+            frame_indices.append(frame_index)
+        return FileTable(files, list(topic_ids), topic_id_column, frame_indices)
+
+    @staticmethod
+    def create(files) -> "FileTable":
+        """
+        Create a file table from files or use an existing file table
+        :param files:
+        :return:
+        """
+        return files if isinstance(files, FileTable) else FileTable.from_files(files)
+
+    def __len__(self) -> int:
+        return len(self.__files)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return FileModel.from_parts(
+                self.__files[key],
+                self.__topics[self.__topic_ids[key]],
+                self.__frame_indices[key],
+            )
+        rows = np.arange(len(self))[key]
+        return FileTable(
+            [self.__files[row] for row in rows],
+            self.__topics,
+            self.__topic_ids[rows],
+            self.__frame_indices[rows],
+        )
+
+    def __iter__(self) -> Iterator[FileModel]:
+        return (
+            FileModel.from_parts(file_path, self.__topics[topic_id], frame_index)
+            for file_path, topic_id, frame_index in zip(
+                self.__files, self.__topic_ids.tolist(), self.__frame_indices.tolist()
+            )
+        )
+
+    @property
+    def files(self) -> List:
+        return self.__files
+
+    @property
+    def topics(self) -> List[str]:
+        return self.__topics
+
+    @property
+    def topic_ids(self) -> np.ndarray:
+        return self.__topic_ids
+
+    @property
+    def frame_indices(self) -> np.ndarray:
+        return self.__frame_indices
+
+    def group_by_keys(self, keys) -> Dict[str, "FileTable"]:
+        """
+        Group the files by topic, each group is stably sorted by frame index
+        :param keys: Topics of the groups, files of other topics are dropped
+        :return:
+        """
+        rows = np.lexsort((self.__frame_indices, self.__topic_ids))
+        topic_ids = self.__topic_ids[rows]
+        groups = {}
+        for key in keys:
+            if key not in self.__topics:
+                groups[key] = self[rows[:0]]
+                continue
+            topic_id = self.__topics.index(key)
+            start, stop = np.searchsorted(topic_ids, [topic_id, topic_id + 1])
+            groups[key] = self[rows[start:stop]]
+        return groups
+
+    def group_by_frame_index(self) -> Dict[int, List[FileModel]]:
+        """
+        Group the files by frame index in ascending order
+        :return: FileModels per frame index in the order of the table
+        """
+        rows = np.argsort(self.__frame_indices, kind="stable")
+        frame_indices, starts = np.unique(self.__frame_indices[rows], return_index=True)
+        return {
+            int(frame_index): [self[row] for row in group_rows]
+            for frame_index, group_rows in zip(
+                frame_indices, np.split(rows, starts[1:])
+            )
+        }
+
+    @staticmethod
+    def is_consecutive(file_groups: Dict[str, "FileTable"]) -> bool:
+        """Frame indices of every group are 0, 1, 2, ..."""
+        return all(
+            np.array_equal(group.frame_indices, np.arange(len(group)))
+            for group in file_groups.values()
+        )
+
+    @staticmethod
+    def has_same_lengths(file_groups: Dict[str, "FileTable"]) -> bool:
+        lengths = np.array([len(group) for group in file_groups.values()])
+        return len(lengths) > 0 and bool(np.all(lengths == lengths[0]))
+
+
 class ImageLayoutModel:
-    """Image Layout Model"""
+    """Image Layout Model, the location is read once from the layout data on first use"""
+
+    __slots__ = ("__image_layout", "__key", "__box")
 
     def __init__(self, image_layout):
         self.__image_layout = image_layout
+        self.__key = image_layout["camera"]
+        self.__box = None
 
     @staticmethod
     def create(topic, x, y, width, height):
@@ -116,67 +594,161 @@ class ImageLayoutModel:
 
     @property
     def key(self):
-        return self.__image_layout["camera"]
+        return self.__key
 
     @property
     def top_left(self):
-        return (
-            self.x,
-            self.y,
-        )
+        return self.box[:2]
 
     @property
     def x(self):
-        return self.__image_layout["location"]["x"]
+        return self.box[0]
 
     @property
     def y(self):
-        return self.__image_layout["location"]["y"]
+        return self.box[1]
 
     @property
     def width(self):
-        return self.__image_layout["location"]["width"]
+        return self.box[2] - self.box[0]
 
     @property
     def height(self):
-        return self.__image_layout["location"]["height"]
+        return self.box[3] - self.box[1]
 
     @property
     def box(self):
-        return (
-            self.x,
-            self.y,
-            self.x + self.__image_layout["location"]["width"],
-            self.y + self.__image_layout["location"]["height"],
-        )
+        if self.__box is None:
+            location = self.__image_layout["location"]
+            self.__box = (
+                location["x"],
+                location["y"],
+                location["x"] + location["width"],
+                location["y"] + location["height"],
+            )
+        return self.__box
 
     def is_inside(self, x, y):
-        return self.x < x < self.box[2] and self.y < y < self.box[3]
+        x_min, y_min, x_max, y_max = self.box
+        return x_min < x < x_max and y_min < y < y_max
+
+
+class Layout:
+    """
+    Immutable layout of all views of a merged frame, created once and shared by all merge groups
+    The view boxes are created on first use as read-only NumPy array of (x_min, y_min, x_max, y_max) rows
+    """
+
+    __slots__ = ("__layout_data", "__image_layouts", "__keys", "__boxes")
+
+    def __init__(self, layout_data: Dict):
+        self.__layout_data = layout_data
+        self.__image_layouts = tuple(
+            ImageLayoutModel(image_layout)
+            for image_layout in layout_data.get("layout", [])
+        )
+        self.__keys = tuple(image_layout.key for image_layout in self.__image_layouts)
+        self.__boxes = None
+
+    @staticmethod
+    def create(layout) -> "Layout":
+        """
+        Create a layout from layout data or use an existing layout
+        :param layout:
+        :return:
+        """
+        return layout if isinstance(layout, Layout) else Layout(layout)
+
+    def __len__(self) -> int:
+        return len(self.__image_layouts)
+
+    def __iter__(self) -> Iterator[ImageLayoutModel]:
+        return iter(self.__image_layouts)
+
+    def __getitem__(self, index: int) -> ImageLayoutModel:
+        return self.__image_layouts[index]
+
+    @property
+    def layout_data(self) -> Dict:
+        return self.__layout_data
+
+    @property
+    def width(self) -> int:
+        return self.__layout_data["width"]
+
+    @property
+    def height(self) -> int:
+        return self.__layout_data["height"]
+
+    @property
+    def image_layouts(self) -> Tuple[ImageLayoutModel, ...]:
+        return self.__image_layouts
+
+    @property
+    def keys(self) -> Tuple[str, ...]:
+        return self.__keys
+
+    @property
+    def boxes(self) -> np.ndarray:
+        if self.__boxes is None:
+            boxes = np.array(
+                [image_layout.box for image_layout in self.__image_layouts], dtype=float
+            ).reshape(-1, 4)
+            boxes.flags.writeable = False
+            self.__boxes = boxes
+        return self.__boxes
+
+    def contains(self, points) -> np.ndarray:
+        """
+        Check which points are inside which view, the box borders are outside like in ImageLayoutModel.is_inside
+        :param points: Array like of shape (N, 2) with x and y coordinates
+        :return: Boolean array of shape (N, number of views)
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 1, 2)
+        boxes = self.boxes[np.newaxis]
+        return np.all((boxes[..., :2] < points) & (points < boxes[..., 2:]), axis=-1)
+
+    def locate(self, points) -> np.ndarray:
+        """
+        Look up the view of every point
+        :param points: Array like of shape (N, 2) with x and y coordinates
+        :return: Index of the first view containing the point or -1 if the point is outside of all views
+        """
+        inside = self.contains(points)
+        return np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
 
 
 class MergeGroup:
     """Files that should be merged together with respect to the provided layout"""
 
     def __init__(self, layout, files_dict):
-        self.__layout = layout
+        """
+        :param layout: Layout or layout data, pass the same Layout to share it between merge groups
+        :param files_dict: File of each key in the order of the layout
+        """
+        self.__layout = Layout.create(layout)
         self.__files = files_dict
-        assert self.keys == list(files_dict.keys())
+        assert self.__layout.keys == tuple(files_dict.keys())
+
+    @property
+    def layout(self) -> Layout:
+        return self.__layout
 
     @property
     def width(self):
-        return self.__layout["width"]
+        return self.__layout.width
 
     @property
     def height(self):
-        return self.__layout["height"]
+        return self.__layout.height
 
     @property
     def image_layouts(self):
-        return [ImageLayoutModel(cam) for cam in self.__layout["layout"]]
+        return self.__layout.image_layouts
 
     @property
     def keys(self):
-        return [cam.key for cam in self.image_layouts]
+        return self.__layout.keys
 
     def get_file_path_by_key(self, key):
         return self.__files[key].file_path
@@ -194,15 +766,7 @@ class FileReindexer:
 
     @staticmethod
     def group_files_by_index(files):
-        file_models = [FileModel(file) for file in files]
-        file_models.sort()
-        file_groups = {}
-        for file in file_models:
-            if file.file_index in file_groups.keys():
-                file_groups[file.file_index].append(file)
-            else:
-                file_groups[file.file_index] = [file]
-        return file_groups
+        return FileTable.create(files).group_by_frame_index()
 
     @property
     def files_to_reindex(self):
@@ -243,7 +807,7 @@ class FileGrouper:
 
     def __init__(self, layout_data, files, keys):
         self.__merge_groups = []
-        self.__layout = layout_data
+        self.__layout = Layout.create(layout_data)
         file_groups = self.group_files_by_keys(files, keys)
         self.__valid = self.is_consecutive(file_groups) and self.has_same_lengths(
             file_groups
@@ -252,46 +816,31 @@ class FileGrouper:
 
     @staticmethod
     def group_files_by_keys(files, keys):
-        file_models = [FileModel(file) for file in files]
-        file_models.sort()
-        file_groups = {key: [] for key in keys}
-        for file in file_models:
-            if file.topic_name in keys:
-                file_groups[file.topic_name].append(file)
-        return file_groups
-
-    @staticmethod
-    def pop_first_of_group(file_groups):
-        group = {}
-        for key, value in file_groups.items():
-            group[key] = value.pop(0)
-        return group
+        return FileTable.create(files).group_by_keys(keys)
 
     @staticmethod
     def is_consecutive(file_groups):
-        results = []
-        for file_models in file_groups.values():
-            file_numbers = [file.file_index for file in file_models]
-            results.append(file_numbers == list(range(len(file_models))))
-
-        return all(results)
+        return FileTable.is_consecutive(
+            {key: FileTable.create(files) for key, files in file_groups.items()}
+        )
 
     @staticmethod
     def is_empty(file_groups):
         return all([not element for element in file_groups.values()])
 
     def __build_merge_groups(self, file_groups):
-        if not self.is_valid:
+        if not self.is_valid or self.is_empty(file_groups):
             return
 
-        while next(iter(file_groups.values())):
-            files_dict = self.pop_first_of_group(file_groups)
-            self.__merge_groups.append(MergeGroup(self.__layout, files_dict))
+        keys = list(file_groups.keys())
+        self.__merge_groups = [
+            MergeGroup(self.__layout, dict(zip(keys, files)))
+            for files in zip(*file_groups.values())
+        ]
 
     @staticmethod
     def has_same_lengths(file_groups):
-        results = [len(file_models) for file_models in file_groups.values()]
-        return len(results) > 0 and all(elem == results[0] for elem in results)
+        return FileTable.has_same_lengths(file_groups)
 
     @property
     def merge_groups(self):
@@ -1,13 +1,35 @@
 """Geometric Operations"""
 
-from typing import Dict, List, Tuple
+import math
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
 
-import shapely.affinity
+import numpy as np
 from shapely.geometry import Point
 
 from util.files import ImageLayoutModel
 
 
+def transform_label_points(label_data: Dict, transform: Callable) -> Dict:
+    """
+    Transform the points of all labels in place, independent of their shape type and number of points
+    :param label_data:
+    :param transform: Function mapping an (N, 2) array of the points of all shapes to the transformed points
+    :return:
+    """
+    shapes = label_data["shapes"]
+    points = np.array(
+        [point for shape in shapes for point in shape["points"]], dtype=float
+    ).reshape(-1, 2)
+    points = transform(points).tolist()
+    start = 0
+    for shape in shapes:
+        stop = start + len(shape["points"])
+        shape["points"] = points[start:stop]
+        start = stop
+
+    return label_data
+
+
 def shift_label_points(label_data: Dict, x: int, y: int) -> Dict:
     """
     Shift all label points by x and y
@@ -16,12 +38,20 @@ def shift_label_points(label_data: Dict, x: int, y: int) -> Dict:
     :param y:
     :return:
     """
-    for shape in label_data["shapes"]:
-        circle = Circle.from_json(shape["points"])
-        circle.translate(x, y)
-        shape["points"] = circle.to_json()
+    return transform_label_points(label_data, lambda points: points + (x, y))
 
-    return label_data
+
+def scale_label_points(label_data: Dict, x_scale: float, y_scale: float) -> Dict:
+    """
+    Scale all label points by x_scale and y_scale with respect to the image origin
+    :param label_data:
+    :param x_scale:
+    :param y_scale:
+    :return:
+    """
+    return transform_label_points(
+        label_data, lambda points: points * (float(x_scale), float(y_scale))
+    )
 
 
 def is_shape_inside(shape: Dict, layout_model: ImageLayoutModel) -> bool:
@@ -35,66 +65,196 @@ def is_shape_inside(shape: Dict, layout_model: ImageLayoutModel) -> bool:
     return layout_model.is_inside(centroid[0], centroid[1])
 
 
-class Circle:
-    """Circular ROI Element"""
+def circle_iou(
+    centroids_a: np.ndarray,
+    radii_a: np.ndarray,
+    centroids_b: np.ndarray,
+    radii_b: np.ndarray,
+) -> np.ndarray:
+    """
+    Exact IoU of circles a and b via the circle-circle intersection (lens) area
+    All arguments are broadcast against each other, centroids have a trailing axis of size 2
+    :param centroids_a:
+    :param radii_a:
+    :param centroids_b:
+    :param radii_b:
+    :return:
+    """
+    delta = np.asarray(centroids_a, dtype=float) - np.asarray(centroids_b, dtype=float)
+    distance = np.sqrt(delta[..., 0] * delta[..., 0] + delta[..., 1] * delta[..., 1])
+    radius_a, radius_b, distance = np.broadcast_arrays(
+        np.asarray(radii_a, dtype=float), np.asarray(radii_b, dtype=float), distance
+    )
 
-    IMAGE_ORIGIN = Point(0, 0)
+    is_disjoint = distance >= radius_a + radius_b
+    is_contained = distance <= np.abs(radius_a - radius_b)
+    is_lens = ~(is_disjoint | is_contained)
 
-    def __init__(self, center: Tuple, point_on_radius: Tuple):
-        self.__centroid = Point(center[0], center[1])
-        self.__radius_point = Point(point_on_radius[0], point_on_radius[1])
+    intersection = np.where(
+        is_contained, math.pi * np.minimum(radius_a, radius_b) ** 2, 0.0
+    )
+    r_a, r_b, d = radius_a[is_lens], radius_b[is_lens], distance[is_lens]
+    alpha = np.arccos(np.clip((d * d + r_a * r_a - r_b * r_b) / (2 * d * r_a), -1, 1))
+    beta = np.arccos(np.clip((d * d + r_b * r_b - r_a * r_a) / (2 * d * r_b), -1, 1))
+    kite = np.sqrt(
+        np.clip(
+            (-d + r_a + r_b) * (d + r_a - r_b) * (d - r_a + r_b) * (d + r_a + r_b),
+            0,
+            None,
+        )
+    )
+    intersection[is_lens] = r_a * r_a * alpha + r_b * r_b * beta - 0.5 * kite
+
+    union = math.pi * (radius_a * radius_a + radius_b * radius_b) - intersection
+    return np.divide(
+        intersection, union, out=np.zeros_like(intersection), where=union > 0
+    )
+
+
+class CircleArray:
+    """Structure of arrays of circular ROI elements"""
+
+    def __init__(self, centroids: Sequence, radius_points: Sequence):
+        self.__centroids = np.array(centroids, dtype=float).reshape(-1, 2)
+        self.__radius_points = np.array(radius_points, dtype=float).reshape(-1, 2)
+        if len(self.__centroids) != len(self.__radius_points):
+            raise ValueError("Number of centroids and radius points does not match")
 
     @staticmethod
-    def from_region_props(region):
-        return Circle(
-            (region.centroid[1], region.centroid[0]),
-            (region.centroid[1] + region.equivalent_diameter / 2, region.centroid[0]),
+    def from_json(json_points_list: Sequence) -> "CircleArray":
+        """
+        Create circles from the points of labelme circle shapes
+        :param json_points_list: Centroid and radius point per circle
+        :return:
+        """
+        if any(len(json_points) != 2 for json_points in json_points_list):
+            raise ValueError(
+                "Circles require exactly two points, a centroid and a radius point"
+            )
+        points = np.array(json_points_list, dtype=float).reshape(-1, 2, 2)
+        return CircleArray(points[:, 0], points[:, 1])
+
+    @staticmethod
+    def from_circles(circles: Sequence["Circle"]) -> "CircleArray":
+        return CircleArray.from_json([circle.to_json() for circle in circles])
+
+    def to_json(self) -> List:
+        return np.stack((self.__centroids, self.__radius_points), axis=1).tolist()
+
+    def __len__(self) -> int:
+        return len(self.__centroids)
+
+    def __getitem__(self, index: int) -> "Circle":
+        if not -len(self) <= index < len(self):
+            raise IndexError("CircleArray index out of range")
+        return Circle.view(self, index % len(self))
+
+    def __iter__(self) -> Iterator["Circle"]:
+        return (Circle.view(self, index) for index in range(len(self)))
+
+    @property
+    def centroids(self) -> np.ndarray:
+        return self.__centroids
+
+    @property
+    def radius_points(self) -> np.ndarray:
+        return self.__radius_points
+
+    @property
+    def radii(self) -> np.ndarray:
+        delta = self.__radius_points - self.__centroids
+        return np.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1])
+
+    @property
+    def bounding_boxes(self) -> np.ndarray:
+        radii = self.radii[:, np.newaxis]
+        return np.hstack((self.__centroids - radii, self.__centroids + radii))
+
+    def translate(self, x, y) -> None:
+        """Translate all circles by x and y, either scalars or arrays of length N"""
+        offset = np.stack(np.broadcast_arrays(x, y), axis=-1)
+        self.__centroids += offset
+        self.__radius_points += offset
+
+    def scale(self, x_scale: float, y_scale: float) -> None:
+        """Scale all circles with respect to the image origin"""
+        factor = np.array([float(x_scale), float(y_scale)])
+        self.__centroids *= factor
+        self.__radius_points *= factor
+
+    def iou(self, circle: "Circle") -> np.ndarray:
+        """IoU of the given circle with every circle of this array"""
+        return circle_iou(
+            circle.centroid_array, circle.radius, self.__centroids, self.radii
+        )
+
+    def pairwise_iou(self, circles: "CircleArray") -> np.ndarray:
+        """IoU matrix of shape (len(self), len(circles)) of all circle pairs"""
+        return circle_iou(
+            self.__centroids[:, np.newaxis],
+            self.radii[:, np.newaxis],
+            circles.centroids[np.newaxis],
+            circles.radii[np.newaxis],
         )
 
+
+class Circle:
+    """Circular ROI Element as view onto a single element of a CircleArray"""
+
+    def __init__(self, center: Tuple, point_on_radius: Tuple):
+        self.__circles = CircleArray([center], [point_on_radius])
+        self.__index = 0
+
+    @staticmethod
+    def view(circles: CircleArray, index: int) -> "Circle":
+        circle = Circle.__new__(Circle)
+        circle.__circles = circles
+        circle.__index = index
+        return circle
+
     @staticmethod
     def from_json(json_points):
         return Circle(json_points[0], json_points[1])
 
-    def to_json(self) -> Dict:
+    def to_json(self) -> List:
         return [
-            [self.__centroid.x, self.__centroid.y],
-            [self.__radius_point.x, self.__radius_point.y],
+            self.__circles.centroids[self.__index].tolist(),
+            self.__circles.radius_points[self.__index].tolist(),
         ]
 
     @property
-    def centroid(self) -> Tuple:
-        return self.__centroid
+    def centroid(self) -> Point:
+        return Point(self.__circles.centroids[self.__index])
+
+    @property
+    def centroid_array(self) -> np.ndarray:
+        return self.__circles.centroids[self.__index]
 
     @property
     def radius(self) -> float:
-        return self.__centroid.distance(self.__radius_point)
+        delta = (
+            self.__circles.radius_points[self.__index]
+            - self.__circles.centroids[self.__index]
+        )
+        return float(np.sqrt(delta[0] * delta[0] + delta[1] * delta[1]))
 
     @property
     def bounding_box(self) -> List:
-        circle = self.centroid.buffer(self.centroid.distance(self.__radius_point))
-        return list(circle.bounds)
+        x, y = self.__circles.centroids[self.__index].tolist()
+        radius = self.radius
+        return [x - radius, y - radius, x + radius, y + radius]
 
     def translate(self, x: int, y: int) -> None:
-        self.__centroid = shapely.affinity.translate(self.__centroid, x, y)
-        self.__radius_point = shapely.affinity.translate(self.__radius_point, x, y)
+        self.__circles.centroids[self.__index] += (x, y)
+        self.__circles.radius_points[self.__index] += (x, y)
 
     def scale(self, x_scale: float, y_scale: float):
-        self.__centroid = shapely.affinity.scale(
-            self.__centroid, x_scale, y_scale, origin=self.IMAGE_ORIGIN
-        )
-        self.__radius_point = shapely.affinity.scale(
-            self.__radius_point, x_scale, y_scale, origin=self.IMAGE_ORIGIN
-        )
+        self.__circles.centroids[self.__index] *= (x_scale, y_scale)
+        self.__circles.radius_points[self.__index] *= (x_scale, y_scale)
 
     def iou(self, circle) -> float:
-        union_area = (
-            self.centroid.buffer(self.radius)
-            .union(circle.centroid.buffer(circle.radius))
-            .area
-        )
-        intersection_area = (
-            self.centroid.buffer(self.radius)
-            .intersection(circle.centroid.buffer(circle.radius))
-            .area
+        return float(
+            circle_iou(
+                self.centroid_array, self.radius, circle.centroid_array, circle.radius
+            )
         )
-        return intersection_area / union_area
@@ -1,15 +1,48 @@
 """Module for h5 operations"""
 
+import io
 import json
+import math
+from collections import namedtuple
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import h5py
+import numpy as np
 import PIL.Image
 from tqdm import tqdm
 
 from util import config
 from util.files import write_json
+from util.geometry import CircleArray
+
+
+def read_image_bytes(file_path: Path) -> np.ndarray:
+    """
+    Read the encoded bytes of an image file without decoding the pixels
+    :param file_path:
+    :return: 1-D uint8 array of the file content
+    """
+    return np.frombuffer(Path(file_path).read_bytes(), dtype=np.uint8)
+
+
+def read_image_format(file_path: Path) -> str:
+    """
+    Read the PIL format of an image file from its header
+    :param file_path:
+    :return:
+    """
+    with PIL.Image.open(file_path) as image:
+        return image.format
+
+
+def decode_image(data: np.ndarray) -> PIL.Image.Image:
+    """
+    Open encoded image bytes, the pixels are decoded lazily on first access
+    :param data: 1-D uint8 array of the encoded image
+    :return:
+    """
+    return PIL.Image.open(io.BytesIO(np.asarray(data, dtype=np.uint8).tobytes()))
 
 
 class HDF5Wrapper:
@@ -18,6 +51,11 @@ class HDF5Wrapper:
     SAMPLE_KEY = "sample"
     IMAGE_KEY = "image"
     ROI_KEY = "roi"
+    VERSION_KEY = "version"
+    FORMAT_KEY = "format"
+
+    SAMPLE_LAYOUT_VERSION = 1
+    PACKED_LAYOUT_VERSION = 2
 
     def __init__(self, file_path: Path, mode: str):
         self.__h5_file = h5py.File(file_path, mode)
@@ -44,17 +82,93 @@ class HDF5Wrapper:
     def h5_file(self):
         return self.__h5_file
 
+    @property
+    def version(self) -> int:
+        """Layout version of the file, files without version use the sample layout"""
+        return int(
+            self.__h5_file.attrs.get(
+                HDF5Wrapper.VERSION_KEY, HDF5Wrapper.SAMPLE_LAYOUT_VERSION
+            )
+        )
+
+    @property
+    def is_packed(self) -> bool:
+        return self.version == HDF5Wrapper.PACKED_LAYOUT_VERSION
+
+    @property
+    def sample_count(self) -> int:
+        """Number of samples independent of the file layout"""
+        return self.packed_length if self.is_packed else len(self.__h5_file)
+
+    @property
+    def sample_keys(self) -> List[str]:
+        """Keys of the sample layout ordered by sample index, positions index into this list"""
+        if self.is_packed:
+            return []
+        return sorted(self.__h5_file.keys(), key=HDF5Wrapper.index)
+
+    @property
+    def packed_length(self) -> int:
+        """Number of samples stored in the packed layout"""
+        return max(
+            (
+                len(dataset)
+                for key in (HDF5Wrapper.IMAGE_KEY, HDF5Wrapper.ROI_KEY)
+                if key in self.__h5_file
+                for dataset in self.__h5_file[key].values()
+            ),
+            default=0,
+        )
+
+    @property
+    def is_encoded(self) -> bool:
+        """Images are stored as encoded bytes with a format attribute per dataset"""
+        if self.is_packed:
+            images = self.__h5_file.get(HDF5Wrapper.IMAGE_KEY, {})
+        elif len(self.__h5_file):
+            # all samples are stored with the same encoding, any sample is representative
+            first_sample = self.__h5_file[next(iter(self.__h5_file))]
+            images = first_sample.get(HDF5Wrapper.IMAGE_KEY, {})
+        else:
+            images = {}
+        return any(
+            HDF5Wrapper.FORMAT_KEY in dataset.attrs for dataset in images.values()
+        )
+
 
 class HDF5Writer:
-    """HDF5 File Writer"""
+    """HDF5 File Writer with one group per sample"""
 
-    def __init__(self, file_path: Path):
-        self.__h5_file = HDF5Wrapper(file_path, "w")
+    def __init__(self, file_path: Path, encoded=False, append=False):
+        self.__h5_file = HDF5Wrapper(file_path, "a" if append else "w")
+        h5_file = self.__h5_file.h5_file
+        if len(h5_file) and self.__h5_file.version != HDF5Wrapper.SAMPLE_LAYOUT_VERSION:
+            raise ValueError(
+                f"Can only append to hdf5 files with sample layout: {file_path}"
+            )
+        if len(h5_file) and self.__h5_file.is_encoded != encoded:
+            raise ValueError(
+                f"Image encoding does not match the samples of {file_path}"
+            )
+        h5_file.attrs[HDF5Wrapper.VERSION_KEY] = HDF5Wrapper.SAMPLE_LAYOUT_VERSION
+        self.__encoded = encoded
+        self.__offset = max((HDF5Wrapper.index(key) for key in h5_file), default=-1) + 1
 
     def add_image_group(self, index: int, merge_group):
-        self.__add_merge_group(
-            index, HDF5Wrapper.IMAGE_KEY, merge_group, PIL.Image.open
-        )
+        if self.__encoded:
+            self.__add_merge_group(
+                index,
+                HDF5Wrapper.IMAGE_KEY,
+                merge_group,
+                read_image_bytes,
+                attribute_reader=lambda path: {
+                    HDF5Wrapper.FORMAT_KEY: read_image_format(path)
+                },
+            )
+        else:
+            self.__add_merge_group(
+                index, HDF5Wrapper.IMAGE_KEY, merge_group, PIL.Image.open
+            )
 
     def add_roi_group(self, index: int, merge_group):
         def read_json_string(path: Path):
@@ -68,14 +182,116 @@ class HDF5Writer:
             h5py.string_dtype(),
         )
 
-    def __add_merge_group(self, index, key, merge_group, data_reader, d_type=None):
+    def __add_merge_group(
+        self, index, key, merge_group, data_reader, d_type=None, attribute_reader=None
+    ):
         group = HDF5Wrapper.get_or_create_group(
-            self.__h5_file.h5_file, HDF5Wrapper.sample_key(index)
+            self.__h5_file.h5_file, HDF5Wrapper.sample_key(self.__offset + index)
         )
         sub_group = HDF5Wrapper.get_or_create_group(group, key)
         for topic in merge_group.keys:
             file_path = merge_group.get_file_path_by_key(topic)
-            sub_group.create_dataset(topic, data=data_reader(file_path), dtype=d_type)
+            dataset = sub_group.create_dataset(
+                topic, data=data_reader(file_path), dtype=d_type
+            )
+            if attribute_reader is not None:
+                dataset.attrs.update(attribute_reader(file_path))
+
+
+class PackedHDF5Writer:
+    """
+    HDF5 File Writer with one resizable dataset per topic
+    Images are stored as (N, H, W, 3) uint8 datasets chunked by frame, ROIs as (N,) string datasets
+    Encoded images are stored as (N,) variable-length uint8 datasets with a format attribute
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        compression: Optional[str] = "gzip",
+        append=False,
+        encoded=False,
+    ):
+        self.__h5_file = HDF5Wrapper(file_path, "a" if append else "w")
+        h5_file = self.__h5_file.h5_file
+        if len(h5_file) and self.__h5_file.version != HDF5Wrapper.PACKED_LAYOUT_VERSION:
+            raise ValueError(
+                f"Can only append to hdf5 files with packed layout: {file_path}"
+            )
+        h5_file.attrs[HDF5Wrapper.VERSION_KEY] = HDF5Wrapper.PACKED_LAYOUT_VERSION
+        self.__compression = compression
+        self.__encoded = encoded
+        self.__offset = self.__h5_file.packed_length
+
+    def add_image_group(self, index: int, merge_group):
+        if self.__encoded:
+            self.__add_encoded_image_group(index, merge_group)
+            return
+        for topic in merge_group.keys:
+            image = PIL.Image.open(merge_group.get_file_path_by_key(topic))
+            self.__add_sample(
+                HDF5Wrapper.IMAGE_KEY,
+                topic,
+                index,
+                np.asarray(image.convert(config.IMAGE_FORMAT)),
+                self.__compression,
+            )
+
+    def add_roi_group(self, index: int, merge_group):
+        for topic in merge_group.keys:
+            self.__add_sample(
+                HDF5Wrapper.ROI_KEY,
+                topic,
+                index,
+                np.array(
+                    merge_group.get_file_path_by_key(topic).read_text(),
+                    dtype=h5py.string_dtype(),
+                ),
+            )
+
+    def __add_encoded_image_group(self, index: int, merge_group):
+        for topic in merge_group.keys:
+            file_path = merge_group.get_file_path_by_key(topic)
+            data = np.empty((), dtype=h5py.vlen_dtype(np.uint8))
+            data[()] = read_image_bytes(file_path)
+            # encoded images are already compressed
+            self.__add_sample(
+                HDF5Wrapper.IMAGE_KEY,
+                topic,
+                index,
+                data,
+                attributes={HDF5Wrapper.FORMAT_KEY: read_image_format(file_path)},
+            )
+
+    def __add_sample(self, key, topic, index, data, compression=None, attributes=None):
+        attributes = attributes or {}
+        group = HDF5Wrapper.get_or_create_group(self.__h5_file.h5_file, key)
+        if topic not in group:
+            dataset = group.create_dataset(
+                topic,
+                shape=(0,) + data.shape,
+                maxshape=(None,) + data.shape,
+                chunks=(1,) + data.shape if data.shape else True,
+                dtype=data.dtype,
+                compression=compression,
+            )
+            dataset.attrs.update(attributes)
+        dataset = group[topic]
+        if dataset.shape[1:] != data.shape:
+            raise ValueError(
+                f"Shape {data.shape} of {topic} sample {index} does not match "
+                f"the dataset shape {dataset.shape[1:]}"
+            )
+        for name, value in attributes.items():
+            if dataset.attrs.get(name) != value:
+                raise ValueError(
+                    f"{name} {value} of {topic} sample {index} does not match "
+                    f"the dataset {name} {dataset.attrs.get(name)}"
+                )
+        position = self.__offset + index
+        if position >= len(dataset):
+            dataset.resize(position + 1, axis=0)
+        dataset[position] = data
 
 
 class HDF5Extractor:
@@ -83,32 +299,103 @@ class HDF5Extractor:
 
     def __init__(self, file_path: Path):
         self.__h5_file = HDF5Wrapper(file_path, "r")
+        self.__encoded = self.__h5_file.is_encoded
+
+    def __len__(self) -> int:
+        return self.__h5_file.sample_count
+
+    def samples(self, indices: Optional[range] = None) -> Iterator[Tuple]:
+        """
+        Iterate over the samples independent of the file layout
+        :param indices: Positions of the samples to read, all samples by default
+        :return: Generator of index, image data and roi data per sample
+        """
+        h5_file = self.__h5_file.h5_file
+        if indices is None:
+            indices = range(len(self))
+        if self.__h5_file.is_packed:
+            images = h5_file[HDF5Wrapper.IMAGE_KEY]
+            rois = h5_file[HDF5Wrapper.ROI_KEY]
+            for index in indices:
+                yield (
+                    index,
+                    {topic: images[topic][index] for topic in images.keys()},
+                    # 0-d arrays to read the json strings like scalar datasets
+                    {topic: np.array(rois[topic][index]) for topic in rois.keys()},
+                )
+        else:
+            sample_keys = self.__h5_file.sample_keys
+            for position in indices:
+                sample = h5_file[sample_keys[position]]
+                yield (
+                    HDF5Wrapper.index(sample_keys[position]),
+                    sample[HDF5Wrapper.IMAGE_KEY],
+                    sample[HDF5Wrapper.ROI_KEY],
+                )
+
+    def sample_ranges(self, range_count: int) -> List[range]:
+        """
+        Split the samples into consecutive ranges of similar size
+        :param range_count: Maximum number of ranges
+        :return:
+        """
+        range_size = max(1, math.ceil(len(self) / max(1, range_count)))
+        return [
+            range(start, min(start + range_size, len(self)))
+            for start in range(0, len(self), range_size)
+        ]
+
+    def output_path(self, output_dir: Path) -> Path:
+        return output_dir / Path(self.__h5_file.h5_file.filename).stem
 
     def extract_data(self, output_dir: Path):
-        output_path = output_dir / Path(self.__h5_file.h5_file.filename).stem
+        for _ in tqdm(self.extract_samples(output_dir), total=len(self)):
+            pass
+
+    def extract_samples(
+        self, output_dir: Path, indices: Optional[range] = None
+    ) -> Iterator[int]:
+        """
+        Extract the samples into the output directory
+        :param output_dir:
+        :param indices: Positions of the samples to extract, all samples by default
+        :return: Generator of the index of each extracted sample
+        """
+        output_path = self.output_path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
-        for sample in tqdm(self.__h5_file.h5_file.items()):
-            index = HDF5Wrapper.index(sample[0])
-            roi_data = self.get_roi_data(sample[1][HDF5Wrapper.ROI_KEY], index)
+        for index, image_group, roi_group in self.samples(indices):
+            roi_data = self.get_roi_data(roi_group, index)
             for json_data, target in roi_data:
                 write_json(output_path / target, json_data)
             image_file_name = [json_data["imagePath"] for json_data, _ in roi_data]
-            image_data = self.get_image_data(sample[1][HDF5Wrapper.IMAGE_KEY])
-            for image, target in zip(image_data, image_file_name):
-                image.save(output_path / target)
+            for key, target in zip(image_group.keys(), image_file_name):
+                self.save_image(image_group[key], output_path / target, self.__encoded)
+            yield index
 
     @staticmethod
     def file_name(key: str, index: int, suffix: str) -> str:
         return config.MVROI_FILENAME_TEMPLATE % (key, index, suffix)
 
     @staticmethod
-    def get_image_data(data) -> List:
-        image_data = []
-        for key in data.keys():
-            array = data[key][:]
+    def save_image(data, file_path: Path, encoded=False):
+        """
+        Save image data, encoded images in the format of the target file are copied byte by byte
+        :param data: Image dataset or array
+        :param file_path:
+        :param encoded:
+        :return:
+        """
+        array = data[:]
+        if not encoded:
             image = PIL.Image.fromarray(array.astype("uint8"), config.IMAGE_FORMAT)
-            image_data.append(image)
-        return image_data
+            image.save(file_path)
+            return
+        image = decode_image(array)
+        target_format = PIL.Image.registered_extensions().get(file_path.suffix.lower())
+        if image.format == target_format:
+            file_path.write_bytes(array.tobytes())
+        else:
+            image.save(file_path)
 
     @staticmethod
     def get_roi_data(data, index: int) -> List:
@@ -119,3 +406,103 @@ class HDF5Extractor:
             )
             for key in data.keys()
         ]
+
+
+HDF5Sample = namedtuple("HDF5Sample", ["image", "rois"])
+
+
+class HDF5Dataset:
+    """
+    Random access reader for hdf5 files of both layouts
+    Indexing returns a dict of HDF5Sample per topic with the image as numpy array and the ROIs
+    as CircleArray. Slicing returns the images stacked along the first axis and a list of ROIs.
+    """
+
+    def __init__(self, file_path: Path, topics: Optional[List[str]] = None):
+        self.__h5_file = HDF5Wrapper(file_path, "r")
+        h5_file = self.__h5_file.h5_file
+        self.__sample_keys = self.__h5_file.sample_keys
+        if self.__h5_file.is_packed:
+            # the datasets of a packed file are created with the first sample
+            available_topics = list(h5_file.get(HDF5Wrapper.IMAGE_KEY, {}).keys())
+        elif self.__sample_keys:
+            first_sample = h5_file[self.__sample_keys[0]]
+            available_topics = list(first_sample[HDF5Wrapper.IMAGE_KEY].keys())
+        else:
+            available_topics = []
+        if topics is None:
+            topics = available_topics
+        missing_topics = set(topics) - set(available_topics)
+        if missing_topics:
+            raise ValueError(f"Topics {sorted(missing_topics)} not in {file_path}")
+        self.__topics = list(topics)
+        self.__encoded = self.__h5_file.is_encoded
+
+    def __len__(self) -> int:
+        return self.__h5_file.sample_count
+
+    def __getitem__(self, key) -> Dict[str, HDF5Sample]:
+        if isinstance(key, slice):
+            indices = range(len(self))[key]
+            return {
+                topic: HDF5Sample(
+                    self.__read_images(topic, indices),
+                    [self.parse_rois(roi) for roi in self.__read_rois(topic, indices)],
+                )
+                for topic in self.__topics
+            }
+
+        if not -len(self) <= key < len(self):
+            raise IndexError(f"Sample index {key} out of range")
+        index = key % len(self)
+        return {
+            topic: HDF5Sample(
+                self.__read_images(topic, [index])[0],
+                self.parse_rois(self.__read_rois(topic, [index])[0]),
+            )
+            for topic in self.__topics
+        }
+
+    @property
+    def topics(self) -> List[str]:
+        return self.__topics
+
+    @staticmethod
+    def parse_rois(json_string) -> CircleArray:
+        return CircleArray.from_json(
+            [shape["points"] for shape in json.loads(json_string)["shapes"]]
+        )
+
+    def __read_images(self, topic: str, indices) -> np.ndarray:
+        if not len(indices):
+            return np.empty((0,) + self.__image_shape(topic), dtype=np.uint8)
+        images = self.__read(HDF5Wrapper.IMAGE_KEY, topic, indices)
+        if self.__encoded:
+            return np.stack(
+                [
+                    np.asarray(decode_image(image).convert(config.IMAGE_FORMAT))
+                    for image in images
+                ]
+            )
+        return np.asarray(images)
+
+    def __image_shape(self, topic: str) -> Tuple[int, ...]:
+        """Shape of the images of a topic, encoded images without samples have an unknown size of 0"""
+        if self.__h5_file.is_packed and not self.__encoded:
+            return self.__h5_file.h5_file[HDF5Wrapper.IMAGE_KEY][topic].shape[1:]
+        if not len(self):
+            return 0, 0, 3
+        # the size of encoded images is only known from a stored sample
+        return self.__read_images(topic, [0]).shape[1:]
+
+    def __read_rois(self, topic: str, indices) -> List:
+        return list(self.__read(HDF5Wrapper.ROI_KEY, topic, indices))
+
+    def __read(self, key: str, topic: str, indices):
+        h5_file = self.__h5_file.h5_file
+        if self.__h5_file.is_packed:
+            dataset = h5_file[key][topic]
+            if isinstance(indices, range) and indices.step > 0:
+                return dataset[slice(indices.start, indices.stop, indices.step)]
+            return [dataset[index] for index in indices]
+        return [h5_file[self.__sample_keys[index]][key][topic][()] for index in indices]
@@ -0,0 +1,103 @@
+"""Stacked heatmap arrays of multiple frames"""
+
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import h5py
+import numpy as np
+
+
+class HeatmapStack:
+    """
+    Heatmaps of N frames stacked into a single (N, H, W) float or uint8 array with a frame name per heatmap
+    Supported are .npy files, which are memory mapped, .npz files and HDF5 files. The heatmaps of .npz and
+    HDF5 files are stored with the key "heatmaps" and the frame names can be stored with the key "names".
+    Otherwise, the frame names are read from a text file with one name per line.
+    """
+
+    HEATMAPS_KEY = "heatmaps"
+    NAMES_KEY = "names"
+
+    NUMPY_SUFFIX = ".npy"
+    NUMPY_ARCHIVE_SUFFIX = ".npz"
+    HDF5_SUFFIXES = (".h5", ".hdf5")
+    SUFFIXES = (NUMPY_SUFFIX, NUMPY_ARCHIVE_SUFFIX) + HDF5_SUFFIXES
+
+    def __init__(self, file_path: Path, names_path: Optional[Path] = None):
+        """
+        :param file_path:
+        :param names_path: Text file with one frame name per line, overrides the names of the stack file
+        """
+        file_path = Path(file_path)
+        self.__h5_file = None
+        if file_path.suffix == HeatmapStack.NUMPY_SUFFIX:
+            self.__heatmaps = np.load(file_path, mmap_mode="r")
+            names = None
+        elif file_path.suffix == HeatmapStack.NUMPY_ARCHIVE_SUFFIX:
+            with np.load(file_path) as archive:
+                self.__heatmaps = archive[HeatmapStack.HEATMAPS_KEY]
+                names = archive.get(HeatmapStack.NAMES_KEY)
+        elif file_path.suffix in HeatmapStack.HDF5_SUFFIXES:
+            self.__h5_file = h5py.File(file_path, "r")
+            self.__heatmaps = self.__h5_file[HeatmapStack.HEATMAPS_KEY]
+            names = (
+                self.__h5_file[HeatmapStack.NAMES_KEY][()]
+                if HeatmapStack.NAMES_KEY in self.__h5_file
+                else None
+            )
+        else:
+            raise ValueError(
+                f"{file_path} is not a heatmap stack, supported suffixes are {', '.join(HeatmapStack.SUFFIXES)}"
+            )
+
+        if names_path is not None:
+            # one name per line, names may contain spaces
+            names = Path(names_path).read_text().rstrip("\r\n").splitlines()
+        if names is None:
+            raise ValueError(
+                f"{file_path} does not contain frame names, provide them in a separate text file"
+            )
+        self.__names = [HeatmapStack.decode_name(name) for name in names]
+
+        if len(self.__heatmaps.shape) != 3:
+            raise ValueError(
+                f"Heatmaps of shape {self.__heatmaps.shape} are not stacked as (N, H, W)"
+            )
+        if len(self.__names) != len(self.__heatmaps):
+            raise ValueError(
+                f"Number of frame names {len(self.__names)} does not match the number of heatmaps "
+                f"{len(self.__heatmaps)}"
+            )
+
+    def __del__(self):
+        if self.__h5_file is not None:
+            self.__h5_file.close()
+
+    def __len__(self) -> int:
+        return len(self.__heatmaps)
+
+    @staticmethod
+    def decode_name(name) -> str:
+        return name.decode() if isinstance(name, bytes) else str(name)
+
+    @property
+    def names(self) -> List[str]:
+        return self.__names
+
+    @property
+    def height(self) -> int:
+        return self.__heatmaps.shape[1]
+
+    @property
+    def width(self) -> int:
+        return self.__heatmaps.shape[2]
+
+    def chunks(self, chunk_size: int) -> Iterator[Tuple[List[str], np.ndarray]]:
+        """
+        Read the heatmaps in chunks, only a single chunk is held in memory for .npy and HDF5 files
+        :param chunk_size: Number of frames per chunk
+        :return: Generator of frame names and (chunk_size, H, W) heatmaps, the last chunk may be smaller
+        """
+        for start in range(0, len(self), chunk_size):
+            stop = min(start + chunk_size, len(self))
+            yield self.__names[start:stop], np.asarray(self.__heatmaps[start:stop])
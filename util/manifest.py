@@ -0,0 +1,204 @@
+"""Manifest of processed samples and the state of their input files"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class Manifest:
+    """
+    Journal of processed sample indices with the paths, sizes, mtimes and content hash of their inputs
+    The first line holds the version and a hash of the processing settings, every processed index is
+    appended as one json line. Records of an interrupted run are kept up to the last complete line.
+    Use the manifest as context manager or call close to close the journal.
+    """
+
+    VERSION = 1
+    HASH_BLOCK_SIZE = 1 << 20
+
+    def __init__(self, file_path: Path, settings: Dict):
+        self.__file_path = Path(file_path)
+        self.__header = {
+            "version": Manifest.VERSION,
+            "settings": Manifest.settings_hash(settings),
+        }
+        self.__records, self.__line_count = self.__read_records()
+        self.__journal = None
+        if self.__line_count is None or self.__line_count != len(self.__records):
+            # writes the header of a new manifest, drops superseded records and an incomplete last line
+            self.compact()
+        else:
+            self.__journal = self.__file_path.open("a")
+
+    def __enter__(self) -> "Manifest":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.__journal is not None:
+            self.__journal.close()
+
+    @property
+    def file_path(self) -> Path:
+        return self.__file_path
+
+    @property
+    def records(self) -> Dict[int, Dict]:
+        return self.__records
+
+    @staticmethod
+    def settings_hash(settings: Dict) -> str:
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+    @staticmethod
+    def file_state(file_path: Path) -> List:
+        stat = os.stat(file_path)
+        return [str(file_path), stat.st_size, stat.st_mtime_ns]
+
+    @staticmethod
+    def content_hash(file_paths: Sequence[Path]) -> str:
+        """
+        Hash the content of all files in the given order
+        :param file_paths:
+        :return:
+        """
+        content_hash = hashlib.sha256()
+        for file_path in file_paths:
+            with open(file_path, "rb") as file:
+                for block in iter(lambda: file.read(Manifest.HASH_BLOCK_SIZE), b""):
+                    content_hash.update(block)
+            content_hash.update(b"\0")
+        return content_hash.hexdigest()
+
+    @staticmethod
+    def read_inputs(
+        input_files: Sequence[Path],
+    ) -> Tuple[List[bytes], Tuple[List, str]]:
+        """
+        Read the input files of a sample together with their record data
+        The file states are taken before reading, so changes while reading are detected by the next run
+        :param input_files:
+        :return: Content of every file, and the file states and content hash to record
+        """
+        input_states = [Manifest.file_state(path) for path in input_files]
+        contents = []
+        content_hash = hashlib.sha256()
+        for file_path in input_files:
+            contents.append(Path(file_path).read_bytes())
+            content_hash.update(contents[-1])
+            content_hash.update(b"\0")
+        return contents, (input_states, content_hash.hexdigest())
+
+    def is_up_to_date(
+        self, index: int, input_files: Sequence[Path], output_files: Sequence[Path]
+    ) -> bool:
+        """
+        Check if the sample was processed with the current inputs and its outputs still exist
+        Inputs with changed size or mtime are compared by their content hash
+        :param index:
+        :param input_files:
+        :param output_files:
+        :return:
+        """
+        record = self.__records.get(index)
+        if record is None or not all(Path(path).exists() for path in output_files):
+            return False
+        input_states = [self.file_state(path) for path in input_files]
+        if input_states == record["inputs"]:
+            return True
+        if [state[0] for state in input_states] != [
+            state[0] for state in record["inputs"]
+        ]:
+            return False
+        content_hash = self.content_hash(input_files)
+        if content_hash != record["hash"]:
+            return False
+        # store the new file states to skip hashing the next time
+        self.__record(index, input_states, content_hash)
+        return True
+
+    def record(
+        self,
+        index: int,
+        input_files: Sequence[Path],
+        inputs: Optional[Tuple[List, str]] = None,
+    ):
+        """
+        Record a processed sample, the record is written immediately to resume after interruptions
+        :param index:
+        :param input_files:
+        :param inputs: File states and content hash from read_inputs, the input files are read otherwise
+        :return:
+        """
+        if inputs is None:
+            _, inputs = self.read_inputs(input_files)
+        self.__record(index, *inputs)
+
+    def compact(self, sample_count: Optional[int] = None):
+        """
+        Rewrite the manifest with the latest record of every index, a compact manifest is not rewritten
+        :param sample_count: Drop the records of indices not below the sample count
+        :return:
+        """
+        records = {
+            index: record
+            for index, record in sorted(self.__records.items())
+            if sample_count is None or index < sample_count
+        }
+        if (
+            self.__journal is not None
+            and not self.__journal.closed
+            and self.__line_count == len(records)
+        ):
+            return
+        self.close()
+        self.__records = records
+        self.__line_count = len(records)
+        temporary_path = self.__file_path.with_suffix(".tmp")
+        with temporary_path.open("w") as file:
+            for line in [self.__header] + list(self.__records.values()):
+                file.write(json.dumps(line) + "\n")
+        temporary_path.replace(self.__file_path)
+        self.__journal = self.__file_path.open("a")
+
+    def __record(self, index: int, input_states: List, content_hash: str):
+        record = {"index": index, "inputs": input_states, "hash": content_hash}
+        self.__records[index] = record
+        self.__line_count += 1
+        self.__write_line(record)
+
+    def __write_line(self, data: Dict):
+        self.__journal.write(json.dumps(data) + "\n")
+        self.__journal.flush()
+
+    def __read_records(self) -> Tuple[Dict[int, Dict], Optional[int]]:
+        """
+        Read the records of a manifest with the current header
+        :return: Latest record of every index and the number of record lines, which is None if the
+            manifest does not exist, has a different header or ends with an incomplete line
+        """
+        if not self.__file_path.exists():
+            return {}, None
+        text = self.__file_path.read_text()
+        lines = text.splitlines()
+        try:
+            if not lines or json.loads(lines[0]) != self.__header:
+                return {}, None
+        except json.JSONDecodeError:
+            return {}, None
+        records = {}
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # incomplete line of an interrupted run
+                return records, None
+            records[record["index"]] = record
+        if not text.endswith("\n"):
+            # the next record would be appended to the last line
+            return records, None
+        return records, len(lines) - 1
@@ -0,0 +1,36 @@
+"""Parallel processing helpers"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+
+
+def imap_ordered(
+    function: Callable,
+    iterable: Iterable,
+    workers: int = 1,
+    max_in_flight: Optional[int] = None,
+) -> Iterator:
+    """
+    Lazily map function over iterable in a process pool and yield the results in input order
+    With a single worker the function is applied in the current process
+    :param function: Picklable function, e.g. a module level function or a functools.partial of it
+    :param iterable:
+    :param workers: Number of worker processes
+    :param max_in_flight: Maximum number of submitted but not yet yielded items, default 2 * workers
+    :return:
+    """
+    if workers <= 1:
+        yield from map(function, iterable)
+        return
+
+    if max_in_flight is None:
+        max_in_flight = 2 * workers
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for item in iterable:
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+            pending.append(executor.submit(function, item))
+        while pending:
+            yield pending.popleft().result()